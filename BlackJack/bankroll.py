@@ -0,0 +1,369 @@
+"""
+This is a module for simulating sessions, many rounds in a row played by a single player carrying a bankroll
+The player stakes by a betting policy, a flat bet, a Kelly bet or a ramp on the true count, every amount is in cents,
+and plays every hand with a strategy, the basic strategy by default
+A session ends after its rounds or when the bankroll can't pay the policy's smallest bet, the player is ruined
+The sessions are aggregated online, every session only adds to sums, histograms and the statistics
+of the bankroll at a few checkpoints, so the memory doesn't grow with the number of sessions or rounds
+"""
+
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+from basic_strategy import BasicStrategy
+from blackjack import Table, STARTING_BALANCE
+from counting import CardCounter
+from events import NullSink
+from money import CENTS, format_money
+from parallel import derive_seed
+from rules import DEFAULT_RULES
+from shoe import Shoe
+from strategy import DEFAULT_STAKE, Strategy
+
+# The rounds a single player plays in an hour at a casino table
+ROUNDS_PER_HOUR = 100
+
+# The number of bins of the drawdown histogram, each is 1% of the starting bankroll, the last has every larger one
+DRAWDOWN_BINS = 101
+
+# The variance of the amount won per unit staked on a round with the basic strategy, for the Kelly bet
+ROUND_VARIANCE = 1.3
+
+# The units bet from each true count up, below the first true count a single unit is bet
+DEFAULT_RAMP = [
+    (1, 1),
+    (2, 2),
+    (3, 4),
+    (4, 8),
+]
+
+
+class FlatBetting:
+    """Declaring a betting policy staking the same amount on every round"""
+
+    def __init__(self, unit=DEFAULT_STAKE):
+        """
+        unit: the amount staked on every round
+        min_bet: the smallest bet, a bankroll below it is ruined
+        """
+        self.unit = unit
+        self.min_bet = unit
+
+    def bet(self, bankroll, table):
+        """returns the stake of a new round"""
+        return self.unit
+
+
+class KellyBetting:
+    """
+    Declaring a betting policy staking a fraction of the bankroll, the Kelly bet of the player's edge
+    The edge is estimated from the true count, each true count adds edge_per_true_count to base_edge,
+    the minimum is bet when the edge isn't positive
+    """
+
+    def __init__(self, fraction=0.5, min_bet=DEFAULT_STAKE, max_bet=None, base_edge=-0.005, edge_per_true_count=0.005,
+                 variance=ROUND_VARIANCE, system="hi_lo"):
+        """
+        fraction: the part of the full Kelly bet staked, less than 1 lowers the risk for a little of the growth
+        min_bet: the smallest bet, a bankroll below it is ruined
+        max_bet: the largest bet, None for no limit
+        base_edge: the player's edge at a true count of 0, negative when the house has the edge
+        edge_per_true_count: the edge gained for every true count
+        variance: the variance of a round per unit staked
+        system: the counting system the true count is read from, see counting.SYSTEMS
+        """
+        self.fraction = fraction
+        self.min_bet = min_bet
+        self.max_bet = max_bet
+        self.base_edge = base_edge
+        self.edge_per_true_count = edge_per_true_count
+        self.variance = variance
+        self.system = system
+
+    def edge(self, table):
+        """returns the player's edge estimated from the true count of the table"""
+        return self.base_edge + self.edge_per_true_count * table.counter.true_count(self.system)
+
+    def bet(self, bankroll, table):
+        edge = self.edge(table)
+        if edge <= 0:
+            return self.min_bet
+        stake = max(int(self.fraction * edge / self.variance * bankroll), self.min_bet)
+        return stake if self.max_bet is None else min(stake, self.max_bet)
+
+
+class CountRampBetting:
+    """Declaring a betting policy staking a number of units going up with the true count"""
+
+    def __init__(self, unit=DEFAULT_STAKE, ramp=None, system="hi_lo"):
+        """
+        unit: the amount of a unit
+        ramp: a list of (true count, units) from the lowest true count up, defaults to DEFAULT_RAMP
+        system: the counting system the true count is read from, see counting.SYSTEMS
+        min_bet: the smallest bet, a bankroll below it is ruined
+        """
+        self.unit = unit
+        self.ramp = DEFAULT_RAMP if ramp is None else ramp
+        self.system = system
+        self.min_bet = unit * min([1] + [units for _, units in self.ramp])
+
+    def bet(self, bankroll, table):
+        true_count = table.counter.true_count(self.system)
+        units = 1
+        for ramp_true_count, ramp_units in self.ramp:
+            if true_count < ramp_true_count:
+                break
+            units = ramp_units
+        return self.unit * units
+
+
+class BettingStrategy(Strategy):
+    """
+    Declaring a strategy staking by a betting policy and playing the hands with another strategy,
+    a double down is staked with the full stake of the hand and the player never insures
+    """
+
+    def __init__(self, policy, play_strategy=None, rules=DEFAULT_RULES):
+        """
+        policy: the betting policy, FlatBetting, KellyBetting, CountRampBetting or any object with a bet method
+        play_strategy: decides on the hands, defaults to the basic strategy of the rules
+        """
+        super().__init__(base_stake=policy.min_bet)
+        self.policy = policy
+        self.play_strategy = BasicStrategy(rules) if play_strategy is None else play_strategy
+
+    def stake(self, player, hand, table, double_down=False):
+        if double_down:
+            return min(hand.stake, player.balance)
+        return min(self.policy.bet(player.balance, table), player.balance)
+
+    def decide(self, hand, possible_choices, table):
+        return self.play_strategy.decide(hand, possible_choices, table)
+
+
+def play_session(rounds, strategy, bankroll=STARTING_BALANCE, rules=None, seed=None, penetration=0.75,
+                 counting_systems=("hi_lo",)):
+    """
+    A generator playing the rounds of a session and yielding the bankroll after every round,
+    the trajectory of the bankroll is streamed, it stops early when the bankroll is below the policy's smallest bet
+    strategy: a BettingStrategy
+    bankroll: the bankroll at the start of the session
+    rules: the rules.Rules the tables play by, defaults to rules.DEFAULT_RULES
+    seed: the seed of the session's shoe
+    counting_systems: the systems counted on the shoe for the policy, None not to count
+    """
+    if rules is None:
+        rules = DEFAULT_RULES
+    shoe = Shoe(decks=rules.decks, penetration=penetration, rng=random.Random(seed))
+    counter = None if counting_systems is None else CardCounter(shoe, counting_systems)
+    sink = NullSink()
+    min_bet = strategy.policy.min_bet
+    for _ in range(rounds):
+        if bankroll < min_bet:
+            return
+        table = Table(1, strategy=strategy, sink=sink, shoe=shoe, counter=counter, rules=rules, balances=[bankroll])
+        table.play_round()
+        bankroll = table.player_list[0].balance
+        yield bankroll
+
+
+class BankrollResult:
+    """Declaring a class holding the aggregated results of many sessions"""
+
+    def __init__(self, rounds, bankroll, min_bet, checkpoint_rounds):
+        """
+        rounds: the rounds of a session
+        bankroll: the starting bankroll of every session
+        min_bet: the smallest bet of the betting policy, a session ending with less is ruined
+        checkpoint_rounds: the rounds between two checkpoints of the bankroll
+        sessions: the number of sessions played
+        ruined: the number of sessions that ended with less than the smallest bet
+        rounds_played: the number of rounds played in all the sessions
+        total_net, total_net_squared: the sums of what was won on each round and of its squares
+        total_final, total_final_squared: the sums of the final bankrolls and of their squares
+        drawdown_histogram: the number of sessions whose largest drop from a peak was in each 1% of the bankroll
+        checkpoint_sums, checkpoint_squares: the sums of the bankrolls at each checkpoint and of their squares,
+            a ruined session keeps its last bankroll
+        The sums are whole cents, exact however many sessions are added or merged, they are only divided by the
+        properties reporting the means and the variances
+        """
+        self.rounds = rounds
+        self.bankroll = bankroll
+        self.min_bet = min_bet
+        self.checkpoint_rounds = checkpoint_rounds
+        self.sessions = 0
+        self.ruined = 0
+        self.rounds_played = 0
+        self.total_net = 0
+        self.total_net_squared = 0
+        self.total_final = 0
+        self.total_final_squared = 0
+        self.drawdown_histogram = [0] * DRAWDOWN_BINS
+        checkpoints = rounds // checkpoint_rounds
+        self.checkpoint_sums = [0] * checkpoints
+        self.checkpoint_squares = [0] * checkpoints
+
+    def __str__(self):
+        return f"Sessions => {self.sessions} | Risk of ruin => {self.risk_of_ruin:.4%} " \
+               f"| EV per round => ${self.ev / CENTS:.4f} | Hourly win => {format_money(round(self.hourly_win()))} " \
+               f"| N0 => {self.n0:.0f} rounds | Mean final bankroll => {format_money(round(self.mean_final))} " \
+               f"| Median drawdown => {self.drawdown_percentile(50):.0%} " \
+               f"| 95th percentile drawdown => {self.drawdown_percentile(95):.0%}"
+
+    @property
+    def risk_of_ruin(self):
+        """the part of the sessions that ended ruined"""
+        return self.ruined / self.sessions if self.sessions else 0.0
+
+    @property
+    def ev(self):
+        """the average amount won per round"""
+        return self.total_net / self.rounds_played if self.rounds_played else 0.0
+
+    @property
+    def variance(self):
+        """the variance of the amount won per round"""
+        if self.rounds_played < 2:
+            return 0.0
+        return (self.rounds_played * self.total_net_squared - self.total_net ** 2) \
+            / (self.rounds_played * (self.rounds_played - 1))
+
+    @property
+    def n0(self):
+        """the rounds it takes for the expected win to equal a standard deviation, infinite without an edge"""
+        return self.variance / self.ev ** 2 if self.ev else float("inf")
+
+    def hourly_win(self, rounds_per_hour=ROUNDS_PER_HOUR):
+        """returns the expected amount won in an hour"""
+        return self.ev * rounds_per_hour
+
+    def hourly_standard_deviation(self, rounds_per_hour=ROUNDS_PER_HOUR):
+        """returns the standard deviation of the amount won in an hour"""
+        return (self.variance * rounds_per_hour) ** 0.5
+
+    @property
+    def mean_final(self):
+        """the average bankroll at the end of a session"""
+        return self.total_final / self.sessions if self.sessions else 0.0
+
+    def drawdown_percentile(self, percent):
+        """returns the drawdown, as a part of the starting bankroll, that percent of the sessions didn't go over"""
+        rank = self.sessions * percent / 100
+        seen = 0
+        for index, count in enumerate(self.drawdown_histogram):
+            seen += count
+            if count and seen >= rank:
+                return index / (DRAWDOWN_BINS - 1)
+        return 0.0
+
+    def checkpoints(self):
+        """returns a list of (round, mean bankroll, standard deviation of the bankroll) at every checkpoint"""
+        result = []
+        for index, (total, squares) in enumerate(zip(self.checkpoint_sums, self.checkpoint_squares)):
+            mean = total / self.sessions if self.sessions else 0.0
+            variance = (self.sessions * squares - total ** 2) / (self.sessions * (self.sessions - 1)) \
+                if self.sessions > 1 else 0.0
+            result.append(((index + 1) * self.checkpoint_rounds, mean, max(variance, 0.0) ** 0.5))
+        return result
+
+    def add_session(self, trajectory):
+        """adds up a session from its trajectory, an iterable of the bankroll after every round"""
+        checkpoint_rounds = self.checkpoint_rounds
+        checkpoint_sums, checkpoint_squares = self.checkpoint_sums, self.checkpoint_squares
+        previous = peak = self.bankroll
+        max_drawdown = 0
+        total_net = total_net_squared = 0
+        rounds_played = 0
+        for bankroll in trajectory:
+            net = bankroll - previous
+            total_net += net
+            total_net_squared += net * net
+            rounds_played += 1
+            if bankroll > peak:
+                peak = bankroll
+            elif peak - bankroll > max_drawdown:
+                max_drawdown = peak - bankroll
+            if rounds_played % checkpoint_rounds == 0:
+                checkpoint_sums[rounds_played // checkpoint_rounds - 1] += bankroll
+                checkpoint_squares[rounds_played // checkpoint_rounds - 1] += bankroll * bankroll
+            previous = bankroll
+
+        for index in range(rounds_played // checkpoint_rounds, len(checkpoint_sums)):
+            checkpoint_sums[index] += previous
+            checkpoint_squares[index] += previous * previous
+        self.sessions += 1
+        self.ruined += previous < self.min_bet
+        self.rounds_played += rounds_played
+        self.total_net += total_net
+        self.total_net_squared += total_net_squared
+        self.total_final += previous
+        self.total_final_squared += previous * previous
+        drawdown_bin = int(max_drawdown / self.bankroll * (DRAWDOWN_BINS - 1)) if self.bankroll else 0
+        self.drawdown_histogram[min(drawdown_bin, DRAWDOWN_BINS - 1)] += 1
+
+    def merge(self, other):
+        """adds the results of other sessions to these, returns these results"""
+        self.sessions += other.sessions
+        self.ruined += other.ruined
+        self.rounds_played += other.rounds_played
+        self.total_net += other.total_net
+        self.total_net_squared += other.total_net_squared
+        self.total_final += other.total_final
+        self.total_final_squared += other.total_final_squared
+        self.drawdown_histogram = [count + other_count for count, other_count
+                                   in zip(self.drawdown_histogram, other.drawdown_histogram)]
+        self.checkpoint_sums = [total + other_total for total, other_total
+                                in zip(self.checkpoint_sums, other.checkpoint_sums)]
+        self.checkpoint_squares = [squares + other_squares for squares, other_squares
+                                   in zip(self.checkpoint_squares, other.checkpoint_squares)]
+        return self
+
+
+def _simulate_sessions_chunk(arguments):
+    """simulates the sessions from first_session, it runs in a worker process"""
+    first_session, sessions, rounds, strategy, bankroll, rules, seed, checkpoint_rounds = arguments
+    result = BankrollResult(rounds, bankroll, strategy.policy.min_bet, checkpoint_rounds)
+    for session in range(first_session, first_session + sessions):
+        result.add_session(play_session(rounds, strategy, bankroll, rules, derive_seed(seed, session)))
+    return result
+
+
+def simulate_sessions(sessions, rounds, policy=None, play_strategy=None, bankroll=STARTING_BALANCE, rules=None,
+                      seed=0, checkpoint_rounds=None, workers=1, chunk_sessions=100):
+    """
+    Plays many sessions of a player with a bankroll and aggregates them online
+    sessions: the number of sessions
+    rounds: the most rounds of a session, it ends earlier if the player is ruined
+    policy: the betting policy, defaults to FlatBetting
+    play_strategy: decides on the hands, defaults to the basic strategy of the rules, it has to be picklable
+        to be sent to the workers
+    bankroll: the bankroll at the start of every session
+    seed: the master seed every session's seed is derived from, the results are the same whatever the workers
+    checkpoint_rounds: the rounds between two checkpoints of the bankroll, defaults to a tenth of the rounds
+    workers: the number of worker processes, None for the number of cores
+    chunk_sessions: the number of sessions sent to a worker at once
+    return: a BankrollResult
+    """
+    if rules is None:
+        rules = DEFAULT_RULES
+    strategy = BettingStrategy(FlatBetting() if policy is None else policy, play_strategy, rules)
+    if checkpoint_rounds is None:
+        checkpoint_rounds = max(rounds // 10, 1)
+    chunks = [
+        (first_session, min(chunk_sessions, sessions - first_session), rounds, strategy, bankroll, rules, seed,
+         checkpoint_rounds)
+        for first_session in range(0, sessions, chunk_sessions)
+    ]
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    result = BankrollResult(rounds, bankroll, strategy.policy.min_bet, checkpoint_rounds)
+    if workers == 1:
+        for chunk in chunks:
+            result.merge(_simulate_sessions_chunk(chunk))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for chunk_result in executor.map(_simulate_sessions_chunk, chunks):
+                result.merge(chunk_result)
+    return result
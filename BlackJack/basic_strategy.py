@@ -0,0 +1,317 @@
+"""
+This is a module computing the basic strategy of the game and playing it
+The tables give the best choice (ST, HT, DD, SP or SU) for every hard total, soft total and pair
+against every dealer upcard, they are computed by combinatorial analysis for a rules.Rules,
+the default rules are:
+    the dealer stands on every 17, a dealer blackjack only pushes a player 21,
+    a hand can double down on two cards worth 11 or less, split and resplit pairs of the same rank,
+    double down after splitting and surrender at any time
+The dealer's outcomes are exact for the shoe without the upcard, the player draws from that same composition
+Tables are cached on disk in a json file named after the rules' cache key, so they are only computed once for
+a set of rules, and in memory by rules, so a process sweeping many rules reads each file once
+"""
+
+import json
+import os
+from functools import lru_cache
+
+import ev
+from cards import CARD_HARD_VALUES
+from ev import SURRENDER_EV, hand_value
+from rules import CHOICE_LIST, DEFAULT_RULES
+from strategy import DEFAULT_STAKE, Strategy
+
+# The version of the tables, changing how they are computed needs a new version so old caches are not used
+STRATEGY_VERSION = 2
+
+# The index plays of the Hi-Lo count on hard totals, the Illustrious 18 without insurance and the pairs,
+# (hard total, upcard): (true count, choice at or above it, choice below it), None keeps the basic strategy's choice
+DEVIATIONS = {
+    (16, 10): (0, 'ST', None),
+    (15, 10): (4, 'ST', None),
+    (10, 10): (4, 'DD', None),
+    (12, 3): (2, 'ST', None),
+    (12, 2): (3, 'ST', None),
+    (11, 1): (1, 'DD', None),
+    (9, 2): (1, 'DD', None),
+    (10, 1): (4, 'DD', None),
+    (9, 7): (3, 'DD', None),
+    (16, 9): (5, 'ST', None),
+    (13, 2): (-1, None, 'HT'),
+    (12, 4): (0, None, 'HT'),
+    (12, 5): (-2, None, 'HT'),
+    (12, 6): (-1, None, 'HT'),
+    (13, 3): (-2, None, 'HT'),
+}
+
+# The Hi-Lo true count at or above which an insurance paying INSURANCE_MIN_PAYOUT or more is taken,
+# the tens left make it pay, an insurance paying less, like the default 1:1, is never worth it
+INSURANCE_TRUE_COUNT = 3
+INSURANCE_MIN_PAYOUT = 2
+
+# The directory where the tables are cached, it can be changed with the BLACKJACK_CACHE_DIR environment variable
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "blackjack")
+
+
+def shoe_composition(decks=6):
+    """returns the number of cards of each hard value, index 0 for aces and 9 for tens, in a shoe"""
+    counts = [0] * 10
+    for hard_value in CARD_HARD_VALUES:
+        counts[hard_value - 1] += decks
+    return tuple(counts)
+
+
+def dealer_outcomes(upcard, composition, rules=DEFAULT_RULES):
+    """
+    returns the probabilities of the dealer ending on 17, 18, 19, 20, 21 and bust for an upcard
+    upcard: the hard value of the upcard, 1 for an ace
+    composition: the cards left in the shoe, as from shoe_composition, the upcard is removed from it
+    rules: the rules.Rules the dealer plays by
+    """
+    return ev.upcard_outcomes(upcard, ev.remove_card(composition, upcard - 1), rules)
+
+
+class _Analysis:
+    """The expected values of the choices of a hand against a single upcard"""
+
+    def __init__(self, upcard, composition, rules=DEFAULT_RULES):
+        """
+        dealer: the probabilities of the dealer's outcomes
+        draw_probabilities: the probability of drawing each hard value, from the composition without the upcard
+        """
+        remaining = list(composition)
+        remaining[upcard - 1] -= 1
+        total = sum(remaining)
+        self.rules = rules
+        self.dealer = dealer_outcomes(upcard, composition, rules)
+        self.draw_probabilities = [count / total for count in remaining]
+        self.best_cache = {}
+
+    def stand(self, hard_total, has_ace):
+        """the expected value of standing"""
+        value = hand_value(hard_total, has_ace)
+        if value > 21:
+            return -1.0
+        expected_value = self.dealer[5]
+        for outcome in range(5):
+            dealer_value = outcome + 17
+            if value > dealer_value:
+                expected_value += self.dealer[outcome]
+            elif value < dealer_value:
+                expected_value -= self.dealer[outcome]
+        return expected_value
+
+    def hit(self, hard_total, has_ace):
+        """the expected value of hitting, then playing the best choice without doubling down"""
+        expected_value = 0.0
+        for index, probability in enumerate(self.draw_probabilities):
+            expected_value += probability * self.best(hard_total + index + 1, has_ace or index == 0)
+        return expected_value
+
+    def double_down(self, hard_total, has_ace):
+        """the expected value of doubling the stake, drawing one card and standing"""
+        expected_value = 0.0
+        for index, probability in enumerate(self.draw_probabilities):
+            expected_value += probability * self.stand(hard_total + index + 1, has_ace or index == 0)
+        return 2 * expected_value
+
+    def best(self, hard_total, has_ace):
+        """
+        the expected value of the best choice of a hand of three cards or more, 21 always stands,
+        it surrenders only if the rules allow it at any time
+        """
+        key = (hard_total, has_ace)
+        if key not in self.best_cache:
+            value = hand_value(hard_total, has_ace)
+            if value > 21:
+                self.best_cache[key] = -1.0
+            elif value == 21:
+                self.best_cache[key] = self.stand(hard_total, has_ace)
+            else:
+                self.best_cache[key] = max(self.stand(hard_total, has_ace), self.hit(hard_total, has_ace),
+                                           SURRENDER_EV if self.rules.surrender == "any" else -1.0)
+        return self.best_cache[key]
+
+    def choices(self, hard_total, has_ace, can_double=True, can_surrender=True):
+        """returns the expected value of every choice of a two card hand the rules allow, except splitting"""
+        value = hand_value(hard_total, has_ace)
+        expected_values = {
+            'ST': self.stand(hard_total, has_ace),
+            'HT': self.hit(hard_total, has_ace),
+        }
+        if can_surrender:
+            expected_values['SU'] = SURRENDER_EV
+        if can_double and self.rules.can_double(value):
+            expected_values['DD'] = self.double_down(hard_total, has_ace)
+        return expected_values
+
+    def split_hand(self, pair_value, can_resplit=True):
+        """
+        the expected value of one hand of a split pair, it draws a card and plays its best choice
+        A same rank card can be split again, only once more to keep the analysis short
+        """
+        rules = self.rules
+        can_resplit = can_resplit and rules.can_split(2)
+        expected_value = 0.0
+        for index, probability in enumerate(self.draw_probabilities):
+            hard_total, has_ace = pair_value + index + 1, pair_value == 1 or index == 0
+            if hand_value(hard_total, has_ace) == 21:
+                best = self.stand(hard_total, has_ace)
+            else:
+                best = max(self.choices(hard_total, has_ace, rules.double_after_split,
+                                        rules.can_surrender(2, True)).values())
+            if can_resplit and index + 1 == pair_value:
+                # a ten value card is only the same rank as the pair a quarter of the time
+                same_rank = 0.25 if pair_value == 10 else 1.0
+                resplit = max(best, 2 * self.split_hand(pair_value, can_resplit=False))
+                best = same_rank * resplit + (1 - same_rank) * best
+            expected_value += probability * best
+        return expected_value
+
+
+def _best_choice(expected_values):
+    """returns the choice with the highest expected value"""
+    return max(CHOICE_LIST, key=lambda choice: (expected_values.get(choice, float("-inf")),
+                                                -CHOICE_LIST.index(choice)))
+
+
+def _add_choice(tables, name, total, upcard, expected_values):
+    """
+    sets the best choice in the table, and in its variants without doubling down and without surrendering,
+    the names of the variants end with _no_double, _no_surrender and _no_double_no_surrender
+    """
+    tables[name][total][upcard] = _best_choice(expected_values)
+    without_double = {choice: value for choice, value in expected_values.items() if choice != 'DD'}
+    tables[name + "_no_double"][total][upcard] = _best_choice(without_double)
+    tables[name + "_no_surrender"][total][upcard] = _best_choice(
+        {choice: value for choice, value in expected_values.items() if choice != 'SU'})
+    tables[name + "_no_double_no_surrender"][total][upcard] = _best_choice(
+        {choice: value for choice, value in without_double.items() if choice != 'SU'})
+
+
+def compute_tables(rules=DEFAULT_RULES):
+    """
+    Computes the basic strategy tables for a set of rules
+    return: a dict of tables, each table is indexed by [total][upcard hard value] and holds a choice
+        hard, soft: the best choice of a two card hand by its value
+        hard_no_double, soft_no_double: the best choice when doubling down is not possible
+        hard_no_surrender, soft_no_surrender, hard_no_double_no_surrender, soft_no_double_no_surrender:
+            the same when surrendering is not possible
+        pair: the best choice of a pair by the hard value of its cards, SP or the best choice of its total
+    """
+    composition = shoe_composition(rules.decks)
+    names = [kind + variant for kind in ("hard", "soft")
+             for variant in ("", "_no_double", "_no_surrender", "_no_double_no_surrender")]
+    tables = {name: [[None] * 11 for _ in range(22)] for name in names + ["pair"]}
+    can_surrender = rules.can_surrender(2, False)
+
+    for upcard in range(1, 11):
+        analysis = _Analysis(upcard, composition, rules)
+        for value in range(4, 22):
+            _add_choice(tables, "hard", value, upcard, analysis.choices(value, False, can_surrender=can_surrender))
+        for value in range(12, 22):
+            _add_choice(tables, "soft", value, upcard,
+                        analysis.choices(value - 10, True, can_surrender=can_surrender))
+        for pair_value in range(1, 11):
+            expected_values = analysis.choices(2 * pair_value, pair_value == 1, can_surrender=can_surrender)
+            if rules.can_split(1):
+                expected_values['SP'] = 2 * analysis.split_hand(pair_value)
+            tables["pair"][pair_value][upcard] = _best_choice(expected_values)
+
+    return tables
+
+
+def cache_path(rules=DEFAULT_RULES, cache_dir=None):
+    """returns the path of the cached tables of a set of rules"""
+    if cache_dir is None:
+        cache_dir = os.environ.get("BLACKJACK_CACHE_DIR", DEFAULT_CACHE_DIR)
+    return os.path.join(cache_dir, f"basic_strategy_v{STRATEGY_VERSION}_{rules.cache_key}.json")
+
+
+@lru_cache(maxsize=None)
+def load_tables(rules=DEFAULT_RULES, cache_dir=None):
+    """
+    returns the basic strategy tables of a set of rules, from the cache or computed and cached if not there yet
+    The tables are kept in memory by rules too, they are shared and must not be changed
+    """
+    path = cache_path(rules, cache_dir)
+    try:
+        with open(path) as cache_file:
+            return json.load(cache_file)
+    except (OSError, ValueError):
+        pass
+
+    tables = compute_tables(rules)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, "w") as cache_file:
+            json.dump(tables, cache_file)
+        os.replace(temporary_path, path)
+    except OSError:
+        pass
+    return tables
+
+
+class BasicStrategy(Strategy):
+    """A strategy playing every hand by looking its choice up in the basic strategy tables"""
+
+    def __init__(self, rules=DEFAULT_RULES, base_stake=DEFAULT_STAKE, cache_dir=None):
+        """
+        rules: the rules.Rules the tables are computed for, they should be the rules of the tables it plays at
+        """
+        super().__init__(base_stake=base_stake)
+        self.rules = rules
+        self.tables = load_tables(rules, cache_dir)
+
+    def decide(self, hand, possible_choices, table):
+        upcard = CARD_HARD_VALUES[table.dealer.hand.card_list[0].code]
+        if 'SP' in possible_choices and self.tables["pair"][CARD_HARD_VALUES[hand.card_list[0].code]][upcard] == 'SP':
+            return 'SP'
+
+        kind = "soft" if hand.is_soft else "hard"
+        choice = self.tables[kind][hand.value][upcard]
+        if choice not in possible_choices:
+            kind += "_no_double" if 'DD' not in possible_choices else ""
+            kind += "_no_surrender" if 'SU' not in possible_choices else ""
+            choice = self.tables[kind][hand.value][upcard]
+        return choice
+
+
+class DeviationStrategy(BasicStrategy):
+    """
+    A strategy playing the basic strategy, but deviating from it by the Hi-Lo true count of the table's counter,
+    with the index plays of DEVIATIONS, and insuring half of the stake at INSURANCE_TRUE_COUNT or more
+    when the rules pay INSURANCE_MIN_PAYOUT or more for it
+    It plays the plain basic strategy at a table without a counter
+    """
+
+    def __init__(self, rules=DEFAULT_RULES, base_stake=DEFAULT_STAKE, cache_dir=None, system="hi_lo",
+                 deviations=None):
+        """
+        system: the counting system of the table's counter the true count is read from
+        deviations: the index plays, defaults to DEVIATIONS
+        """
+        super().__init__(rules=rules, base_stake=base_stake, cache_dir=cache_dir)
+        self.system = system
+        self.deviations = DEVIATIONS if deviations is None else deviations
+
+    def insure(self, player, table):
+        if table.counter is not None and table.rules.insurance_payout >= INSURANCE_MIN_PAYOUT \
+                and table.counter.true_count(self.system) >= INSURANCE_TRUE_COUNT:
+            return min(player.hand.stake // 2, player.balance)
+        return None
+
+    def decide(self, hand, possible_choices, table):
+        choice = super().decide(hand, possible_choices, table)
+        # the index plays are for hard totals, a split or a surrender of the basic strategy is kept
+        if table.counter is None or hand.is_soft or choice in ('SP', 'SU'):
+            return choice
+        deviation = self.deviations.get((hand.value, CARD_HARD_VALUES[table.dealer.hand.card_list[0].code]))
+        if deviation is None:
+            return choice
+        true_count, choice_above, choice_below = deviation
+        deviation_choice = choice_above if table.counter.true_count(self.system) >= true_count else choice_below
+        if deviation_choice is None or deviation_choice not in possible_choices:
+            return choice
+        return deviation_choice
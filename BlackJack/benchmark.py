@@ -0,0 +1,445 @@
+"""
+This is a module for benchmarking the game
+Run it to time the hot paths of the game, building and dealing a shoe, drawing a card, valuing a hand, paying a hand,
+checking the hands are standing, and whole rounds with 1 and 6 players, every decision is made by a strategy,
+and the cold start of the command line game, from the launch of main.py to its first prompt, which has to stay
+within COLD_START_BUDGET without importing any of COLD_START_DEFERRED_MODULES, the run exits with 1 if it doesn't
+    --json PATH: saves the results as JSON, to compare them with the results of another version
+    --compare PATH: compares the results with the ones saved in PATH, and exits with 1 if any is slower
+        by more than --threshold, 0.1 by default
+    --all: also runs the sink and server benchmarks, the sink one compares the speed of a simulation printing its
+        events to the console and one ignoring them, the server one measures the latency of its decisions with many
+        tables
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+from blackjack import Hand, Player, Table, STATUS_LIST
+from cards import CARDS
+from events import ConsoleSink, NullSink
+from shoe import Shoe
+from simulation import simulate
+from strategy import MimicDealerStrategy
+import server
+
+# The version of the JSON results, a comparison needs both results to have the same one
+RESULTS_VERSION = 1
+
+# The slowdown above which a benchmark is flagged by a comparison, 0.1 is 10% slower
+DEFAULT_THRESHOLD = 0.1
+
+# The number of cards of the hands set_value is timed on
+SET_VALUE_HAND_SIZES = (2, 4, 8)
+
+# The command line game timed by the cold start benchmark, and the start of its first prompt
+MAIN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+FIRST_PROMPT = b"How many players"
+
+# The most milliseconds the command line game may take from its launch to its first prompt
+COLD_START_BUDGET = 100
+
+# The modules the command line game must not import before its first prompt, the subsystems it doesn't use
+# and the modules only needed later, they are imported on first use
+COLD_START_DEFERRED_MODULES = (
+    "asyncio",
+    "basic_strategy",
+    "concurrent.futures",
+    "dealer_mc",
+    "ev",
+    "evaluation",
+    "fractions",
+    "hashlib",
+    "json",
+    "multiprocessing",
+    "numpy",
+    "server",
+    "settlement",
+    "simulation",
+    "tui",
+    "whatif",
+)
+
+
+class _NullStream:
+    """A stream that throws away everything written to it, so the console sink can be timed without a terminal"""
+
+    def write(self, text):
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+def time_simulation(rounds, players, sink, seed=0):
+    """returns the seconds taken by a simulation sending its events to the sink"""
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(_NullStream()):
+        simulate(rounds, players=players, seed=seed, sink=sink)
+    return time.perf_counter() - start
+
+
+def bench_sinks(rounds=5000, players=3):
+    """
+    Times the same simulation with a console sink and with a null sink
+    return: a dict with the seconds taken by each sink and the speedup of the null sink
+    """
+    console_seconds = time_simulation(rounds, players, ConsoleSink())
+    null_seconds = time_simulation(rounds, players, NullSink())
+    return {
+        "rounds": rounds,
+        "players": players,
+        "console_seconds": console_seconds,
+        "null_seconds": null_seconds,
+        "speedup": console_seconds / null_seconds,
+    }
+
+
+def percentiles(samples, points=(50, 95, 99)):
+    """returns a dict from each percentile point to its value in samples, and the maximum"""
+    samples = sorted(samples)
+    if not samples:
+        return {}
+    cut_points = statistics.quantiles(samples, n=100, method="inclusive") if len(samples) > 1 else samples * 99
+    result = {f"p{point}": cut_points[point - 1] for point in points}
+    result["max"] = samples[-1]
+    return result
+
+
+async def _bench_server(tables, rounds, players, slow_tables, slow_delay):
+    game_server = await server.start_server(port=0, seed=0)
+    port = game_server.sockets[0].getsockname()[1]
+    latencies = []
+    slow_latencies = []
+    start = time.perf_counter()
+    async with game_server:
+        clients = [server.play_client("127.0.0.1", port, players=players, rounds=rounds, latencies=latencies)
+                   for _ in range(tables)]
+        clients += [server.play_client("127.0.0.1", port, players=players, rounds=rounds,
+                                       latencies=slow_latencies, delay=slow_delay)
+                    for _ in range(slow_tables)]
+        await asyncio.gather(*clients)
+    return time.perf_counter() - start, latencies
+
+
+def bench_server(tables=1000, rounds=10, players=1, slow_tables=0, slow_delay=0.05):
+    """
+    Plays rounds at many tables at once on a local server, each table's player is a coroutine of the same process
+    slow_tables: the number of extra tables whose player waits slow_delay seconds before every answer,
+        the latencies of the other tables show if they are held up by them
+    return: a dict with the seconds taken, the rounds per second, per core, and the percentiles of the seconds
+        from a player's answer to the server's next request, for the tables that aren't slow
+    """
+    seconds, latencies = asyncio.run(_bench_server(tables, rounds, players, slow_tables, slow_delay))
+    rounds_played = tables * rounds
+    return {
+        "tables": tables,
+        "slow_tables": slow_tables,
+        "rounds": rounds_played,
+        "seconds": seconds,
+        "rounds_per_second": rounds_played / seconds,
+        "cores": os.cpu_count() or 1,
+        "decisions": len(latencies),
+        "latency": percentiles(latencies),
+    }
+
+
+def best_ns_per_operation(batch, operations, repeat=9):
+    """
+    Runs a batch once to warm up, then repeat times, and returns the nanoseconds per operation of the fastest run,
+    the fastest run is the one the least disturbed by the rest of the machine
+    batch: a function doing operations and returning the nanoseconds they took, its setup isn't timed
+    """
+    batch()
+    return min(batch() for _ in range(repeat)) / operations
+
+
+def _quiet_table(players=1, decks=6):
+    """returns a table that plays by itself and ignores its events, with its players staked"""
+    return Table(players, strategy=MimicDealerStrategy(), sink=NullSink(), shoe=Shoe(decks, rng=random.Random(0)))
+
+
+def bench_shoe_deal(shoes=100, decks=6):
+    """
+    returns the nanoseconds to build a shoe.Shoe, shuffle it and draw its cards till the cut card,
+    the shoe every round is dealt from
+    """
+    rng = random.Random(0)
+
+    def batch():
+        start = time.perf_counter_ns()
+        for _ in range(shoes):
+            shoe = Shoe(decks, rng=rng)
+            shoe.start_round()
+            pop_code = shoe.pop_code
+            for _ in range(shoe.cut_card):
+                pop_code()
+        return time.perf_counter_ns() - start
+    return best_ns_per_operation(batch, shoes)
+
+
+def bench_draw_card(draws=5000):
+    """returns the nanoseconds to draw a card from the shoe to a hand with Table.draw_card"""
+    table = _quiet_table(decks=draws // 52 + 1)
+
+    def batch():
+        table.shoe.shuffle()
+        table.drawn_cards = []
+        hands = [Hand(player_index=0) for _ in range(draws // 5)]
+        draw_card = table.draw_card
+        start = time.perf_counter_ns()
+        for hand in hands:
+            draw_card(hand)
+            draw_card(hand)
+            draw_card(hand)
+            draw_card(hand)
+            draw_card(hand)
+        return time.perf_counter_ns() - start
+    return best_ns_per_operation(batch, draws // 5 * 5)
+
+
+def bench_set_value(hand_size, hands=5000):
+    """returns the nanoseconds to value a hand of hand_size cards from scratch with Hand.set_value"""
+    rng = random.Random(hand_size)
+    hand_list = [Hand(card_list=rng.sample(CARDS, hand_size)) for _ in range(hands)]
+
+    def batch():
+        start = time.perf_counter_ns()
+        for hand in hand_list:
+            hand.set_value()
+        return time.perf_counter_ns() - start
+    return best_ns_per_operation(batch, hands)
+
+
+def bench_payout(hands=5000):
+    """returns the nanoseconds to pay a settled hand with Table.payout, every status is paid in turn"""
+    table = _quiet_table()
+    statuses = STATUS_LIST[1:]
+
+    def batch():
+        hand_list = []
+        for index in range(hands):
+            hand = Hand(player_index=0)
+            hand.stake = 10
+            hand.status = statuses[index % len(statuses)]
+            hand_list.append(hand)
+        payout = table.payout
+        start = time.perf_counter_ns()
+        for hand in hand_list:
+            payout(hand)
+        return time.perf_counter_ns() - start
+    return best_ns_per_operation(batch, hands)
+
+
+def bench_are_all_active_hands_standing(calls=10000, players=6):
+    """
+    returns the nanoseconds of Table.are_all_active_hands_standing on a full table
+    every other player has split into two hands, every hand is standing so every hand is checked
+    """
+    table = _quiet_table(players)
+    for player in table.player_list:
+        if player.index % 2:
+            player.is_split = True
+            player.split_hand = [Hand(player_index=player.index, index=index) for index in range(2)]
+        for hand in (player.split_hand if player.is_split else [player.hand]):
+            hand.is_standing = True
+
+    def batch():
+        are_all_active_hands_standing = table.are_all_active_hands_standing
+        start = time.perf_counter_ns()
+        for _ in range(calls):
+            are_all_active_hands_standing()
+        return time.perf_counter_ns() - start
+    return best_ns_per_operation(batch, calls)
+
+
+def bench_rounds(players, rounds=3000):
+    """returns the rounds per second of whole rounds played by MimicDealerStrategy, from a single shoe"""
+    def batch():
+        start = time.perf_counter_ns()
+        simulate(rounds, players=players, seed=0)
+        return time.perf_counter_ns() - start
+    return 1e9 / best_ns_per_operation(batch, rounds, repeat=3)
+
+
+def bench_fresh_table_rounds(players=1, rounds=3000):
+    """
+    returns the rounds per second of rounds each played on a new table with a new shoe,
+    like many tables that only play a few rounds each, the cost of a shoe is paid by every round
+    """
+    rng = random.Random(0)
+    strategy = MimicDealerStrategy()
+
+    def batch():
+        start = time.perf_counter_ns()
+        for _ in range(rounds):
+            Table(players, strategy=strategy, sink=NullSink(), shoe=Shoe(rng=rng)).play_round()
+        return time.perf_counter_ns() - start
+    return 1e9 / best_ns_per_operation(batch, rounds, repeat=3)
+
+
+def _launch_main(options=()):
+    """
+    Launches the command line game in a new python and waits for its first prompt
+    options: the options of python, like -X importtime
+    return: (the seconds to the first prompt, what the game wrote to stderr)
+    """
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, *options, MAIN_PATH], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE)
+    output = b""
+    while FIRST_PROMPT not in output:
+        chunk = process.stdout.read1(4096)
+        if not chunk:
+            process.kill()
+            raise RuntimeError(f"main.py exited before its first prompt: {process.communicate()[1].decode()}")
+        output += chunk
+    seconds = time.perf_counter() - start
+    process.kill()
+    return seconds, process.communicate()[1].decode()
+
+
+def imported_modules(importtime_output):
+    """returns the names of the modules imported in the output of python -X importtime"""
+    return {line.rsplit("|", 1)[1].strip() for line in importtime_output.splitlines()
+            if line.startswith("import time:") and line.count("|") == 2}
+
+
+def bench_cold_start(launches=5):
+    """
+    returns (the milliseconds from the launch of the command line game to its first prompt,
+    the modules of COLD_START_DEFERRED_MODULES it imported before it), the time is the fastest of the launches
+    """
+    milliseconds = min(_launch_main()[0] for _ in range(launches)) * 1000
+    modules = imported_modules(_launch_main(("-X", "importtime"))[1])
+    return milliseconds, sorted(module for module in COLD_START_DEFERRED_MODULES if module in modules)
+
+
+def run_suite():
+    """
+    Times every hot path of the game
+    return: a dict of the results, with the version of python and the machine,
+        each benchmark has a value, a unit, and whether higher is better
+    """
+    benchmarks = {
+        "shoe_deal": (bench_shoe_deal(), "ns", False),
+        "draw_card": (bench_draw_card(), "ns", False),
+    }
+    for hand_size in SET_VALUE_HAND_SIZES:
+        benchmarks[f"set_value_{hand_size}_cards"] = (bench_set_value(hand_size), "ns", False)
+    benchmarks["payout"] = (bench_payout(), "ns", False)
+    benchmarks["are_all_active_hands_standing"] = (bench_are_all_active_hands_standing(), "ns", False)
+    for players in (1, 6):
+        benchmarks[f"rounds_{players}_players"] = (bench_rounds(players), "rounds/s", True)
+    benchmarks["fresh_table_rounds"] = (bench_fresh_table_rounds(), "rounds/s", True)
+    cold_start, deferred_modules_imported = bench_cold_start()
+    benchmarks["cold_start"] = (cold_start, "ms", False)
+    return {
+        "version": RESULTS_VERSION,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "deferred_modules_imported": deferred_modules_imported,
+        "benchmarks": {
+            name: {"value": value, "unit": unit, "higher_is_better": higher_is_better}
+            for name, (value, unit, higher_is_better) in benchmarks.items()
+        },
+    }
+
+
+def compare(baseline, results, threshold=DEFAULT_THRESHOLD):
+    """
+    Compares the results of run_suite with a baseline, only the benchmarks in both are compared
+    threshold: the slowdown above which a benchmark is a regression, 0.1 is 10% slower
+    return: a list of (name, baseline value, value, slowdown, is_regression),
+        the slowdown is the extra time taken, negative when faster
+    """
+    if baseline.get("version") != results.get("version"):
+        raise ValueError(f"can't compare results of version {baseline.get('version')} "
+                         f"with results of version {results.get('version')}")
+    comparison = []
+    for name, benchmark in results["benchmarks"].items():
+        if name not in baseline["benchmarks"]:
+            continue
+        baseline_value, value = baseline["benchmarks"][name]["value"], benchmark["value"]
+        if benchmark["higher_is_better"]:
+            slowdown = baseline_value / value - 1
+        else:
+            slowdown = value / baseline_value - 1
+        comparison.append((name, baseline_value, value, slowdown, slowdown > threshold))
+    return comparison
+
+
+def cold_start_failures(results, budget=COLD_START_BUDGET):
+    """returns why the cold start of the results of run_suite is not within the budget, an empty list if it is"""
+    failures = []
+    cold_start = results["benchmarks"]["cold_start"]["value"]
+    if cold_start > budget:
+        failures.append(f"main.py took {cold_start:.1f}ms to its first prompt, the budget is {budget}ms")
+    if results["deferred_modules_imported"]:
+        failures.append(f"main.py imported {', '.join(results['deferred_modules_imported'])} before its first prompt")
+    return failures
+
+
+def print_suite(results):
+    """prints the results of run_suite, one benchmark per line"""
+    print(f"Python {results['python']} ({results['implementation']}) on {results['machine']}")
+    for name, benchmark in results["benchmarks"].items():
+        print(f"{name:<32} {benchmark['value']:>14.1f} {benchmark['unit']}")
+
+
+def print_comparison(comparison, threshold):
+    """prints a comparison made by compare, the regressions are flagged"""
+    for name, baseline_value, value, slowdown, is_regression in comparison:
+        flag = f"SLOWER by more than {threshold:.0%}" if is_regression else ""
+        print(f"{name:<32} {baseline_value:>14.1f} => {value:>14.1f} | {slowdown:+7.1%} {flag}")
+
+
+def _print_other_benchmarks():
+    """prints the sink and server benchmarks"""
+    result = bench_sinks()
+    print(f"Console sink => {result['console_seconds']:.3f}s | Null sink => {result['null_seconds']:.3f}s "
+          f"| Speedup => {result['speedup']:.2f}x")
+    for slow_tables in (0, 10):
+        result = bench_server(slow_tables=slow_tables)
+        latency = " ".join(f"{point} {seconds * 1000:.2f}ms" for point, seconds in result["latency"].items())
+        print(f"Server => {result['tables']} tables and {result['slow_tables']} slow tables "
+              f"| {result['rounds_per_second']:.0f} rounds/s on {result['cores']} cores | Latency => {latency}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the hot paths of the game.")
+    parser.add_argument("--json", metavar="PATH", default=None, help="save the results as JSON")
+    parser.add_argument("--compare", metavar="PATH", default=None, help="compare with the JSON results in PATH")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="the slowdown flagged by --compare, 0.1 is 10%% slower")
+    parser.add_argument("--all", action="store_true", help="also run the sink and server benchmarks")
+    arguments = parser.parse_args()
+
+    suite_results = run_suite()
+    print_suite(suite_results)
+    suite_failures = cold_start_failures(suite_results)
+    for failure in suite_failures:
+        print(f"COLD START OVER BUDGET: {failure}")
+    if arguments.json is not None:
+        with open(arguments.json, "w") as json_file:
+            json.dump(suite_results, json_file, indent=2)
+    if arguments.all:
+        _print_other_benchmarks()
+    if arguments.compare is not None:
+        with open(arguments.compare) as json_file:
+            suite_comparison = compare(json.load(json_file), suite_results, arguments.threshold)
+        print_comparison(suite_comparison, arguments.threshold)
+        if any(is_regression for *_, is_regression in suite_comparison):
+            sys.exit(1)
+    if suite_failures:
+        sys.exit(1)
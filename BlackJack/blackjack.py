@@ -1,70 +1,69 @@
 """A module for a simple command land python implementation of blackjack."""
 
-from random import shuffle
+from enum import IntEnum
+from functools import lru_cache
 import input_handler
+import money
+from cards import RANK_LIST, SUIT_INITIALS, RANK_VALUES, CARDS, CARD_VALUES, CARD_HARD_VALUES
+from events import ConsoleSink
+from rules import DEFAULT_RULES
+from shoe import Shoe
 
-# The possible ranks of a card
-RANK_LIST = [
-    "A",
-    "2",
-    "3",
-    "4",
-    "5",
-    "6",
-    "7",
-    "8",
-    "9",
-    "10",
-    "J",
-    "Q",
-    "K",
-]
-
-# The possible suits of a card
-SUIT_LIST = [
-    "HEART",
-    "DIAMOND",
-    "SPADE",
-    "CLUB",
-]
-
-# The possible status of a hand, None is for a hand that is still in the game
-STATUS_LIST = [
-    None,
-    "PUSH",
-    "LOST_BY_SURRENDER",
-    "LOST_BY_BUST",
-    "LOST_BY_LESS_DEALER",
-    "WON_BY_DEALER_BUST",
-    "WON_BY_GREATER_DEALER",
-    "BLACK_JACK",
-]
-
-
-class Card:
-    """Declaring a card class having a rank and suit"""
-
-    def __init__(self, rank, suit):
-        """Setting the value of a card to 0 till it is calculated or set"""
-        self.rank = rank
-        self.suit = suit
-        self.value = 0
+# The balance every player starts with in cents, $1000.00, unless the table is given the balances of its players
+STARTING_BALANCE = 100_000
+
+
+class HandStatus(IntEnum):
+    """
+    Declaring the possible status of a hand, IN_PLAY is for a hand that is still in the game and is falsy
+    A status is a small integer, so it indexes the payout rates of a table and a settled hand compares as an int,
+    it prints as its name
+    """
+    IN_PLAY = 0
+    PUSH = 1
+    LOST_BY_SURRENDER = 2
+    LOST_BY_BUST = 3
+    LOST_BY_LESS_DEALER = 4
+    WON_BY_DEALER_BUST = 5
+    WON_BY_GREATER_DEALER = 6
+    BLACK_JACK = 7
 
     def __str__(self):
-        return f"{self.rank}^{self.suit} "
+        return self.name
+
+    def __format__(self, format_spec):
+        return format(self.name, format_spec)
 
-    def set_value(self):
-        """
-        Setting the value of a card
-        Note, to set the value of an ace we need to check the value of the hand,
-        it is default to 11, later recalculated from the hand itself
-        """
-        if self.rank in RANK_LIST[1:10]:    # 2 - 9
-            self.value = int(self.rank)
-        elif self.rank in RANK_LIST[10:]:   # 10, J, Q, K
-            self.value = 10
-        elif self.rank == RANK_LIST[1]:     # A
-            self.value = 11
+
+# The possible status of a hand, in the order of their values
+STATUS_LIST = list(HandStatus)
+
+# The status of a hand settled against the dealer's hand, by the sign of the dealer's value minus the hand's,
+# a tuple so the hot path doesn't look the members up on HandStatus
+SETTLED_STATUSES = (HandStatus.PUSH, HandStatus.LOST_BY_LESS_DEALER, HandStatus.WON_BY_GREATER_DEALER)
+
+
+@lru_cache(maxsize=None)
+def payout_rates(rules):
+    """
+    returns the payout of a settled hand for every status, by rules, a tuple indexed by the HandStatus
+    A payout is (multiplier, numerator, denominator), the hand gets back stake * multiplier
+    plus stake * numerator / denominator rounded by the rules, see money.scale,
+    a win doubles the stake, a loss takes it, a push gives it back, a surrender gives half of it back
+    and a blackjack pays the rules' blackjack payout, a hand in play isn't paid
+    """
+    blackjack_numerator, blackjack_denominator = money.ratio(rules.blackjack_payout)
+    rates = {
+        HandStatus.IN_PLAY: None,
+        HandStatus.PUSH: (1, 0, 1),
+        HandStatus.LOST_BY_SURRENDER: (0, 1, 2),
+        HandStatus.LOST_BY_BUST: (0, 0, 1),
+        HandStatus.LOST_BY_LESS_DEALER: (0, 0, 1),
+        HandStatus.WON_BY_DEALER_BUST: (2, 0, 1),
+        HandStatus.WON_BY_GREATER_DEALER: (2, 0, 1),
+        HandStatus.BLACK_JACK: (1, blackjack_numerator, blackjack_denominator),
+    }
+    return tuple(rates[status] for status in HandStatus)
 
 
 class Hand:
@@ -73,24 +72,32 @@ class Hand:
     def __init__(self, card_list=None, player_index=None, index=None):
         """
         card_list: the hand's current cards, list of cards
-        stake: the stake on the hand
-        value: the value of the hand
+        stake: the stake on the hand, in cents like every amount, see money
+        hard_total: the value of the hand with every ace counted as 1
+        ace_count: the number of aces in the hand
+        value: the value of the hand, kept up to date as each card is added
+        is_soft: True if an ace in the hand is counted as 11
         player_index: the index of the player with the hand, None if it is the dealer
         is_active: True if the hand is still in the game, else False
         is_standing: True if the player is standing on the hand, else False
         is_burst: True if the hand has burst, gone above 21, else False
-        status: this is initialized to None, but changes and is_active changes to False, indicating the status
+        status: a HandStatus, initialized to IN_PLAY, but changes and is_active changes to False, indicating the status
                 like won, lost or push
         """
         self.card_list = [] if card_list is None else card_list
         self.stake = 0
-        self.value = 0
+        self.hard_total = 0
+        self.ace_count = 0
+        self._value = 0
+        self._is_soft = False
         self.player_index = player_index
         self.index = index
         self.is_active = True
         self.is_standing = False
         self.is_burst = False
-        self.status = STATUS_LIST[0]
+        self.status = HandStatus.IN_PLAY
+        if self.card_list:
+            self.set_value()
 
     def __str__(self):
         result_str = f"Dealer: " if self.player_index is None else f"Player {self.player_index}: "
@@ -106,153 +113,190 @@ class Hand:
         result_str = f"Hand {self.index}: "
         for card in self.card_list:
             result_str += str(card)
-        result_str += f" | value => {self.value} | stake => {self.stake} " \
+        result_str += f" | value => {self.value} | stake => {money.format_money(self.stake)} " \
                       f"| is_active => {self.is_active} | is_standing => {self.is_standing} " \
                       f"| is_burst => {self.is_burst} | status => {self.status}"
         print(result_str)
 
+    @property
+    def value(self):
+        """the value of the hand, at most one ace is counted as 11 if it doesn't take the hand above 21"""
+        return self._value
+
+    @property
+    def is_soft(self):
+        """True if an ace in the hand is counted as 11"""
+        return self._is_soft
+
+    @property
+    def is_blackjack(self):
+        """True if the hand is worth 21 with its first two cards"""
+        return self._value == 21 and len(self.card_list) == 2
+
+    @property
+    def is_pair(self):
+        """True if the hand has two cards of the same rank, which can be split"""
+        return len(self.card_list) == 2 and self.card_list[0].rank == self.card_list[1].rank
+
+    def copy(self):
+        """returns a copy of the hand with its own list of cards, the cards themselves are shared"""
+        hand = Hand.__new__(Hand)
+        hand.__dict__.update(self.__dict__)
+        hand.card_list = list(self.card_list)
+        return hand
+
+    def add_card(self, card):
+        """
+        Adds a card to the hand and updates the value in constant time
+        The hard total counts aces as 1, an ace is then counted as 11 if it doesn't take the hand above 21
+        """
+        self.card_list.append(card)
+        hard_total = self.hard_total + CARD_HARD_VALUES[card.code]
+        self.hard_total = hard_total
+        if card.code % 13 == 0:
+            self.ace_count += 1
+        if self.ace_count and hard_total <= 11:
+            self._value = hard_total + 10
+            self._is_soft = True
+        else:
+            self._value = hard_total
+            self._is_soft = False
+
     def set_value(self):
         """
-        Sets the value for a hand
+        Sets the value for a hand from all its cards, add_card keeps it up to date after that
         If the hand contains aces, the computation is different
         It checks if when the ace value is set to 11, the hand value doesn't exceed 21
         else, it sets all ace value to 1
         Note: If there are more than one ace, at most one can have an ace with a value of 11
         """
-        ace_indices = []
-        total = 0
-
-        for index in range(len(self.card_list)):
-            if self.card_list[index].rank == "A":
-                ace_indices.append(index)
-            else:
-                self.card_list[index].set_value()
-                total += self.card_list[index].value
-        no_aces = len(ace_indices)
-
-        ace_low_value = 1
-        ace_high_value = 11
-        if no_aces == 0:
-            self.value = total
-            return
-        else:
-            for i in range(no_aces):
-                if i == no_aces - 1:
-                    total_temp = total
-                    total_temp += ace_high_value
-
-                    if total_temp > 21:
-                        self.value = total + ace_low_value
-                    else:
-                        self.value = total + ace_high_value
-                else:
-                    total += ace_low_value
+        card_list = self.card_list
+        self.card_list = []
+        self.hard_total = 0
+        self.ace_count = 0
+        for card in card_list:
+            self.add_card(card)
 
     def check_burst(self):
         """Checking if the hand has burst and setting it player to True"""
-        if self.value > 21:
+        if self._value > 21:
             self.is_burst = True
-            self.status = STATUS_LIST[3]
+            self.status = HandStatus.LOST_BY_BUST
 
     def decide(self, table):
-        """
-        This allows the player to decide on the hand, if the hand is active, not standing,
-        and hasn't burst
-        Calls the appropriate function based on the player choice
-        """
-        if self.status != STATUS_LIST[0] or self.is_standing \
-                or not self.is_active or self.is_burst:
-            return
-
-        if self.value == 21:
-            self.stand(is_perfect_hand=True)
-            return
-
-        possible_choices = self.get_possible_choices()
-
-        # Formulating a prompt for the user to know their available choices
-        input_str = f"\n{self}. "
-        input_str += "\nYour available choices:"
-
-        for choice in possible_choices:
-            input_str += " " + choice
-        input_str += ": "
-
-        error_message = "Invalid input. Please make sure you choose from your available choices. "
-        player_input = input_handler.get_input_str_from_choice(
-            possible_choices, input_str, error_message=error_message, case_sensitive=False)
-
-        if player_input.upper() == 'ST':
-            self.stand()
-        elif player_input.upper() == 'HT':
-            self.hit(table)
-        elif player_input.upper() == 'DD':
-            self.double_down(table)
-        elif player_input.upper() == 'SP':
-            self.split(table)
-        elif player_input.upper() == 'SU':
-            self.surrender()
-
-    def get_possible_choices(self):
-        """
-        Getting the player's available choices for the hand
+        """This plays the hand and every hand split from it till they are all done, see decide_steps"""
+        table.run(self.decide_steps(table))
+
+    def decide_steps(self, table):
+        """
+        The steps of decide, a generator yielding every decision for the strategy, see Table.run
+        The player decides on a hand, if the hand is active, not standing, and hasn't burst, again after every hit
+        The hands split from it are kept on a stack instead of hit, split and decide calling each other,
+        a split pushes its two hands so the first one is played to the end before the second one gets its card
+        """
+        hand = self
+        pending = []
+        while True:
+            while not hand.status and not hand.is_standing \
+                    and hand.is_active and not hand.is_burst:
+                if hand._value == 21:
+                    hand.stand(table, is_perfect_hand=True)
+                    break
+
+                possible_choices = hand.get_possible_choices(table)
+                player_input = yield "decide", (hand, possible_choices, table)
+                table.sink.decide(hand, player_input)
+
+                player_input = player_input.upper()
+                if player_input == 'HT':
+                    table.draw_card(hand)
+                    continue
+
+                if player_input == 'ST':
+                    hand.stand(table)
+                elif player_input == 'DD':
+                    yield from hand.double_down_steps(table)
+                elif player_input == 'SP':
+                    hand0, hand1 = hand.split(table)
+                    pending.append(hand1)
+                    pending.append(hand0)
+                elif player_input == 'SU':
+                    hand.surrender(table)
+                break
+
+            if not pending:
+                return
+            hand = pending.pop()
+            table.draw_card(hand)
+
+    def get_possible_choices(self, table=None):
+        """
+        Getting the player's available choices for the hand, by the rules of the table, the default rules if None
         Stand and hit are available when the player hand value is less than 21
-        double down is available when the hand value is less than 11 and the player just has two card in his hand
-        split is available when the hand has two cards, and they are both of the same rank
+        double down is available when the player just has two card in his hand, and the rules allow its value,
+        and after a split if the rules allow doubling down after splitting
+        split is available when the hand has two cards, they are both of the same rank,
+        and the player has fewer hands than the rules allow
+        surrender is available when the rules allow it for the hand
         It returns it as a list
         """
+        rules = DEFAULT_RULES if table is None else table.rules
+        is_split_hand, number_of_hands = False, 1
+        if table is not None and self.player_index is not None:
+            player = table.player_list[self.player_index]
+            if player.is_split:
+                is_split_hand, number_of_hands = True, len(player.split_hand)
+        value = self._value
+        number_of_cards = len(self.card_list)
         possible_choices = []
 
-        if self.value <= 21:
+        if value <= 21:
             possible_choices.append('ST')
             possible_choices.append('HT')
 
-        if self.value <= 11 and len(self.card_list) == 2:
-            possible_choices.append('DD')
+        if number_of_cards == 2:
+            if rules.can_double(value) and (rules.double_after_split or not is_split_hand):
+                possible_choices.append('DD')
 
-        if len(self.card_list) == 2 and self.card_list[0].rank == self.card_list[1].rank:
-            possible_choices.append('SP')
+            if self.is_pair and rules.can_split(number_of_hands):
+                possible_choices.append('SP')
 
-        if self.value <= 21:
+        if value <= 21 and rules.can_surrender(number_of_cards, is_split_hand):
             possible_choices.append('SU')
 
         return possible_choices
 
-    def stand(self, is_perfect_hand=False):
+    def stand(self, table, is_perfect_hand=False):
         """Set the hand is_standing to True"""
         self.is_standing = True
-        standing_message = f"Player {self.player_index} "
-        if self.index is not None:
-            standing_message += f"Hand {self.index} "
-        standing_message += f"is standing on a perfect hand. Good luck!" if is_perfect_hand \
-            else f"Player {self.player_index} is standing. Good luck!"
-        print(standing_message)
-        print()
+        table.sink.stand(self, is_perfect_hand)
 
     def hit(self, table, double_down=None):
         """
-        Draws a card for the hand
-        If the player is doubling down, it stands the player
-        else, it lets the player decide again
+        Draws a card for the hand, which is valued as the card is added
+        If the player is doubling down, it stands the player,
+        else the next decision is left to the steps of the round, see decide_steps
         """
-        if not double_down:
-            table.draw_card(self)
-            self.decide(table)
-        else:
-            table.draw_card(self)
-            is_perfect_hand = True if self.value == 21 else False
-            self.stand(is_perfect_hand=is_perfect_hand)
+        table.draw_card(self)
+        if double_down:
+            self.stand(table, is_perfect_hand=self.value == 21)
 
     def double_down(self, table):
         """It doubles the stake of the player on a hand, draws a card and stands the hand"""
-        table.player_list[self.player_index].set_hand_stake(self, table, double_down=True)
+        table.run(self.double_down_steps(table))
+
+    def double_down_steps(self, table):
+        """The steps of double_down, a generator yielding the stake decision, see Table.run"""
+        player = table.player_list[self.player_index]
+        stake = yield "stake", (player, self, table, True)
+        player.set_hand_stake(self, table, stake=stake, double_down=True)
         self.hit(table, double_down=True)
-        print(f"Player{self.player_index} doubled down. Good luck!")
+        table.sink.double_down(self)
 
     def split(self, table):
         """
         This splits a hand into two and adds them to the players split card
-        It lets the player decide on each hand along the way
+        return: the two new hands, decide deals each its second card and plays it
         """
         if not table.player_list[self.player_index].is_split:
             table.player_list[self.player_index].is_split = True
@@ -264,8 +308,7 @@ class Hand:
             hand0 = Hand(card_list=[self.card_list[0]], player_index=self.player_index, index=self.index)
             hand1 = Hand(card_list=[self.card_list[1]], player_index=self.player_index, index=no_hands)
 
-        table.player_list[self.player_index]. \
-            set_split_hands_stake(hand0, hand1, table, table.player_list[self.player_index].hand.stake)
+        table.player_list[self.player_index].set_split_hands_stake(self, hand0, hand1, table)
 
         try:
             table.player_list[self.player_index].split_hand[hand0.index] = hand0
@@ -276,36 +319,36 @@ class Hand:
         except IndexError:
             table.player_list[self.player_index].split_hand.append(hand1)
 
-        table.player_list[self.player_index].split_hand[hand0.index].hit(table)
-        table.player_list[self.player_index].split_hand[hand1.index].hit(table)
+        table.sink.split(self, hand0, hand1)
+        return hand0, hand1
 
-    def surrender(self):
+    def surrender(self, table):
         """Sets the player status to lost by surrender"""
-        self.status = STATUS_LIST[2]
-        print(f"Player{self.player_index} surrendered.")
+        self.status = HandStatus.LOST_BY_SURRENDER
+        table.sink.surrender(self)
 
 
 class Player:
     """Declaring a player class to represent a player"""
 
-    def __init__(self, index, table):
+    def __init__(self, index, table, balance=STARTING_BALANCE):
         """
         index: to initialize the opposition of the player on the table
-        balance: the player's available money
+        balance: the player's available money in cents, STARTING_BALANCE by default
         hand: the player's current hand, list of cards
         is_split: True if the player has split his hand, there by having multiple hands
         split_hand: holds the list of split hands
         is_insured: True when the player insures
         insurance: holds the stake for the insurance
+        The hand is staked by the table, see Table.stake_steps
         """
         self.index = index
-        self.balance = 1000.00
+        self.balance = balance
         self.hand = Hand(player_index=index)
         self.is_split = False
         self.split_hand = []
         self.is_insured = None
         self.insurance = 0
-        self.set_hand_stake(self.hand, table)
 
     def __str__(self):
         if self.is_split:
@@ -325,20 +368,12 @@ class Player:
         return result_str
 
     def set_hand_stake(self, hand, table, stake=None, double_down=False):
-        """stakes the hand of a player with the input stake and deducts it from the player's balance"""
-        if self.is_split:
-            stake = stake
-        elif double_down:
-            print(f"Player {self.index} has ${self.balance:.2f} is about to double down.")
-            input_message = f"How much do you want to stake in $ (max is ${hand.stake:.2f})," \
-                            f" you have ${self.balance} as balance: "
-            stake = input_handler.get_input_float(input_message, error_massage=None,
-                                                  upper_limit=min(float(self.hand.stake), self.balance), lower_limit=0)
-        else:
-            print(f"Player {self.index} has ${self.balance:.2f}.")
-            input_message = "How much do you want to stake in $: "
-            stake = input_handler.get_input_float(input_message, error_massage=None,
-                                                  upper_limit=self.balance, lower_limit=0)
+        """
+        stakes the hand of a player with the input stake and deducts it from the player's balance
+        If no stake is given, the table's strategy is asked for one
+        """
+        if stake is None:
+            stake = table.strategy.stake(self, hand, table, double_down=double_down)
 
         self.debit_hand(hand, table, stake)
 
@@ -356,11 +391,17 @@ class Player:
             table.balance += stake
             self.insurance += stake
         else:
-            print(f"{self} doesn't have enough balance.")
+            table.sink.insufficient_balance(self)
 
-    def set_split_hands_stake(self, hand0, hand1, table, old_stake):
-        """called when a hand is split, adds the stake of the old hand and stakes the other two new hands"""
+    def set_split_hands_stake(self, hand, hand0, hand1, table):
+        """
+        called when a hand is split, the stake of the old hand is given back from the table
+        and the two new hands are each staked with it
+        """
+        old_stake = hand.stake
         self.balance += old_stake
+        table.balance -= old_stake
+        hand.stake = 0
         self.set_hand_stake(hand0, table, stake=old_stake)
         self.set_hand_stake(hand1, table, stake=old_stake)
 
@@ -368,19 +409,19 @@ class Player:
         """To print the player's information"""
         if self.is_split:
             no_hands = len(self.split_hand)
-            result_str = f"Player {self.index} has {no_hands} hands with ${self.balance:.2f}."
+            result_str = f"Player {self.index} has {no_hands} hands with {money.format_money(self.balance)}."
             for index, hand in enumerate(self.split_hand):
                 result_str += f"\nHand {index}: "
                 for card in hand.card_list:
                     result_str += str(card)
-                result_str += f" | value => {hand.value} | stake => {hand.stake} " \
+                result_str += f" | value => {hand.value} | stake => {money.format_money(hand.stake)} " \
                               f"| is_active => {hand.is_active} | is_standing => {hand.is_standing} " \
                               f"| is_burst => {hand.is_burst} | status => {hand.status}"
         else:
-            result_str = f"Player {self.index} has no hand with ${self.balance:.2f}.\nHand: "
+            result_str = f"Player {self.index} has no hand with {money.format_money(self.balance)}.\nHand: "
             for card in self.hand.card_list:
                 result_str += str(card)
-            result_str += f" | value => {self.hand.value} | stake => {self.hand.stake} " \
+            result_str += f" | value => {self.hand.value} | stake => {money.format_money(self.hand.stake)} " \
                           f"| is_active => {self.hand.is_active} | is_standing => {self.hand.is_standing} " \
                           f"| is_burst => {self.hand.is_burst} | status => {self.hand.status}"
 
@@ -388,8 +429,12 @@ class Player:
 
     def decide(self, table):
         """lets a player decide on a hand active, not standing and not blackjacked hand"""
-        if self.hand.is_active and not self.hand.is_standing and self.hand.status != STATUS_LIST[7]:
-            self.hand.decide(table)
+        table.run(self.decide_steps(table))
+
+    def decide_steps(self, table):
+        """The steps of decide, a generator yielding every decision for the strategy, see Table.run"""
+        if self.hand.is_active and not self.hand.is_standing and self.hand.status != HandStatus.BLACK_JACK:
+            yield from self.hand.decide_steps(table)
             if not self.is_split:
                 table.payout(self.hand)
             else:
@@ -397,21 +442,19 @@ class Player:
                     table.payout(hand)
 
     def insure(self, table):
-        """allows the player to decide if he/she wants place insurance"""
-        possible_choices = ['IN', 'X']
-        input_str = f"\nPlayer {self.index} wants to insure. Enter 'in' or 'IN' to insure or 'x' not to: "
-        insurance_input = input_handler.get_input_str_from_choice(possible_choices, input_str, case_sensitive=False)
-        if insurance_input.upper() == 'IN':
-            input_message = f"How much do you want to stake on insurance in $ (max is ${self.hand.stake/2:.2f})," \
-                            f" you have ${self.balance} as balance: "
-            stake = input_handler.get_input_float(input_message, error_massage=None,
-                                                  upper_limit=min(self.hand.stake/2, self.balance), lower_limit=0)
-            if stake <= self.hand.stake/2:
-                self.is_insured = True
-                self.debit_insurance(table, stake)
-                print(f"Player {self.index} is insured.")
-        else:
-            print(f"Player {self.index} is not insured.")
+        """
+        allows the player to decide if he/she wants place insurance
+        The table's strategy returns the insurance stake, None if the player doesn't insure
+        """
+        table.run(self.insure_steps(table))
+
+    def insure_steps(self, table):
+        """The steps of insure, a generator yielding the insurance decision, see Table.run"""
+        stake = yield "insure", (self, table)
+        if stake is not None and 2 * stake <= self.hand.stake:
+            self.is_insured = True
+            self.debit_insurance(table, stake)
+        table.sink.insurance(self, stake)
 
 
 class Dealer:
@@ -434,49 +477,149 @@ class Dealer:
         This compares the  hand with the dealer's hand, and set the hand status appropriately
         """
         if self.hand.value > 21:  # checking if dealer has burst then player wins by dealer burst
-            hand.status = STATUS_LIST[5]
+            hand.status = HandStatus.WON_BY_DEALER_BUST
         elif self.hand.value > hand.value:
-            hand.status = STATUS_LIST[4]
+            hand.status = HandStatus.LOST_BY_LESS_DEALER
         elif self.hand.value < hand.value:
-            hand.status = STATUS_LIST[6]
+            hand.status = HandStatus.WON_BY_GREATER_DEALER
         else:
-            hand.status = STATUS_LIST[1]
+            hand.status = HandStatus.PUSH
+
+
+class InteractiveStrategy:
+    """
+    The default strategy of a table, every decision is asked from the user on the command line
+    A strategy is any object with the stake, insure and decide methods, the stakes are in cents
+    The user enters dollars, they are turned into cents
+    """
+
+    def stake(self, player, hand, table, double_down=False):
+        """Asks the player for the stake of a hand, or the extra stake when doubling down"""
+        if double_down:
+            print(f"Player {player.index} has {money.format_money(player.balance)} is about to double down.")
+            input_message = f"How much do you want to stake in $ (max is {money.format_money(hand.stake)})," \
+                            f" you have {money.format_money(player.balance)} as balance: "
+            return money.to_cents(input_handler.get_input_float(
+                input_message, error_massage=None,
+                upper_limit=money.to_dollars(min(hand.stake, player.balance)), lower_limit=0))
+
+        print(f"Player {player.index} has {money.format_money(player.balance)}.")
+        input_message = "How much do you want to stake in $: "
+        return money.to_cents(input_handler.get_input_float(input_message, error_massage=None,
+                                                            upper_limit=money.to_dollars(player.balance),
+                                                            lower_limit=0))
+
+    def insure(self, player, table):
+        """Asks the player if he/she wants to insure, returns the insurance stake or None"""
+        possible_choices = ['IN', 'X']
+        input_str = f"\nPlayer {player.index} wants to insure. Enter 'in' or 'IN' to insure or 'x' not to: "
+        insurance_input = input_handler.get_input_str_from_choice(possible_choices, input_str, case_sensitive=False)
+        if insurance_input.upper() != 'IN':
+            return None
+
+        upper_limit = min(player.hand.stake // 2, player.balance)
+        input_message = f"How much do you want to stake on insurance in $ (max is {money.format_money(upper_limit)})," \
+                        f" you have {money.format_money(player.balance)} as balance: "
+        return money.to_cents(input_handler.get_input_float(input_message, error_massage=None,
+                                                            upper_limit=money.to_dollars(upper_limit), lower_limit=0))
+
+    def decide(self, hand, possible_choices, table):
+        """Asks the player to choose one of the possible choices for the hand"""
+        # Formulating a prompt for the user to know their available choices
+        input_str = f"\n{hand}. "
+        input_str += "\nYour available choices:"
+
+        for choice in possible_choices:
+            input_str += " " + choice
+        input_str += ": "
+
+        error_message = "Invalid input. Please make sure you choose from your available choices. "
+        return input_handler.get_input_str_from_choice(
+            possible_choices, input_str, error_message=error_message, case_sensitive=False)
+
+
+class TableSnapshot:
+    """
+    Declaring a snapshot of the state of a table in the middle of a round or between rounds, see Table.snapshot
+    The hands are copied but not the cards they hold, the shoe is kept as its bytes and its positions
+    """
+
+    def __init__(self, table, include_rng=False):
+        """
+        balance: the table's balance
+        opening_total: the money of the table and its players at the start of the round
+        drawn_cards: the cards drawn in the round
+        dealer_hand: a copy of the dealer's hand
+        players: the state of every player, with copies of his/her hands
+        shoe: the state of the shoe, see Shoe.snapshot
+        counter: the state of the table's counter, None if it has none
+        """
+        self.balance = table.balance
+        self.opening_total = table.opening_total
+        self.drawn_cards = list(table.drawn_cards)
+        self.dealer_hand = table.dealer.hand.copy()
+        self.players = [
+            {**player.__dict__, "hand": player.hand.copy(), "split_hand": [hand.copy() for hand in player.split_hand]}
+            for player in table.player_list
+        ]
+        self.shoe = table.shoe.snapshot(include_rng)
+        self.counter = None if table.counter is None else table.counter.snapshot()
 
 
 class Table:
     """Defining a table class"""
 
-    def __init__(self, number_of_player=1):
+    def __init__(self, number_of_player=1, strategy=None, rng=None, sink=None, shoe=None, counter=None, rules=None,
+                 place_stakes=True, balances=None):
         """
         dealer: a dealer for the table
-        balance: the amount of money the table made
+        balance: the amount of money the table made, in cents
+        opening_total: the money of the players when the table was made, the table and the players always add up to it,
+            see check_ledger
+        rules: the rules.Rules the table plays by, defaults to rules.DEFAULT_RULES
+        payout_rates: the payout of a settled hand for every status by the rules, see payout_rates
+        strategy: makes the stake, insurance and hand decisions, defaults to asking the user
+        rng: a random.Random used to shuffle a new shoe, defaults to the random module
+        sink: receives the events of the table, defaults to printing them on the command line
         player_list: a list of players for the table
-        shoe: a shoe contains 6 decks of shuffled cards except the once in the drawn_cards
+        shoe: a shoe.Shoe of the rules' decks of shuffled cards except the once in the drawn_cards,
+            a shoe can be given to keep using it round after round, it is shuffled when its cut card is reached
+        counter: a counting.CardCounter of the shoe, it counts every card drawn, None not to count,
+            it is reset before the stakes if the shoe has just been shuffled, so a stake can be sized by the count
         drawn_cards: contains cards that have been drawn out of the shoe
+        place_stakes: True to ask the strategy for the stake of every player now,
+            False to leave it to stake_steps, for a driver that answers the decisions itself
+        balances: the balance in cents every player starts with, so a bankroll can be carried from round to round,
+            defaults to STARTING_BALANCE for every player
         """
         self.dealer = Dealer()
         self.balance = 0
-        self.player_list = [Player(index, self) for index in range(number_of_player)]
-        self.shoe = Table.get_shoe()
+        self.rules = DEFAULT_RULES if rules is None else rules
+        self.payout_rates = payout_rates(self.rules)
+        self.strategy = InteractiveStrategy() if strategy is None else strategy
+        self.sink = ConsoleSink() if sink is None else sink
+        if balances is None:
+            self.player_list = [Player(index, self) for index in range(number_of_player)]
+        else:
+            self.player_list = [Player(index, self, balance) for index, balance in enumerate(balances)]
+        self.shoe = Shoe(decks=self.rules.decks, rng=rng) if shoe is None else shoe
+        self.shoe.start_round()
+        self.counter = counter
+        if counter is not None and counter.shuffles != self.shoe.shuffles:
+            counter.reset()
+        self.opening_total = sum(player.balance for player in self.player_list)
         self.drawn_cards = []
-        print()
+        if place_stakes:
+            for player in self.player_list:
+                player.set_hand_stake(player.hand, self)
+        self.sink.table_created(self)
 
     def __str__(self):
-        return_str = f"Table has a balance of ${self.balance}.\n"
+        return_str = f"Table has a balance of {money.format_money(self.balance)}.\n"
         # return_str += self.get_shoe_str()
         return_str += self.get_drawn_cards_str()
         return return_str
 
-    @staticmethod
-    def get_shoe():
-        """returns a shoe, 6 decks of card shuffled """
-        shoe = [
-            Card(rank, suit[0]) for suit in SUIT_LIST for rank in RANK_LIST
-        ]
-        shoe *= 6
-        shuffle(shoe)
-        return shoe
-
     def get_shoe_str(self):
         """prints the shoe out"""
         shoe_str = "SHOE:\n "
@@ -497,116 +640,225 @@ class Table:
         drawn_cards_str += f" size:{len(self.drawn_cards)}\n"
         return drawn_cards_str
 
-    def draw_card(self, hand):
+    def draw_card(self, hand, is_hole_card=False):
         """
-        Draws a card from the shoe and adds it to the drawn_cards as well as the hand's hand
-        prints hand after every draw to help the user know what card was drawn
+        Draws a card from the shoe and adds it to the drawn_cards as well as the hand's hand, and counts it
+        the draw is sent to the sink, the console sink prints the hand to help the user know what card was drawn
+        A hole card is face down, it is only counted and sent to the sink when it is revealed
         """
         card = self.shoe.pop()
-        hand.card_list.append(card)
         self.drawn_cards.append(card)
 
-        hand.set_value()
+        hand.add_card(card)
         hand.check_burst()
-        print(hand)
+        if is_hole_card:
+            if self.counter is not None:
+                self.counter.hide(card.code)
+        else:
+            if self.counter is not None:
+                self.counter.draw(card.code)
+            self.sink.draw(hand, card)
+
+    def reveal_hole_card(self):
+        """Turns the dealer's hole card face up, it is counted and sent to the sink like a drawn card"""
+        card = self.dealer.hand.card_list[1]
+        if self.counter is not None:
+            self.counter.reveal(card.code)
+        self.sink.draw(self.dealer.hand, card)
+
+    def snapshot(self, include_rng=False):
+        """
+        returns a TableSnapshot of the table, restore sets the table back to it as many times as needed
+        include_rng: True to also keep the state of the shoe's rng, see Shoe.snapshot
+        The strategy, the sink and the rules are not part of the state, nor are the steps of a round being run,
+        a round is branched by restoring a snapshot taken before it and replaying it, see whatif
+        """
+        return TableSnapshot(self, include_rng)
+
+    def restore(self, snapshot):
+        """
+        Sets the table back to a snapshot, the players and the dealer are the same objects with copies of their hands
+        The players of the snapshot must be the players of the table
+        """
+        self.balance = snapshot.balance
+        self.opening_total = snapshot.opening_total
+        self.drawn_cards = list(snapshot.drawn_cards)
+        self.dealer.hand = snapshot.dealer_hand.copy()
+        for player, state in zip(self.player_list, snapshot.players):
+            player.__dict__.update(state)
+            player.hand = state["hand"].copy()
+            player.split_hand = [hand.copy() for hand in state["split_hand"]]
+        self.shoe.restore(snapshot.shoe)
+        if self.counter is not None and snapshot.counter is not None:
+            self.counter.restore(snapshot.counter)
+
+    def run(self, steps):
+        """
+        Drives a generator of steps, the ones of a round or of any part of it
+        The steps yield every decision as the name of a strategy method and its arguments,
+        run answers each with the table's strategy, a driver awaiting the answers can run the same steps
+        return: the value the steps return
+        """
+        answer = None
+        try:
+            while True:
+                name, arguments = steps.send(answer)
+                answer = getattr(self.strategy, name)(*arguments)
+        except StopIteration as stop:
+            return stop.value
+
+    def stake_steps(self):
+        """The steps of staking the hand of every player, a generator yielding every stake decision, see run"""
+        for player in self.player_list:
+            stake = yield "stake", (player, player.hand, self, False)
+            player.set_hand_stake(player.hand, self, stake=stake)
+
+    def play_round(self):
+        """Plays a full round on the table, from the first serve to paying all the hands"""
+        self.run(self.round_steps())
+
+    def round_steps(self):
+        """The steps of play_round, a generator yielding every decision for the strategy, see run"""
+        yield from self.play_steps()
+        self.pay_all_active_standing_players()
+        self.end_round()
+
+    def play_steps(self):
+        """
+        The steps of a round till its hands are settled, from the first serve to paying the insurances,
+        so the hands of many tables can be settled together, see settlement
+        """
+        self.first_serve()
+        yield from self.blackjack_or_insure_players_steps()
+        yield from self.players_decide_steps()
+        self.dealer_draw_card()
+        self.pay_insurance()
+
+    def end_round(self):
+        """
+        Checks the ledger, sends the end of the round to the sink
+        and moves the drawn cards of the round to the shoe's discard tray
+        """
+        self.check_ledger()
+        self.sink.round_end(self)
+        self.shoe.discard(len(self.drawn_cards))
 
     def first_serve(self):
-        """Serving the players a pair of card and the dealer one card from the shoe"""
+        """
+        Serving the players a pair of card and the dealer one card from the shoe
+        If the dealer peeks, he/she is also dealt a hole card
+        """
         for player in self.player_list:
             self.draw_card(player.hand)
         self.draw_card(self.dealer.hand)
         for player in self.player_list:
             self.draw_card(player.hand)
+        if self.rules.peek:
+            self.draw_card(self.dealer.hand, is_hole_card=True)
 
     def blackjack_or_insure_players(self):
         """
         checks if player can have blackjack
-        which can happen only when the dealer's first card is not an ace
+        which can happen only when the dealer's first card is not an ace, or the dealer has peeked
         if it is an ace, allows the players to decide if he/she wants insure
+        If the dealer peeks and has a blackjack, every hand is settled right away, a player blackjack pushes
         """
-        if self.dealer.hand.card_list[0].rank != RANK_LIST[0]:
-            for player in self.player_list:
-                if player.hand.value == 21:
-                    player.hand.status = STATUS_LIST[7]
-                    self.payout(player.hand)
-        else:
+        self.run(self.blackjack_or_insure_players_steps())
+
+    def blackjack_or_insure_players_steps(self):
+        """The steps of blackjack_or_insure_players, a generator yielding every insurance decision, see run"""
+        is_ace_up = self.dealer.hand.card_list[0].rank == RANK_LIST[0]
+        if is_ace_up:
             for player in self.player_list:
                 # do you want insurance
-                player.insure(self)
+                yield from player.insure_steps(self)
+
+        if self.rules.peek and self.dealer.hand.is_blackjack:
+            self.reveal_hole_card()
+            for player in self.player_list:
+                player.hand.status = HandStatus.PUSH if player.hand.is_blackjack else HandStatus.LOST_BY_LESS_DEALER
+                self.payout(player.hand)
+            return
+
+        if not is_ace_up or self.rules.peek:
+            for player in self.player_list:
+                if player.hand.is_blackjack:
+                    player.hand.status = HandStatus.BLACK_JACK
+                    self.payout(player.hand)
 
     def players_decide(self):
         """Lets all the active, not standing and not blackjacked player decide"""
+        self.run(self.players_decide_steps())
+
+    def players_decide_steps(self):
+        """The steps of players_decide, a generator yielding every decision for the strategy, see run"""
         for player in self.player_list:
-            player.decide(self)
+            yield from player.decide_steps(self)
 
     def are_all_active_hands_standing(self):
         """
         Checks if all active hands are standing
         returns: True if all active hand are standing
         """
-        is_standing_list = []
         for player in self.player_list:
-            if not player.is_split:
-                if player.hand.is_active:
-                    is_standing_list.append(player.hand.is_standing)
-            else:
-                for hand in player.split_hand:
-                    if hand.is_active:
-                        is_standing_list.append(hand.is_standing)
-
-        return all(is_standing_list)
+            for hand in (player.split_hand if player.is_split else (player.hand,)):
+                if hand.is_active and not hand.is_standing:
+                    return False
+        return True
 
     def pay_all_active_standing_players(self):
-        """Pay out all active standing hands and makes them inactive """
+        """Pay out all active standing hands and makes them inactive, see settle"""
         if self.are_all_active_hands_standing():
-            for player in self.player_list:
-                if not player.is_split:
-                    if player.hand.is_active:
-                        self.dealer.compare_player_hand(player.hand)
-                        self.payout(player.hand)
+            self.settle()
+
+    def settle(self):
+        """
+        Settles every active hand against the dealer's hand in one pass, like compare_player_hand and payout,
+        each hand is sent to the sink with its payout, and every player is credited once with all of his/her hands
+        """
+        dealer_value = self.dealer.hand.value
+        dealer_bust_status = HandStatus.WON_BY_DEALER_BUST if dealer_value > 21 else None
+        rates = self.payout_rates
+        sink_payout = self.sink.payout
+        for player in self.player_list:
+            credit = 0
+            for hand in (player.split_hand if player.is_split else (player.hand,)):
+                if not hand.is_active:
+                    continue
+                if dealer_bust_status is None:
+                    value = hand._value
+                    status = SETTLED_STATUSES[(dealer_value > value) - (dealer_value < value)]
                 else:
-                    for hand_index in range(len(player.split_hand)):
-                        if player.split_hand[hand_index].is_active:
-                            self.dealer.compare_player_hand(player.split_hand[hand_index])
-                            self.payout(player.split_hand[hand_index])
+                    status = dealer_bust_status
+                hand.status = status
+                # a hand settled against the dealer is won, lost or pushed, paid a whole multiple of its stake
+                hand.stake *= rates[status][0]
+                sink_payout(hand)
+                credit += hand.stake
+                hand.stake = 0
+                hand.is_active = False
+            if credit:
+                player.balance += credit
+                self.balance -= credit
 
     def payout(self, hand):
         """
-        This pays the hand's stake based on the status
+        This pays the hand's stake based on the status, by the payout_rates of the rules
         Sets hand's is active to False after paying
-        """
-        black_jack_rate = 1.5
-        win_rate = 1
-        loss_rate = -1
-        push_rate = 0
-        surrender_rate = -.5
-
-        if hand.is_active:
-            if (hand.status == STATUS_LIST[7]) and hand.is_active:
-                hand.stake += (hand.stake * black_jack_rate)
-                print(f"{hand} won by BLACK JACK. Congratulations!")
-            elif (hand.status == STATUS_LIST[6]) and hand.is_active:
-                hand.stake += (hand.stake * win_rate)
-                print(f"{hand} won by beating the dealer. Congratulations!")
-            elif (hand.status == STATUS_LIST[5]) and hand.is_active:
-                hand.stake += (hand.stake * win_rate)
-                print(f"{hand} won by dealer bust. Congratulations!")
-            elif (hand.status == STATUS_LIST[4]) and hand.is_active:
-                hand.stake += (hand.stake * loss_rate)
-                print(f"{hand} lost to the dealer. Try Again!")
-            elif (hand.status == STATUS_LIST[3]) and hand.is_active:
-                hand.stake += (hand.stake * loss_rate)
-                print(f"{hand} lost by busting. Try Again!")
-            elif (hand.status == STATUS_LIST[2]) and hand.is_active:
-                hand.stake += (hand.stake * surrender_rate)
-                print(f"{hand} lost by surrendering. Try Again!")
-            elif (hand.status == STATUS_LIST[1]) and hand.is_active:
-                hand.stake += (hand.stake * push_rate)
-                print(f"{hand} pushed. Try Again!")
-
-            if hand.status != STATUS_LIST[0]:
-                self.credit_hand(hand)
-                hand.is_active = False
+        A win doubles the stake, a loss takes it, a push gives it back, all in whole cents,
+        a blackjack and a surrender are paid by a ratio of integers, a payout that isn't a whole number of cents
+        is rounded by the rules
+        """
+        if hand.is_active and hand.status:
+            multiplier, numerator, denominator = self.payout_rates[hand.status]
+            stake = hand.stake
+            if numerator:
+                hand.stake = stake * multiplier + money.scale(stake, numerator, denominator, self.rules.payout_rounding)
+            else:
+                hand.stake = stake * multiplier
+            self.sink.payout(hand)
+            self.credit_hand(hand)
+            hand.is_active = False
 
     def credit_hand(self, hand):
         """credits the player's balance with the hand stake and from table balance"""
@@ -617,37 +869,59 @@ class Table:
     def credit_insurance(self, player):
         """Credits the player's balance from the table balance with the hand stake"""
         self.player_list[player.index].balance += player.insurance
-        print(player.insurance)
+        self.sink.insurance_payout(player)
         self.balance -= player.insurance
         player.insurance = 0
 
-    def print_players_info(self):
-        """Prints all players info"""
+    def ledger_total(self):
+        """returns the money of the table and its players, the stakes and insurances are in the table's balance"""
+        total = self.balance
         for player in self.player_list:
-            player.print_info()
-        print()
+            total += player.balance
+        return total
+
+    def check_ledger(self):
+        """Raises money.LedgerError if the table and its players don't add up to the money they started with"""
+        total = self.ledger_total()
+        if total != self.opening_total:
+            raise money.LedgerError(f"the table and its players have {money.format_money(total)}, "
+                                    f"they started with {money.format_money(self.opening_total)}")
+
+    def print_players_info(self):
+        """Sends all players info to the sink, the console sink prints it"""
+        self.sink.players_info(self)
 
     def dealer_draw_card(self):
-        """This draws a card for the dealer till he/she reach 17 or bursts"""
-        print()
-        while self.dealer.hand.value < 17:
-            self.draw_card(self.dealer.hand)
-        print()
+        """
+        This reveals the dealer's hole card if there is one still face down,
+        and draws a card for the dealer till he/she reach 17 or bursts, a soft 17 is hit if the rules say so
+        """
+        self.sink.dealer_draw_start(self)
+        dealer_hand = self.dealer.hand
+        if self.rules.peek and not dealer_hand.is_blackjack:
+            self.reveal_hole_card()
+        hit_soft_17 = self.rules.hit_soft_17
+        while dealer_hand.value < 17 or (hit_soft_17 and dealer_hand.value == 17 and dealer_hand.is_soft):
+            self.draw_card(dealer_hand)
+        self.sink.dealer_draw_end(self)
 
     def pay_insurance(self):
         """
         This pays the player's balance based on the dealer having a blackjack or not
         """
-        insurance_rate = 1 if len(self.dealer.hand.card_list) == 2 and self.dealer.hand.value == 21 else -1
+        insurance_rate = money.ratio(self.rules.insurance_payout) if self.dealer.hand.is_blackjack else (-1, 1)
 
         for player in self.player_list:
             if player.is_insured:
-                player.insurance += (player.insurance * insurance_rate)
+                player.insurance += money.scale(player.insurance, *insurance_rate, self.rules.payout_rounding)
                 self.credit_insurance(player)
 
 
-def start_game():
-    """This starts the game by creating a table for the game, a dealer and a list of players"""
+def start_game(sink=None):
+    """
+    This starts the game by creating a table for the game, a dealer and a list of players
+    sink: receives the events of the table, defaults to printing them on the command line, see Table
+    """
 
     """
     The algorithm of the game is:
@@ -675,12 +949,7 @@ def start_game():
     input_range = range(1, 7)
     no_players = input_handler.get_input_int(input_message, error_massage=error_massage, input_range=input_range)
     print()
-    table = Table(no_players)
-    table.first_serve()
-    table.blackjack_or_insure_players()
-    table.players_decide()
-    table.dealer_draw_card()
-    table.pay_insurance()
-    table.pay_all_active_standing_players()
+    table = Table(no_players, sink=sink)
+    table.play_round()
     table.print_players_info()
     print(table)
@@ -0,0 +1,80 @@
+"""
+This is a module with the cards of the game
+Every card has an integer code, rank index + 13 * suit index, the lookup tables below are indexed by it
+"""
+
+# The possible ranks of a card
+RANK_LIST = [
+    "A",
+    "2",
+    "3",
+    "4",
+    "5",
+    "6",
+    "7",
+    "8",
+    "9",
+    "10",
+    "J",
+    "Q",
+    "K",
+]
+
+# The possible suits of a card
+SUIT_LIST = [
+    "HEART",
+    "DIAMOND",
+    "SPADE",
+    "CLUB",
+]
+
+# The first letter of each suit, the suit of a card
+SUIT_INITIALS = [suit[0] for suit in SUIT_LIST]
+
+# The value of each rank, an ace is 11 till the hand it is in is valued
+RANK_VALUES = {
+    "A": 11,
+    "2": 2,
+    "3": 3,
+    "4": 4,
+    "5": 5,
+    "6": 6,
+    "7": 7,
+    "8": 8,
+    "9": 9,
+    "10": 10,
+    "J": 10,
+    "Q": 10,
+    "K": 10,
+}
+
+
+class Card:
+    """
+    Declaring a card class having a rank and suit
+    A card is small and uses __slots__, cards of a compact shoe are shared views from CARDS,
+    so a card is never changed, its value is looked up by its code in CARD_VALUES and CARD_HARD_VALUES
+    """
+
+    __slots__ = ("rank", "suit", "code")
+
+    def __init__(self, rank, suit):
+        """
+        code: the integer code of the card, rank index + 13 * suit index, see CARDS
+        """
+        self.rank = rank
+        self.suit = suit
+        self.code = RANK_LIST.index(rank) + 13 * SUIT_INITIALS.index(suit[0])
+
+    def __str__(self):
+        return f"{self.rank}^{self.suit} "
+
+
+# One card for each code, CARDS[code] is the card with that code, shared by all compact shoes
+CARDS = tuple(Card(rank, suit[0]) for suit in SUIT_LIST for rank in RANK_LIST)
+
+# The value of the card of each code, an ace is 11
+CARD_VALUES = bytes(RANK_VALUES[card.rank] for card in CARDS)
+
+# The hard value of the card of each code, an ace is 1, a hand adds these up as cards are drawn
+CARD_HARD_VALUES = bytes(1 if card.rank == "A" else RANK_VALUES[card.rank] for card in CARDS)
@@ -0,0 +1,206 @@
+"""
+This is a module for counting cards
+A counting system gives every rank a tag, the running count is the sum of the tags of the cards dealt
+since the shoe was shuffled, and the true count is the running count per deck left in the shoe
+A CardCounter keeps the running counts of several systems, a table updates it on every card it draws,
+in constant time, and strategies read it from table.counter
+"""
+
+from cards import CARDS
+
+# The number of cards in a deck
+DECK_SIZE = len(CARDS)
+
+# The tags of the Hi-Lo system, a balanced system
+HI_LO_TAGS = {
+    "A": -1,
+    "2": 1,
+    "3": 1,
+    "4": 1,
+    "5": 1,
+    "6": 1,
+    "7": 0,
+    "8": 0,
+    "9": 0,
+    "10": -1,
+    "J": -1,
+    "Q": -1,
+    "K": -1,
+}
+
+# The tags of the Knock-Out system, an unbalanced system, a 7 is counted as a small card
+KO_TAGS = {
+    "A": -1,
+    "2": 1,
+    "3": 1,
+    "4": 1,
+    "5": 1,
+    "6": 1,
+    "7": 1,
+    "8": 0,
+    "9": 0,
+    "10": -1,
+    "J": -1,
+    "Q": -1,
+    "K": -1,
+}
+
+# The tags of the Omega II system, a balanced level 2 system, an ace is not counted
+OMEGA_II_TAGS = {
+    "A": 0,
+    "2": 1,
+    "3": 1,
+    "4": 2,
+    "5": 2,
+    "6": 2,
+    "7": 1,
+    "8": 0,
+    "9": -1,
+    "10": -2,
+    "J": -2,
+    "Q": -2,
+    "K": -2,
+}
+
+
+class CountingSystem:
+    """Declaring a counting system class, the tag of every card and where the running count starts"""
+
+    def __init__(self, rank_tags, initial_count=None):
+        """
+        rank_tags: the tag of each rank, a rank left out is tagged 0
+        initial_count: the running count of a freshly shuffled shoe, as a function of the number of decks,
+            defaults to 0 for a balanced system and to minus the tags of the decks but one for an unbalanced one,
+            so an unbalanced count like KO starts at 4 - 4 * decks
+        tags: the tag of the card of each code, see cards.CARDS
+        """
+        self.rank_tags = dict(rank_tags)
+        self.tags = tuple(self.rank_tags.get(card.rank, 0) for card in CARDS)
+        self._initial_count = initial_count
+
+    @property
+    def is_balanced(self):
+        """True if the tags of a full deck add up to 0"""
+        return sum(self.tags) == 0
+
+    def initial_count(self, decks):
+        """returns the running count of a freshly shuffled shoe of decks"""
+        if self._initial_count is not None:
+            return self._initial_count(decks)
+        return -sum(self.tags) * (decks - 1)
+
+
+# The counting systems known by name
+SYSTEMS = {
+    "hi_lo": CountingSystem(HI_LO_TAGS),
+    "ko": CountingSystem(KO_TAGS),
+    "omega_ii": CountingSystem(OMEGA_II_TAGS),
+}
+
+
+class CardCounter:
+    """
+    Declaring a card counter class, it counts the cards drawn from a shoe with several systems at once
+    The counts go back to the initial counts whenever the shoe is shuffled
+    """
+
+    def __init__(self, shoe, systems=None):
+        """
+        shoe: the shoe.Shoe the cards are drawn from
+        systems: the names of systems from SYSTEMS, or a dict from a name to a CountingSystem or to tags by rank,
+            defaults to all of SYSTEMS
+        names: the names of the systems, in the order of running_counts
+        running_counts: the running count of each system
+        shuffles: the number of shuffles of the shoe the counts are for
+        hidden_codes: the codes of the cards drawn face down and not revealed yet, like the dealer's hole card,
+            they are out of the shoe but not counted
+        """
+        if systems is None:
+            systems = SYSTEMS
+        if not isinstance(systems, dict):
+            systems = {name: SYSTEMS[name] for name in systems}
+        systems = {
+            name: system if isinstance(system, CountingSystem) else CountingSystem(system)
+            for name, system in systems.items()
+        }
+
+        self.shoe = shoe
+        self.systems = systems
+        self.names = tuple(systems)
+        self.indexes = {name: index for index, name in enumerate(self.names)}
+        self.tags = tuple(system.tags for system in systems.values())
+        self.running_counts = [0] * len(self.names)
+        self.shuffles = None
+        self.hidden_codes = []
+        self.reset()
+
+    def __str__(self):
+        return " | ".join(f"{name} => {self.running_count(name)} ({self.true_count(name):+.2f})"
+                          for name in self.names)
+
+    def reset(self):
+        """
+        sets the counts back to the initial counts and counts every card drawn since the shoe was shuffled,
+        but the cards still face down
+        """
+        shoe = self.shoe
+        self.shuffles = shoe.shuffles
+        self.running_counts = [system.initial_count(shoe.decks) for system in self.systems.values()]
+        # After a shuffle the shoe's codes start with the cards still on the table, if any
+        drawn_codes = shoe.codes[:shoe.position]
+        # a face down card is only still hidden if it is on the table, a shuffle of the whole shoe took it back
+        in_play = list(shoe.codes[shoe.discarded:shoe.position])
+        hidden_codes = []
+        for code in self.hidden_codes:
+            if code in in_play:
+                in_play.remove(code)
+                hidden_codes.append(code)
+        self.hidden_codes = hidden_codes
+        for index, tags in enumerate(self.tags):
+            self.running_counts[index] += sum(tags[code] for code in drawn_codes) \
+                - sum(tags[code] for code in hidden_codes)
+
+    def draw(self, code):
+        """counts a card that has just been drawn from the shoe, by its code"""
+        if self.shoe.shuffles != self.shuffles:
+            # the card is counted by reset, it is already out of the shoe
+            self.reset()
+            return
+        running_counts = self.running_counts
+        for index, tags in enumerate(self.tags):
+            running_counts[index] += tags[code]
+
+    def hide(self, code):
+        """keeps a card drawn face down from being counted till it is revealed, by its code"""
+        self.hidden_codes.append(code)
+        if self.shoe.shuffles != self.shuffles:
+            self.reset()
+
+    def reveal(self, code):
+        """counts a card drawn face down that has just been turned over, by its code"""
+        if code in self.hidden_codes:
+            self.hidden_codes.remove(code)
+        self.draw(code)
+
+    def snapshot(self):
+        """returns the state of the counter, to restore it later"""
+        return tuple(self.running_counts), self.shuffles, tuple(self.hidden_codes)
+
+    def restore(self, snapshot):
+        """sets the counter back to a state returned by snapshot"""
+        running_counts, self.shuffles, hidden_codes = snapshot
+        self.running_counts = list(running_counts)
+        self.hidden_codes = list(hidden_codes)
+
+    @property
+    def decks_remaining(self):
+        """the number of decks left in the shoe, at least one card so the true count is always defined"""
+        return max(len(self.shoe), 1) / DECK_SIZE
+
+    def running_count(self, name="hi_lo"):
+        """returns the running count of a system"""
+        return self.running_counts[self.indexes[name]]
+
+    def true_count(self, name="hi_lo"):
+        """returns the running count of a system per deck left in the shoe"""
+        return self.running_counts[self.indexes[name]] / self.decks_remaining
@@ -0,0 +1,203 @@
+"""
+This is a module for a vectorized Monte Carlo of the dealer's hand, it needs numpy
+Many independent dealer hands are dealt at once, each from its own freshly shuffled shoe,
+and played like Table.dealer_draw_card, drawing till 17 or more, or hitting a soft 17 if hit_soft_17 is True
+It gives the distribution of the dealer's final hand for each upcard
+"""
+
+import numpy as np
+
+from blackjack import Hand
+from cards import CARDS, CARD_HARD_VALUES
+
+# The possible outcomes of the dealer's hand, the columns of a distribution
+OUTCOME_LIST = [
+    "17",
+    "18",
+    "19",
+    "20",
+    "21",
+    "BUST",
+    "BLACK_JACK",
+]
+
+# The upcards of the dealer by hard value, the rows of a distribution, 10 stands for 10, J, Q and K
+UPCARD_LIST = ["A", "2", "3", "4", "5", "6", "7", "8", "9", "10"]
+
+# The most cards a dealer hand can take, A A A A A A A 5 A A A A and any card when hitting a soft 17
+DEALER_MAX_CARDS = 13
+
+# The number of cards of each hard value, 1 to 10, in a single deck
+DECK_HARD_COUNTS = np.bincount(np.frombuffer(CARD_HARD_VALUES, dtype=np.uint8), minlength=11)[1:]
+
+
+def deal_shoe_prefixes(hands, decks=6, length=DEALER_MAX_CARDS, upcard=None, rng=None):
+    """
+    Deals the first cards of many independently shuffled shoes
+    Every card is drawn without replacement from what is left of its own shoe,
+    so each row is exactly the start of a uniformly shuffled shoe
+    hands: the number of shoes
+    decks: the number of decks in each shoe
+    length: the number of cards dealt from each shoe
+    upcard: the hard value, 1 to 10, of the first card of every shoe, random if None
+    rng: a numpy Generator, defaults to a new unseeded one
+    return: a (hands, length) uint8 array of the hard values of the cards, 1 for an ace
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+
+    counts = np.tile(DECK_HARD_COUNTS.astype(np.int32) * decks, (hands, 1))
+    prefixes = np.empty((hands, length), dtype=np.uint8)
+    rows = np.arange(hands)
+    remaining = 52 * decks
+    start = 0
+    if upcard is not None:
+        prefixes[:, 0] = upcard
+        counts[:, upcard - 1] -= 1
+        remaining -= 1
+        start = 1
+
+    for column in range(start, length):
+        picks = rng.integers(0, remaining, size=hands)
+        hard_values = (counts.cumsum(axis=1) <= picks[:, None]).sum(axis=1)
+        counts[rows, hard_values] -= 1
+        prefixes[:, column] = hard_values + 1
+        remaining -= 1
+
+    return prefixes
+
+
+def _is_drawing(hard, has_ace, hit_soft_17):
+    """returns a mask of the dealer hands that draw another card, from their hard totals and aces"""
+    is_soft = has_ace & (hard <= 11)
+    value = np.where(is_soft, hard + 10, hard)
+    if hit_soft_17:
+        return (value < 17) | ((value == 17) & is_soft)
+    return value < 17
+
+
+def deal_dealer_hands(hands, decks=6, upcard=None, rng=None, hit_soft_17=False):
+    """
+    Deals shoe prefixes like deal_shoe_prefixes, but only the cards the dealer draws,
+    a column is dealt only to the hands still drawing, which is much less work than dealing every column
+    return: a (hands, DEALER_MAX_CARDS) uint8 array of hard values, 0 after the last card the dealer drew
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+
+    counts = np.tile(DECK_HARD_COUNTS.astype(np.int32) * decks, (hands, 1))
+    prefixes = np.zeros((hands, DEALER_MAX_CARDS), dtype=np.uint8)
+    remaining = 52 * decks
+    if upcard is None:
+        first = (counts.cumsum(axis=1) <= rng.integers(0, remaining, size=hands)[:, None]).sum(axis=1)
+    else:
+        first = np.full(hands, upcard - 1)
+    counts[np.arange(hands), first] -= 1
+    prefixes[:, 0] = first + 1
+    remaining -= 1
+
+    hard = prefixes[:, 0].astype(np.int16)
+    has_ace = prefixes[:, 0] == 1
+    drawing = np.arange(hands)
+    for column in range(1, DEALER_MAX_CARDS):
+        still_drawing = _is_drawing(hard, has_ace, hit_soft_17)
+        drawing = drawing[still_drawing]
+        if not len(drawing):
+            break
+        picks = rng.integers(0, remaining, size=len(drawing))
+        hard_values = (counts[drawing].cumsum(axis=1) <= picks[:, None]).sum(axis=1)
+        counts[drawing, hard_values] -= 1
+        prefixes[drawing, column] = hard_values + 1
+        hard = hard[still_drawing] + hard_values + 1
+        has_ace = has_ace[still_drawing] | (hard_values == 0)
+        remaining -= 1
+
+    return prefixes
+
+
+def dealer_outcomes(prefixes, hit_soft_17=False):
+    """
+    Plays a dealer hand on each row of prefixes, the first card being the upcard
+    The dealer draws till the value of the hand is 17 or more, a soft 17 stands unless hit_soft_17 is True
+    prefixes: a (hands, length) array of hard values of the cards, as from deal_shoe_prefixes
+    return: an array of the index in OUTCOME_LIST of each hand's outcome
+    """
+    prefixes = np.asarray(prefixes)
+    hands, length = prefixes.shape
+    hard = prefixes[:, 0].astype(np.int16)
+    has_ace = prefixes[:, 0] == 1
+    cards = np.ones(hands, dtype=np.int8)
+    value = np.where(has_ace & (hard <= 11), hard + 10, hard)
+
+    for column in range(1, length):
+        drawing = _is_drawing(hard, has_ace, hit_soft_17)
+        if not drawing.any():
+            break
+        card = prefixes[:, column]
+        hard = np.where(drawing, hard + card, hard)
+        has_ace |= drawing & (card == 1)
+        cards += drawing
+        value = np.where(has_ace & (hard <= 11), hard + 10, hard)
+    else:
+        if _is_drawing(hard, has_ace, hit_soft_17).any():
+            raise ValueError(f"{length} cards are not enough to finish every dealer hand")
+
+    outcomes = np.clip(value - 17, 0, 4)
+    outcomes[value > 21] = OUTCOME_LIST.index("BUST")
+    outcomes[(value == 21) & (cards == 2)] = OUTCOME_LIST.index("BLACK_JACK")
+    return outcomes
+
+
+def dealer_distribution(hands, decks=6, upcard=None, seed=None, chunk_size=1_000_000, hit_soft_17=False):
+    """
+    Deals and plays many dealer hands in chunks, to keep the memory bounded
+    hands: the number of dealer hands
+    decks: the number of decks in each shoe
+    upcard: the hard value, 1 to 10, of every upcard, random if None
+    seed: the seed of the numpy Generator, the same seed gives the same distribution
+    hit_soft_17: True if the dealer hits a soft 17, as for rules.Rules.hit_soft_17
+    return: a (10, 7) int64 array, the number of hands for each upcard (UPCARD_LIST) and outcome (OUTCOME_LIST)
+    """
+    rng = np.random.default_rng(seed)
+    counts = np.zeros((len(UPCARD_LIST), len(OUTCOME_LIST)), dtype=np.int64)
+
+    for start in range(0, hands, chunk_size):
+        prefixes = deal_dealer_hands(min(chunk_size, hands - start), decks=decks, upcard=upcard, rng=rng,
+                                     hit_soft_17=hit_soft_17)
+        outcomes = dealer_outcomes(prefixes, hit_soft_17)
+        cells = (prefixes[:, 0].astype(np.intp) - 1) * len(OUTCOME_LIST) + outcomes
+        counts += np.bincount(cells, minlength=counts.size).reshape(counts.shape)
+
+    return counts
+
+
+def probabilities(counts):
+    """returns the distribution counts as probabilities, each upcard's row adding up to 1"""
+    totals = counts.sum(axis=1, keepdims=True)
+    return np.divide(counts, totals, out=np.zeros(counts.shape), where=totals > 0)
+
+
+def scalar_dealer_outcome(prefix, hit_soft_17=False):
+    """
+    Plays the dealer hand of a single row of prefixes with the Hand class, to cross-check dealer_outcomes
+    return: the index in OUTCOME_LIST of the outcome
+    """
+    hand = Hand()
+    cards = iter(prefix)
+    # The code of the card with a hard value is the value - 1, see blackjack.CARDS
+    hand.add_card(CARDS[int(next(cards)) - 1])
+    while hand.value < 17 or (hit_soft_17 and hand.value == 17 and hand.is_soft):
+        hand.add_card(CARDS[int(next(cards)) - 1])
+
+    if hand.value > 21:
+        return OUTCOME_LIST.index("BUST")
+    if hand.is_blackjack:
+        return OUTCOME_LIST.index("BLACK_JACK")
+    return hand.value - 17
+
+
+def check_against_scalar(prefixes, hit_soft_17=False):
+    """returns the indices of the rows where dealer_outcomes and the Hand class disagree, empty if none"""
+    outcomes = dealer_outcomes(prefixes, hit_soft_17)
+    return [row for row, prefix in enumerate(prefixes)
+            if scalar_dealer_outcome(prefix, hit_soft_17) != outcomes[row]]
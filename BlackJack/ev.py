@@ -0,0 +1,288 @@
+"""
+This is a module computing the expected value of every choice of a hand
+It works on the composition of the shoe, the number of cards of each hard value left, index 0 for aces and 9 for tens,
+so the expected values are exact for the cards actually left in a table's shoe, not a Monte Carlo estimate
+The dealer's outcomes are memoized by (dealer hard total, softness, composition, hit soft 17) in a bounded LRU cache,
+which is shared by every table and by the basic strategy, so rules that differ in anything but how the dealer draws
+share all of their dealer outcomes
+Expected values are for a rules.Rules, the default rules if none is given
+"""
+
+from functools import lru_cache
+
+from cards import CARD_HARD_VALUES
+from rules import DEFAULT_RULES
+
+# The most dealer outcomes kept in the cache, the least recently used are dropped after that
+DEALER_CACHE_SIZE = 100_000
+
+# The most cards a dealer can draw after the upcard, A A A A A A 5 A A A A and any card after an ace
+# when the dealer hits a soft 17, one less when he/she stands on it
+DEALER_MAX_CARDS = 12
+
+# The index in a composition of the card giving the dealer a blackjack, by the index of the upcard
+BLACKJACK_HOLE_CARD = {0: 9, 9: 0}
+
+# The expected value of surrendering a hand
+SURRENDER_EV = -0.5
+
+
+def hand_value(hard_total, has_ace):
+    """returns the value of a hand from its hard total, an ace is counted as 11 if it doesn't bust the hand"""
+    return hard_total + 10 if has_ace and hard_total <= 11 else hard_total
+
+
+def remove_card(composition, index):
+    """returns the composition with one card of the hard value index + 1 removed"""
+    return composition[:index] + (composition[index] - 1,) + composition[index + 1:]
+
+
+def dealer_stands(hard_total, has_ace, hit_soft_17=False):
+    """True if the dealer stands on a hand, on 17 or more, but not on a soft 17 if he/she hits it"""
+    value = hand_value(hard_total, has_ace)
+    if value == 17 and hit_soft_17:
+        return hard_total == value
+    return value >= 17
+
+
+@lru_cache(maxsize=None)
+def dealer_draws(hard_total, has_ace, hit_soft_17=False):
+    """
+    Lists every set of cards the dealer can draw from a hand till 17 or more, or 18 or more from a soft 17
+    The probability of drawing a set of cards is the same in every order, so the dealer's outcomes
+    for any composition are a sum over these sets instead of a walk over every order the cards can come in
+    return: a list of (outcome, number of cards, number of orders the dealer can draw them in,
+        ((hard value index, count), ...)), outcome is the index in 17, 18, 19, 20, 21 and bust
+    """
+    draws = {}
+    drawn = [0] * 10
+
+    def draw(hand_hard_total, hand_has_ace):
+        if dealer_stands(hand_hard_total, hand_has_ace, hit_soft_17):
+            value = hand_value(hand_hard_total, hand_has_ace)
+            key = tuple(drawn)
+            if key in draws:
+                draws[key][2] += 1
+            else:
+                draws[key] = [5 if value > 21 else value - 17, sum(drawn), 1]
+            return
+        for index in range(10):
+            drawn[index] += 1
+            draw(hand_hard_total + index + 1, hand_has_ace or index == 0)
+            drawn[index] -= 1
+
+    draw(hard_total, has_ace)
+    return [(outcome, cards, orders, tuple((index, count) for index, count in enumerate(key) if count))
+            for key, (outcome, cards, orders) in draws.items()]
+
+
+@lru_cache(maxsize=DEALER_CACHE_SIZE)
+def dealer_outcomes(hard_total, has_ace, composition, hit_soft_17=False):
+    """
+    returns the probabilities of the dealer ending on 17, 18, 19, 20, 21 and bust,
+    drawing without replacement from composition till 17 or more
+    hard_total, has_ace: the dealer's hand so far
+    composition: the cards left in the shoe
+    hit_soft_17: True if the dealer hits a soft 17
+    """
+    # falling[index][count] is the number of ordered ways to draw count cards of a hard value from the composition
+    falling = []
+    for available in composition:
+        ways = [1]
+        for count in range(DEALER_MAX_CARDS):
+            ways.append(ways[-1] * max(available - count, 0))
+        falling.append(ways)
+    total = sum(composition)
+    total_ways = [1]
+    for count in range(DEALER_MAX_CARDS):
+        total_ways.append(total_ways[-1] * max(total - count, 0))
+
+    outcomes = [0.0] * 6
+    for outcome, cards, orders, counts in dealer_draws(hard_total, has_ace, hit_soft_17):
+        ways = orders
+        for index, count in counts:
+            ways *= falling[index][count]
+        if ways:
+            outcomes[outcome] += ways / total_ways[cards]
+    return tuple(outcomes)
+
+
+@lru_cache(maxsize=DEALER_CACHE_SIZE)
+def _peeked_dealer_outcomes(upcard, composition, hit_soft_17):
+    """the outcomes of a dealer who has peeked and doesn't have a blackjack, his/her hole card is anything else"""
+    hole_card = BLACKJACK_HOLE_CARD[upcard - 1]
+    total = sum(composition) - composition[hole_card]
+    outcomes = [0.0] * 6
+    for index, count in enumerate(composition):
+        if count and index != hole_card:
+            drawn = dealer_outcomes(upcard + index + 1, upcard == 1 or index == 0,
+                                    remove_card(composition, index), hit_soft_17)
+            for outcome in range(6):
+                outcomes[outcome] += count / total * drawn[outcome]
+    return tuple(outcomes)
+
+
+def upcard_outcomes(upcard, composition, rules=DEFAULT_RULES):
+    """
+    returns the probabilities of the dealer ending on 17, 18, 19, 20, 21 and bust from an upcard, by the rules
+    If the dealer peeks for blackjack, the outcomes are for the hands he/she plays on, the ones without a blackjack
+    upcard: the hard value of the upcard, 1 for an ace
+    composition: the cards left in the shoe, without the upcard
+    """
+    if rules.peek and upcard - 1 in BLACKJACK_HOLE_CARD:
+        return _peeked_dealer_outcomes(upcard, composition, rules.hit_soft_17)
+    return dealer_outcomes(upcard, upcard == 1, composition, rules.hit_soft_17)
+
+
+class HandAnalysis:
+    """
+    Declaring a class computing the expected values of the choices of a player's hand against a dealer upcard
+    Every expected value is for a stake of 1, the player's cards are drawn without replacement from the composition
+    The dealer's outcomes are computed exactly for the composition of every hand up to exact_depth cards
+    drawn by the player, deeper hands reuse the dealer's outcomes of the composition the analysis started from,
+    this keeps an answer to milliseconds and the error is tiny for a shoe of several decks
+    """
+
+    def __init__(self, upcard, exact_depth=2, rules=DEFAULT_RULES):
+        """
+        upcard: the hard value of the dealer's upcard, 1 for an ace
+        exact_depth: the number of cards drawn by the player the dealer's outcomes are exact for, None for all
+        rules: the rules.Rules the hands are played by
+        root_composition: the composition the analysis started from, set by the first call of choices or split
+        best_cache: the expected value of the best choice of a hand, by (hard total, has ace, composition)
+        """
+        self.upcard = upcard
+        self.exact_depth = exact_depth
+        self.rules = rules
+        self.root_composition = None
+        self.best_cache = {}
+
+    def _draws(self, composition, depth):
+        """yields the probability, hard value index, composition and dealer composition after drawing each card"""
+        total = sum(composition)
+        is_exact = self.exact_depth is None or depth < self.exact_depth
+        for index, count in enumerate(composition):
+            if count:
+                remaining = remove_card(composition, index)
+                yield count / total, index, remaining, remaining if is_exact else self.root_composition
+
+    def stand(self, hard_total, has_ace, dealer_composition):
+        """the expected value of standing"""
+        value = hand_value(hard_total, has_ace)
+        if value > 21:
+            return -1.0
+        dealer = upcard_outcomes(self.upcard, dealer_composition, self.rules)
+        expected_value = dealer[5]
+        for outcome in range(5):
+            if value > outcome + 17:
+                expected_value += dealer[outcome]
+            elif value < outcome + 17:
+                expected_value -= dealer[outcome]
+        return expected_value
+
+    def hit(self, hard_total, has_ace, composition, dealer_composition, depth=0):
+        """the expected value of hitting, then playing the best choice without doubling down"""
+        expected_value = 0.0
+        for probability, index, remaining, dealer_remaining in self._draws(composition, depth):
+            expected_value += probability * self.best(hard_total + index + 1, has_ace or index == 0,
+                                                      remaining, dealer_remaining, depth + 1)
+        return expected_value
+
+    def double_down(self, hard_total, has_ace, composition, dealer_composition, depth=0):
+        """the expected value of doubling the stake, drawing one card and standing"""
+        expected_value = 0.0
+        for probability, index, remaining, dealer_remaining in self._draws(composition, depth):
+            expected_value += probability * self.stand(hard_total + index + 1, has_ace or index == 0,
+                                                       dealer_remaining)
+        return 2 * expected_value
+
+    def best(self, hard_total, has_ace, composition, dealer_composition, depth):
+        """
+        the expected value of the best choice of a hand of three cards or more, 21 always stands,
+        it can't double down and surrenders only if the rules allow it at any time
+        """
+        key = (hard_total, has_ace, composition)
+        if key not in self.best_cache:
+            value = hand_value(hard_total, has_ace)
+            if value > 21:
+                self.best_cache[key] = -1.0
+            elif value == 21:
+                self.best_cache[key] = self.stand(hard_total, has_ace, dealer_composition)
+            else:
+                self.best_cache[key] = max(self.stand(hard_total, has_ace, dealer_composition),
+                                           self.hit(hard_total, has_ace, composition, dealer_composition, depth),
+                                           SURRENDER_EV if self.rules.surrender == "any" else -1.0)
+        return self.best_cache[key]
+
+    def choices(self, hard_total, has_ace, composition, can_double, dealer_composition=None, depth=0,
+                can_surrender=True):
+        """returns the expected value of standing, hitting, and surrendering and doubling down if it can"""
+        if self.root_composition is None:
+            self.root_composition = composition
+        if dealer_composition is None:
+            dealer_composition = composition
+        expected_values = {
+            'ST': self.stand(hard_total, has_ace, dealer_composition),
+            'HT': self.hit(hard_total, has_ace, composition, dealer_composition, depth),
+        }
+        if can_surrender:
+            expected_values['SU'] = SURRENDER_EV
+        if can_double:
+            expected_values['DD'] = self.double_down(hard_total, has_ace, composition, dealer_composition, depth)
+        return expected_values
+
+    def split(self, pair_value, composition):
+        """
+        the expected value of splitting a pair, for both hands
+        Each hand draws a card and plays its best choice, the hands are not split again,
+        and both are played as if the other hand's card had not been drawn
+        """
+        if self.root_composition is None:
+            self.root_composition = composition
+        rules = self.rules
+        expected_value = 0.0
+        for probability, index, remaining, dealer_remaining in self._draws(composition, 0):
+            hard_total, has_ace = pair_value + index + 1, pair_value == 1 or index == 0
+            value = hand_value(hard_total, has_ace)
+            if value == 21:
+                best = self.stand(hard_total, has_ace, dealer_remaining)
+            else:
+                can_double = rules.double_after_split and rules.can_double(value)
+                best = max(self.choices(hard_total, has_ace, remaining, can_double, dealer_remaining, 1,
+                                        rules.can_surrender(2, True)).values())
+            expected_value += probability * best
+        return 2 * expected_value
+
+
+def hand_expected_values(hand, table, exact_depth=2):
+    """
+    Computes the expected value of every possible choice of a hand at a live table,
+    for the cards left in the table's shoe and the table's rules
+    exact_depth: the number of cards drawn by the player the dealer's outcomes are exact for, None for all
+    return: a dict from each of the hand's possible choices to its expected value, for a stake of 1
+    """
+    composition = table.shoe.composition()
+    dealer_cards = table.dealer.hand.card_list
+    if len(dealer_cards) > 1:
+        # the hole card is face down, the player can't know it is out of the shoe
+        hole_card = CARD_HARD_VALUES[dealer_cards[1].code] - 1
+        composition = composition[:hole_card] + (composition[hole_card] + 1,) + composition[hole_card + 1:]
+    analysis = HandAnalysis(CARD_HARD_VALUES[dealer_cards[0].code], exact_depth, table.rules)
+    has_ace = hand.ace_count > 0
+    possible_choices = hand.get_possible_choices(table)
+
+    expected_values = analysis.choices(hand.hard_total, has_ace, composition, 'DD' in possible_choices,
+                                       can_surrender='SU' in possible_choices)
+    if 'SP' in possible_choices:
+        expected_values['SP'] = analysis.split(CARD_HARD_VALUES[hand.card_list[0].code], composition)
+    return {choice: expected_values[choice] for choice in possible_choices}
+
+
+def cache_info():
+    """returns the hits, misses, maximum size and current size of the dealer outcome cache"""
+    return dealer_outcomes.cache_info()
+
+
+def clear_cache():
+    """empties the dealer outcome cache"""
+    dealer_outcomes.cache_clear()
@@ -0,0 +1,308 @@
+"""
+This is a module ranking strategies by playing every one of them on the same shoes, common random numbers
+The shoes are shuffled once from a seed and kept one after the other in a single block of shared memory,
+312 bytes for a shoe of 6 decks, which the worker processes map instead of being sent a copy.
+Every strategy deals every shoe from its first card to its cut card, so two strategies play the same cards
+till their decisions make them draw differently and the luck of the cards mostly cancels out of their difference.
+The difference of two EVs is estimated from the results paired by shoe, its confidence interval is much narrower
+than the one of two independent runs of as many shoes, so a precision is reached with far fewer shoes
+"""
+
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from statistics import NormalDist
+
+from blackjack import Table
+from counting import CardCounter
+from events import NullSink
+from parallel import derive_seed
+from rules import DEFAULT_RULES
+from shoe import DECK_CODES, Shoe
+
+# The confidence of the intervals by default
+DEFAULT_CONFIDENCE = 0.95
+
+# The shoes played by every strategy before the precision is checked again, when playing to a target precision
+DEFAULT_BATCH_SHOES = 1000
+
+# The most shoes played to reach a target precision by default
+DEFAULT_MAX_SHOES = 100_000
+
+# The counting system kept on every shoe, for the strategies reading the count
+COUNTING_SYSTEMS = ["hi_lo"]
+
+
+class ShoeBank:
+    """
+    Declaring a bank of shuffled shoes kept one after the other in a block of shared memory
+    The shoe at an index is shuffled with a random.Random seeded from the seed and the index,
+    so a bank holds the same shoes whatever the number of shoes shuffled at a time
+    """
+
+    def __init__(self, capacity, decks=6, seed=0, name=None):
+        """
+        capacity: the most shoes the bank can hold
+        decks: the number of decks of a shoe
+        seed: the master seed every shoe's seed is derived from
+        name: the name of the shared memory of a bank made by another process to attach to it, None for a new bank
+        shoe_size: the number of cards of a shoe
+        shoes: the number of shoes shuffled, a bank attached to is taken as full
+        """
+        self.capacity = capacity
+        self.decks = decks
+        self.seed = seed
+        self.shoe_size = len(DECK_CODES) * decks
+        self.is_owner = name is None
+        if self.is_owner:
+            self.memory = shared_memory.SharedMemory(create=True, size=capacity * self.shoe_size)
+            self.shoes = 0
+        else:
+            # a worker of the pool shares the resource tracker of the process that made the bank,
+            # so attaching doesn't make the memory freed when the worker exits
+            self.memory = shared_memory.SharedMemory(name=name)
+            self.shoes = capacity
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def name(self):
+        """the name of the shared memory, for another process to attach to the bank"""
+        return self.memory.name
+
+    def fill(self, shoes):
+        """shuffles the shoes of the bank up to shoes, the ones already shuffled are kept"""
+        if shoes > self.capacity:
+            raise ValueError(f"the bank holds {self.capacity} shoes, {shoes} were asked for")
+        codes = DECK_CODES * self.decks
+        buffer = self.memory.buf
+        for index in range(self.shoes, shoes):
+            random_key = random.Random(derive_seed(self.seed, index)).random
+            start = index * self.shoe_size
+            buffer[start:start + self.shoe_size] = bytes(sorted(codes, key=lambda code: random_key()))
+        self.shoes = max(self.shoes, shoes)
+
+    def shoe_codes(self, index):
+        """returns the codes of the shoe at index, a view of the shared memory, not a copy"""
+        start = index * self.shoe_size
+        return self.memory.buf[start:start + self.shoe_size]
+
+    def close(self):
+        """closes the bank, and frees its shared memory if it was made by this process"""
+        self.memory.close()
+        if self.is_owner:
+            self.memory.unlink()
+
+
+def play_shoe(codes, strategy, players=1, rules=DEFAULT_RULES, penetration=0.75, seed=None):
+    """
+    Deals a shoe from its first card to its cut card, a round per table, the cards are counted with COUNTING_SYSTEMS
+    codes: the codes of the shoe in the order they are drawn
+    seed: the seed of the shoe's rng, only used if a round runs out of cards
+    return: (net, staked), what the players won or lost over the shoe and the sum of their first stakes, in cents
+    """
+    shoe = Shoe(decks=rules.decks, penetration=penetration, rng=random.Random(seed))
+    shoe.load(codes)
+    counter = CardCounter(shoe, COUNTING_SYSTEMS)
+    sink = NullSink()
+    net = staked = 0
+    while not shoe.is_cut_card_reached:
+        table = Table(players, strategy=strategy, sink=sink, shoe=shoe, counter=counter, rules=rules)
+        for player in table.player_list:
+            staked += player.hand.stake
+        table.play_round()
+        for player in table.player_list:
+            net += player.balance
+        net -= table.opening_total
+    return net, staked
+
+
+def _play_shoes(bank, strategy, start, end, players, rules, penetration, seed):
+    """plays the shoes of the bank from start to end with a strategy, returns their (net, staked)"""
+    return [play_shoe(bank.shoe_codes(index), strategy, players, rules, penetration, derive_seed(seed, index))
+            for index in range(start, end)]
+
+
+# The bank and the settings of a worker process, set once when the worker starts
+_worker = {}
+
+
+def _start_worker(bank_name, capacity, decks, strategies, players, rules, penetration, seed):
+    """attaches a worker process to the bank and keeps the strategies and the settings"""
+    _worker.update(bank=ShoeBank(capacity, decks, name=bank_name), strategies=strategies, players=players,
+                   rules=rules, penetration=penetration, seed=seed)
+
+
+def _play_shoes_in_worker(arguments):
+    """plays shoes of the bank in a worker process, arguments is (strategy index, start, end)"""
+    strategy_index, start, end = arguments
+    return _play_shoes(_worker["bank"], _worker["strategies"][strategy_index], start, end, _worker["players"],
+                       _worker["rules"], _worker["penetration"], _worker["seed"])
+
+
+class Evaluation:
+    """
+    Declaring a class holding the results of strategies on the same shoes, the (net, staked) of every shoe
+    The EV is the net won per unit staked, its interval comes from the linearized ratio estimator, and the interval
+    of a difference from the paired results of the two strategies on every shoe
+    """
+
+    def __init__(self, names, confidence=DEFAULT_CONFIDENCE):
+        """
+        names: the names of the strategies, the first one is the baseline the others are compared with
+        confidence: the confidence of the intervals
+        results: the list of (net, staked) of every shoe, by the name of the strategy
+        """
+        self.names = list(names)
+        self.confidence = confidence
+        self.results = {name: [] for name in self.names}
+
+    def __str__(self):
+        baseline = self.names[0]
+        lines = [f"{self.shoes} shoes, {self.confidence:.0%} intervals, compared with {baseline}"]
+        for name in sorted(self.names, key=self.ev, reverse=True):
+            line = f"{name:<24} EV {self.ev(name):+.4%} ± {self.half_width(name):.4%}"
+            if name != baseline:
+                difference, paired, independent = self.difference(name, baseline)
+                line += f" | difference {difference:+.4%} ± {paired:.4%}, ± {independent:.4%} if independent, " \
+                        f"{self.variance_reduction(name, baseline):.1f}x fewer shoes"
+            lines.append(line)
+        return "\n".join(lines)
+
+    @property
+    def shoes(self):
+        """the number of shoes every strategy played"""
+        return min(len(results) for results in self.results.values())
+
+    @property
+    def z(self):
+        """the number of standard errors of the half width of an interval"""
+        return NormalDist().inv_cdf(0.5 + self.confidence / 2)
+
+    def add(self, name, results):
+        """adds the (net, staked) of more shoes played by a strategy"""
+        self.results[name].extend(results)
+
+    def ev(self, name):
+        """the net won by a strategy per unit staked"""
+        results = self.results[name]
+        staked = sum(shoe_staked for _, shoe_staked in results)
+        return sum(net for net, _ in results) / staked if staked else 0.0
+
+    def influences(self, name):
+        """
+        returns what every shoe adds to the error of a strategy's EV, the linearized ratio estimator,
+        the variance of the EV is their variance over the number of shoes
+        """
+        results = self.results[name]
+        ev = self.ev(name)
+        mean_staked = sum(staked for _, staked in results) / len(results)
+        return [(net - ev * staked) / mean_staked for net, staked in results]
+
+    @staticmethod
+    def _variance(values):
+        """returns the sample variance of values"""
+        if len(values) < 2:
+            return float("inf")
+        mean = sum(values) / len(values)
+        return sum((value - mean) ** 2 for value in values) / (len(values) - 1)
+
+    def half_width(self, name):
+        """the half width of the interval of a strategy's EV"""
+        return self.z * (self._variance(self.influences(name)) / self.shoes) ** 0.5
+
+    def difference(self, name, baseline):
+        """
+        returns (the EV of a strategy minus the baseline's, the half width of its interval from the paired shoes,
+        the half width it would have from two independent runs of as many shoes)
+        """
+        influences, baseline_influences = self.influences(name), self.influences(baseline)
+        paired_variance = self._variance([value - baseline_value for value, baseline_value
+                                          in zip(influences, baseline_influences)])
+        independent_variance = self._variance(influences) + self._variance(baseline_influences)
+        return (self.ev(name) - self.ev(baseline), self.z * (paired_variance / self.shoes) ** 0.5,
+                self.z * (independent_variance / self.shoes) ** 0.5)
+
+    def variance_reduction(self, name, baseline):
+        """how many times more shoes two independent runs would need for the precision of the paired difference"""
+        _, paired, independent = self.difference(name, baseline)
+        return (independent / paired) ** 2 if paired else float("inf")
+
+    def is_precise(self, target):
+        """True if the interval of every difference with the baseline is at most target wide on each side"""
+        baseline = self.names[0]
+        return all(self.difference(name, baseline)[1] <= target for name in self.names[1:])
+
+
+def evaluate(strategies, shoes=None, target=None, players=1, rules=None, penetration=0.75, seed=0, workers=1,
+             batch_shoes=DEFAULT_BATCH_SHOES, max_shoes=DEFAULT_MAX_SHOES, confidence=DEFAULT_CONFIDENCE):
+    """
+    Plays strategies on the same shoes and compares them, see the module docstring
+    strategies: a dict from names to strategies, the first one is the baseline, or a list named by their classes,
+        they have to be picklable to be sent to the workers
+    shoes: the number of shoes every strategy plays, if None the shoes are played by batch till target is reached
+    target: the precision to reach, the half width of the interval of every difference with the baseline,
+        as a part of the stake, like 0.001 for 0.1%
+    players: the number of players on each table, all played by the same strategy
+    rules: the rules.Rules every table plays by, defaults to rules.DEFAULT_RULES
+    penetration: the part of a shoe dealt before its cut card
+    seed: the master seed of the shoes
+    workers: the number of worker processes, None for the number of cores, 1 plays every shoe in this process
+    batch_shoes: the shoes played by every strategy between two checks of the precision
+    max_shoes: the most shoes played to reach target
+    confidence: the confidence of the intervals
+    return: an Evaluation
+    """
+    if not isinstance(strategies, dict):
+        strategies = {type(strategy).__name__: strategy for strategy in strategies}
+    if shoes is None and target is None:
+        raise ValueError("either shoes or target has to be given")
+    rules = DEFAULT_RULES if rules is None else rules
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    capacity = max_shoes if shoes is None else shoes
+    names, strategy_list = list(strategies), list(strategies.values())
+    evaluation = Evaluation(names, confidence)
+
+    with ShoeBank(capacity, decks=rules.decks, seed=seed) as bank:
+        executor = None
+        if workers > 1:
+            executor = ProcessPoolExecutor(
+                max_workers=workers, initializer=_start_worker,
+                initargs=(bank.name, capacity, rules.decks, strategy_list, players, rules, penetration, seed))
+        try:
+            start = 0
+            while start < capacity:
+                end = capacity if shoes is not None else min(start + batch_shoes, capacity)
+                bank.fill(end)
+                if executor is None:
+                    for name, strategy in strategies.items():
+                        evaluation.add(name, _play_shoes(bank, strategy, start, end, players, rules, penetration,
+                                                         seed))
+                else:
+                    # every worker plays a slice of the shoes of a strategy, the slices are added in order
+                    step = max(1, (end - start) // workers)
+                    tasks = [(strategy_index, slice_start, min(slice_start + step, end))
+                             for strategy_index in range(len(strategy_list))
+                             for slice_start in range(start, end, step)]
+                    for (strategy_index, _, _), results in zip(tasks, executor.map(_play_shoes_in_worker, tasks)):
+                        evaluation.add(names[strategy_index], results)
+                start = end
+                if target is not None and evaluation.is_precise(target):
+                    break
+        finally:
+            if executor is not None:
+                executor.shutdown()
+    return evaluation
+
+
+if __name__ == "__main__":
+    from basic_strategy import BasicStrategy, DeviationStrategy
+    from strategy import HeuristicStrategy
+
+    print(evaluate({"basic": BasicStrategy(), "deviations": DeviationStrategy(), "heuristic": HeuristicStrategy()},
+                   target=0.005, workers=None))
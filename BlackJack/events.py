@@ -0,0 +1,122 @@
+"""
+This is a module with the event sinks of the game
+A table sends every event of a round (draws, decisions, stands, splits, payouts, insurance, the end of the round)
+to its sink,
+the sink decides what to do with them, the console sink prints them and the null sink ignores them
+"""
+
+from money import format_money
+
+# The message printed after a hand, for each status a hand can be paid out with
+PAYOUT_MESSAGES = {
+    "PUSH": "pushed. Try Again!",
+    "LOST_BY_SURRENDER": "lost by surrendering. Try Again!",
+    "LOST_BY_BUST": "lost by busting. Try Again!",
+    "LOST_BY_LESS_DEALER": "lost to the dealer. Try Again!",
+    "WON_BY_DEALER_BUST": "won by dealer bust. Congratulations!",
+    "WON_BY_GREATER_DEALER": "won by beating the dealer. Congratulations!",
+    "BLACK_JACK": "won by BLACK JACK. Congratulations!",
+}
+
+
+class NullSink:
+    """
+    Declaring a sink that ignores every event
+    It is also the base class of the sinks, a sink only needs to override the events it cares about
+    """
+
+    def table_created(self, table):
+        """called when a table has been created and its players have staked"""
+
+    def draw(self, hand, card):
+        """called after a card has been drawn and added to a hand"""
+
+    def decide(self, hand, choice):
+        """called after a choice has been made on a hand"""
+
+    def stand(self, hand, is_perfect_hand):
+        """called when a hand stands"""
+
+    def double_down(self, hand):
+        """called after a hand has doubled down"""
+
+    def split(self, hand, hand0, hand1):
+        """called when a hand has been split into hand0 and hand1"""
+
+    def surrender(self, hand):
+        """called when a hand surrenders"""
+
+    def insurance(self, player, stake):
+        """called after a player decided on insurance, stake is None if he/she didn't insure"""
+
+    def insurance_payout(self, player):
+        """called when the insurance of a player is paid out"""
+
+    def insufficient_balance(self, player):
+        """called when a player can't afford a stake"""
+
+    def payout(self, hand):
+        """called when a hand is paid out, the hand's status tells how"""
+
+    def round_end(self, table):
+        """called when a round is over, every hand has been paid out and its cards are going to the discard tray"""
+
+    def dealer_draw_start(self, table):
+        """called before the dealer draws his/her cards"""
+
+    def dealer_draw_end(self, table):
+        """called after the dealer has drawn his/her cards"""
+
+    def players_info(self, table):
+        """called when the information of all the players is requested"""
+
+
+class ConsoleSink(NullSink):
+    """A sink printing the events on the command line, this is the default sink of a table"""
+
+    def table_created(self, table):
+        print()
+
+    def draw(self, hand, card):
+        print(hand)
+
+    def stand(self, hand, is_perfect_hand):
+        standing_message = f"Player {hand.player_index} "
+        if hand.index is not None:
+            standing_message += f"Hand {hand.index} "
+        standing_message += f"is standing on a perfect hand. Good luck!" if is_perfect_hand \
+            else f"Player {hand.player_index} is standing. Good luck!"
+        print(standing_message)
+        print()
+
+    def double_down(self, hand):
+        print(f"Player{hand.player_index} doubled down. Good luck!")
+
+    def surrender(self, hand):
+        print(f"Player{hand.player_index} surrendered.")
+
+    def insurance(self, player, stake):
+        if stake is None:
+            print(f"Player {player.index} is not insured.")
+        elif player.is_insured:
+            print(f"Player {player.index} is insured.")
+
+    def insurance_payout(self, player):
+        print(format_money(player.insurance))
+
+    def insufficient_balance(self, player):
+        print(f"{player} doesn't have enough balance.")
+
+    def payout(self, hand):
+        print(f"{hand} {PAYOUT_MESSAGES[hand.status.name]}")
+
+    def dealer_draw_start(self, table):
+        print()
+
+    def dealer_draw_end(self, table):
+        print()
+
+    def players_info(self, table):
+        for player in table.player_list:
+            player.print_info()
+        print()
@@ -1,7 +1,133 @@
 """
 This is a module with a list of functions for input handling
+The functions read every input from the current input provider, the console by default,
+a provider is any object with a read(prompt) method returning the input as a string, like the builtin input
+A script, a JSONL file of a recorded session or a callback can be used instead of the console,
+so a game can be replayed at full speed, the inputs are validated the same way whatever the provider
 """
 
+from contextlib import contextmanager
+
+
+class ConsoleInput:
+    """Declaring an input provider reading from the console with the builtin input, the default provider"""
+
+    def read(self, prompt):
+        return input(prompt)
+
+
+class ScriptInput:
+    """
+    Declaring an input provider reading from a list of inputs already in memory, one input per read
+    It raises EOFError when there are no more inputs, like the builtin input at the end of a file
+    """
+
+    def __init__(self, inputs, echo=False):
+        """
+        inputs: the inputs in the order they are read, each is turned into a string
+        echo: True to print the prompt and the input, like on the console, False to read silently
+        position: the index of the next input
+        """
+        self.inputs = [str(input_str) for input_str in inputs]
+        self.echo = echo
+        self.position = 0
+
+    def read(self, prompt):
+        if self.position == len(self.inputs):
+            raise EOFError("the script has no more inputs")
+        input_str = self.inputs[self.position]
+        self.position += 1
+        if self.echo:
+            print(f"{prompt}{input_str}")
+        return input_str
+
+
+class JsonlInput(ScriptInput):
+    """
+    Declaring an input provider reading a JSONL file, the whole file is parsed when the provider is made
+    Each line is a JSON string, number or an object with an "input" key, as written by RecordingInput.save,
+    blank lines are skipped
+    """
+
+    def __init__(self, path, echo=False):
+        # json is imported on first use, a game read from the console doesn't need it
+        import json
+        inputs = []
+        with open(path) as jsonl_file:
+            for line in jsonl_file:
+                if line.strip():
+                    entry = json.loads(line)
+                    inputs.append(entry["input"] if isinstance(entry, dict) else entry)
+        super().__init__(inputs, echo=echo)
+
+
+class CallbackInput:
+    """Declaring an input provider asking a function, callback(prompt) returns the input"""
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def read(self, prompt):
+        return str(self.callback(prompt))
+
+
+class RecordingInput:
+    """
+    Declaring an input provider recording every input read from another provider,
+    the recording can be saved to a JSONL file and replayed with JsonlInput
+    """
+
+    def __init__(self, provider=None):
+        """
+        provider: the provider the inputs are read from, defaults to the console
+        records: a list of dicts with the prompt and the input of every read
+        """
+        self.provider = ConsoleInput() if provider is None else provider
+        self.records = []
+
+    def read(self, prompt):
+        input_str = self.provider.read(prompt)
+        self.records.append({"prompt": prompt, "input": input_str})
+        return input_str
+
+    def save(self, path):
+        """writes the records to a JSONL file, one line per input"""
+        import json
+        with open(path, "w") as jsonl_file:
+            for record in self.records:
+                jsonl_file.write(json.dumps(record) + "\n")
+
+
+_provider = ConsoleInput()
+
+
+def get_input_provider():
+    """returns the current input provider"""
+    return _provider
+
+
+def set_input_provider(provider):
+    """sets the provider every input is read from, None for the console, returns the previous provider"""
+    global _provider
+    previous_provider = _provider
+    _provider = ConsoleInput() if provider is None else provider
+    return previous_provider
+
+
+@contextmanager
+def input_provider(provider):
+    """reads every input from provider inside a with block, the previous provider is set back after it"""
+    previous_provider = set_input_provider(provider)
+    try:
+        yield provider
+    finally:
+        set_input_provider(previous_provider)
+
+
+def read_input(prompt):
+    """reads an input from the current provider, like the builtin input"""
+    return _provider.read(prompt)
+
 
 def get_input_str_from_choice(choices, input_message, error_message=None, case_sensitive=False):
     """
@@ -12,16 +138,16 @@ def get_input_str_from_choice(choices, input_message, error_message=None, case_s
     case_sensitive: default to False, set to True if you want the input to match the choice with case
     return: a string in the choice the user inputs
     """
-    input_str = input(input_message)
+    input_str = read_input(input_message)
     if error_message is None:
         error_message = "Not a valid choice : "
     if case_sensitive:
         while input_str not in choices:
-            input_str = input(error_message)
+            input_str = read_input(error_message)
     else:
         choices = list(map(lambda x: x.upper(), choices))
         while input_str.upper() not in choices:
-            input_str = input(error_message)
+            input_str = read_input(error_message)
 
     return input_str
 
@@ -34,7 +160,7 @@ def get_input_int(input_message, error_massage=None, input_range=None):
     input_range: the range of valid integers the user can input, best to be specified by range
     return: a valid integer within the input_range if specified else just a valid integer
     """
-    input_str = input(input_message)
+    input_str = read_input(input_message)
     if error_massage is None:
         error_massage = "Input should be a valid integer : "
     while True:
@@ -43,9 +169,9 @@ def get_input_int(input_message, error_massage=None, input_range=None):
             if range and input_int in input_range:
                 return input_int
         except ValueError:
-            input_str = input(error_massage)
+            input_str = read_input(error_massage)
         else:
-            input_str = input(error_massage)
+            input_str = read_input(error_massage)
 
 
 def get_input_float(input_message, error_massage=None, upper_limit=None, lower_limit=None):
@@ -58,7 +184,7 @@ def get_input_float(input_message, error_massage=None, upper_limit=None, lower_l
     return: a valid float within the range specifies by the upper_limit and lower_limit if specified
         else just a valid float
     """
-    input_str = input(input_message)
+    input_str = read_input(input_message)
     if error_massage is None:
         error_massage = f"Input should be a valid floating number" \
                         f" not less then {lower_limit} and not greater then {upper_limit} : "
@@ -69,6 +195,6 @@ def get_input_float(input_message, error_massage=None, upper_limit=None, lower_l
                     and (lower_limit is not None and input_float >= lower_limit):
                 return input_float
         except ValueError:
-            input_str = input(error_massage)
+            input_str = read_input(error_massage)
         else:
-            input_str = input(error_massage)
+            input_str = read_input(error_massage)
@@ -1,4 +1,49 @@
 #!/usr/bin/python3
+"""
+Starts a game on the command line
+    --seed N: shuffles the shoe with the seed N, a session is only replayed the same with the same seed
+    --record PATH: saves the inputs of the game to a JSONL file
+    --replay PATH: reads the inputs from a JSONL file instead of the console
+    --tui: shows the table in place on the terminal, redrawing what changed, instead of printing every event
+"""
+import argparse
+import contextlib
+import random
+
+import input_handler
 from blackjack import start_game
 
-start_game()
+parser = argparse.ArgumentParser(description="Play a game of Black Jack on the command line.")
+parser.add_argument("--seed", type=int, default=None, help="the seed of the shuffles")
+parser.add_argument("--record", metavar="PATH", default=None, help="save the inputs to a JSONL file")
+parser.add_argument("--replay", metavar="PATH", default=None, help="read the inputs from a JSONL file")
+parser.add_argument("--tui", action="store_true", help="show the table in place on the terminal")
+arguments = parser.parse_args()
+
+if arguments.seed is not None:
+    random.seed(arguments.seed)
+provider = input_handler.ConsoleInput()
+if arguments.replay is not None:
+    provider = input_handler.JsonlInput(arguments.replay, echo=True)
+sink = None
+if arguments.tui:
+    # the terminal view is only imported when it is used, so a plain game starts faster
+    import tui
+    sink = tui.TerminalSink()
+    provider = tui.TerminalInput(sink, provider)
+if arguments.record is not None:
+    provider = input_handler.RecordingInput(provider)
+input_handler.set_input_provider(provider)
+
+try:
+    if sink is None:
+        start_game()
+    else:
+        # the prints of the game go to the message row of the view instead of scrolling it
+        with contextlib.redirect_stdout(tui.TerminalOutput(sink)):
+            start_game(sink=sink)
+finally:
+    if sink is not None:
+        sink.close()
+    if arguments.record is not None:
+        provider.save(arguments.record)
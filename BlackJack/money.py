@@ -0,0 +1,69 @@
+"""
+This is a module for the money of the game
+Every amount, a balance, a stake, an insurance or a payout, is an integer number of cents,
+so adding up millions of rounds is exact and the money of a table and its players always adds up
+A payout rate like 3:2 is a ratio of integers, and an amount that doesn't come to a whole cent is rounded
+by the rules' payout_rounding, one of ROUNDING_LIST
+"""
+
+from functools import lru_cache
+
+# The number of cents in a dollar
+CENTS = 100
+
+# How an amount that isn't a whole number of cents is rounded:
+# down, the player gets the cent below and the house keeps the fraction, like a casino's breakage,
+# up, the player gets the cent above, and half_even, to the nearest cent and to the even cent on a half
+ROUNDING_LIST = [
+    "down",
+    "up",
+    "half_even",
+]
+
+
+class LedgerError(Exception):
+    """Raised when the money of a table and its players doesn't add up to what they started the round with"""
+
+
+def to_cents(amount):
+    """returns an amount of dollars, an int, a float or a string like 12.50, as a whole number of cents"""
+    # fractions is imported on first use, the game doesn't need it before its first prompt
+    from fractions import Fraction
+    return round(Fraction(str(amount)) * CENTS)
+
+
+def to_dollars(cents):
+    """returns an amount of cents as a float of dollars, to display or send it"""
+    return cents / CENTS
+
+
+def format_amount(cents):
+    """returns an amount of cents as dollars with two decimals and no sign of dollars, like 12.50 or -0.05"""
+    dollars, cents_left = divmod(abs(cents), CENTS)
+    return f"{'-' if cents < 0 else ''}{dollars}.{cents_left:02d}"
+
+
+def format_money(cents):
+    """returns an amount of cents as dollars with two decimals, like $12.50 or -$0.05"""
+    amount = format_amount(cents)
+    return f"-${amount[1:]}" if amount.startswith("-") else f"${amount}"
+
+
+@lru_cache(maxsize=None)
+def ratio(rate):
+    """returns a rate, like 1.5 for 3:2, as a (numerator, denominator) of integers"""
+    from fractions import Fraction
+    rate = Fraction(str(rate)).limit_denominator(1000)
+    return rate.numerator, rate.denominator
+
+
+def scale(cents, numerator, denominator, rounding="down"):
+    """returns cents * numerator / denominator, rounded to a whole cent by a rounding of ROUNDING_LIST"""
+    if rounding == "down":
+        return cents * numerator // denominator
+    if rounding == "up":
+        return -(-cents * numerator // denominator)
+    quotient, remainder = divmod(cents * numerator, denominator)
+    if 2 * remainder > denominator or (2 * remainder == denominator and quotient % 2):
+        quotient += 1
+    return quotient
@@ -0,0 +1,60 @@
+"""
+This is a module for running a simulation on all the cores of a machine
+The rounds are split into chunks of a fixed size, each chunk is simulated by a worker process
+with its own random.Random seeded from the master seed and the chunk's index,
+and the results are merged in chunk order, so the result is the same whatever the number of workers
+"""
+
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from simulation import SimulationResult, simulate
+
+
+def derive_seed(master_seed, index):
+    """returns the seed of the chunk at index, derived from the master seed, the same on every machine"""
+    digest = hashlib.sha256(f"{master_seed}:{index}".encode()).digest()
+    return int.from_bytes(digest[:8], "big")
+
+
+def _simulate_chunk(arguments):
+    """simulates a single chunk, it runs in a worker process"""
+    rounds, players, strategy, seed, rules, counting_systems = arguments
+    return simulate(rounds, players=players, strategy=strategy, seed=seed, rules=rules,
+                    counting_systems=counting_systems)
+
+
+def parallel_simulate(rounds, players=1, strategy=None, seed=0, workers=None, chunk_rounds=10_000,
+                      rules=None, counting_systems=None):
+    """
+    Plays a number of rounds like simulation.simulate, split across worker processes
+    rounds: the number of rounds to play
+    players: the number of players on each table
+    strategy: makes every decision, it has to be picklable to be sent to the workers, defaults to MimicDealerStrategy
+    seed: the master seed every chunk's seed is derived from
+    workers: the number of worker processes, defaults to the number of cores, 1 runs every chunk in this process
+    chunk_rounds: the number of rounds of a chunk, changing it changes the rounds played
+    rules: the rules.Rules every table plays by, as for simulate
+    counting_systems: the systems counted on every chunk's shoe, as for simulate
+    return: a SimulationResult, bit-identical for the same seed and chunk_rounds whatever the number of workers
+    """
+    chunks = [
+        (min(chunk_rounds, rounds - start), players, strategy, derive_seed(seed, index), rules,
+         counting_systems)
+        for index, start in enumerate(range(0, rounds, chunk_rounds))
+    ]
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    result = SimulationResult()
+    if workers == 1:
+        for chunk in chunks:
+            result.merge(_simulate_chunk(chunk))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # map returns the results in the order of the chunks, which keeps the merge exact
+            for chunk_result in executor.map(_simulate_chunk, chunks):
+                result.merge(chunk_result)
+
+    return result
@@ -0,0 +1,275 @@
+"""
+This is a module for profiling the hot paths of the game
+A Profiler replaces the methods it profiles with timing wrappers while it is enabled, and puts the methods back
+when it is disabled, so the game runs its own methods at full speed when it isn't profiled
+For every method it counts the calls, the nanoseconds spent in the method and in it without the profiled methods
+it called, and a histogram of the nanoseconds of a call
+The results can be printed as a report, saved for pstats and cProfile viewers, or saved as collapsed stacks
+for a flame graph
+"""
+
+import inspect
+import marshal
+import time
+from collections import defaultdict
+
+from blackjack import Hand, Table
+from shoe import Shoe
+
+# The methods profiled by default, (class, name)
+# A round plays its hands with the steps of Hand.decide_steps, Hand.decide is only called outside a round
+DEFAULT_TARGETS = [
+    (Shoe, "shuffle"),
+    (Shoe, "fix_order"),
+    (Table, "draw_card"),
+    (Hand, "set_value"),
+    (Hand, "decide"),
+    (Hand, "decide_steps"),
+    (Table, "payout"),
+    (Table, "settle"),
+    (Table, "dealer_draw_card"),
+]
+
+# The number of buckets of a histogram, a call of n nanoseconds is counted in the bucket n.bit_length()
+HISTOGRAM_BUCKETS = 64
+
+
+class CallStats:
+    """Declaring a class holding the statistics of a profiled method"""
+
+    def __init__(self, name, code):
+        """
+        name: the name of the method, like Table.draw_card
+        code: the code of the method, for its file and line
+        calls: the number of calls
+        total_ns: the nanoseconds spent in the method, the profiled methods it called included
+        self_ns: the nanoseconds spent in the method, the profiled methods it called excluded
+        histogram: the number of calls that took between 2 ** (i - 1) and 2 ** i nanoseconds, for each bucket i
+        """
+        self.name = name
+        self.code = code
+        self.calls = 0
+        self.total_ns = 0
+        self.self_ns = 0
+        self.histogram = [0] * HISTOGRAM_BUCKETS
+
+    def __str__(self):
+        return f"{self.name:<24} {self.calls:>10} {self.total_ns / 1e6:>12.3f} {self.self_ns / 1e6:>12.3f} " \
+               f"{self.mean_ns:>10.0f} {self.percentile_ns(50):>10} {self.percentile_ns(99):>10}"
+
+    @property
+    def mean_ns(self):
+        """the mean nanoseconds of a call"""
+        return self.total_ns / self.calls if self.calls else 0.0
+
+    def percentile_ns(self, percent):
+        """returns the upper bound of the histogram bucket of the percentile of the calls"""
+        rank = self.calls * percent / 100
+        seen = 0
+        for bucket, count in enumerate(self.histogram):
+            seen += count
+            if count and seen >= rank:
+                return 1 << bucket
+        return 0
+
+    @property
+    def label(self):
+        """the file, line and name of the method, the key of a function in pstats"""
+        return self.code.co_filename, self.code.co_firstlineno, self.name
+
+
+class Profiler:
+    """
+    Declaring a profiler of methods of the game, enabled by enable or a with block
+        with Profiler() as profiler:
+            simulate(10000)
+        print(profiler.report())
+    Only one profiler can be enabled at a time
+    """
+
+    _enabled_profiler = None
+
+    def __init__(self, targets=None):
+        """
+        targets: the methods to profile, a list of (class, name), defaults to DEFAULT_TARGETS
+        stats: the CallStats of every profiled method by name
+        stacks: the nanoseconds spent in every stack of profiled methods, the method at the end excluding its callees
+        edges: the calls, self and total nanoseconds of every (caller, callee) of profiled methods,
+            the caller is None for a call from a method that isn't profiled
+        """
+        self.targets = DEFAULT_TARGETS if targets is None else targets
+        self.stats = {}
+        self.stacks = defaultdict(int)
+        self.edges = defaultdict(lambda: [0, 0, 0])
+        self._stack = []
+        self._originals = []
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.disable()
+
+    @property
+    def is_enabled(self):
+        return Profiler._enabled_profiler is self
+
+    def enable(self):
+        """replaces every target with a wrapper recording its calls"""
+        if Profiler._enabled_profiler is not None:
+            raise RuntimeError("a profiler is already enabled")
+        for cls, name in self.targets:
+            original = inspect.getattr_static(cls, name)
+            function = original.__func__ if isinstance(original, (staticmethod, classmethod)) else original
+            stats_name = f"{cls.__name__}.{name}"
+            self.stats.setdefault(stats_name, CallStats(stats_name, function.__code__))
+            if inspect.isgeneratorfunction(function):
+                wrapper = self._wrap_generator(function, stats_name)
+            else:
+                wrapper = self._wrap(function, stats_name)
+            if isinstance(original, (staticmethod, classmethod)):
+                wrapper = type(original)(wrapper)
+            self._originals.append((cls, name, original))
+            setattr(cls, name, wrapper)
+        Profiler._enabled_profiler = self
+
+    def disable(self):
+        """puts every target back, the statistics are kept"""
+        while self._originals:
+            cls, name, original = self._originals.pop()
+            setattr(cls, name, original)
+        if Profiler._enabled_profiler is self:
+            Profiler._enabled_profiler = None
+
+    def _start(self, name):
+        """counts a call of a method"""
+        self.stats[name].calls += 1
+        self.edges[self._stack[-1][0] if self._stack else None, name][0] += 1
+
+    def _enter(self, name):
+        """starts timing a method, it is on top of the stack till _exit"""
+        self._stack.append([name, time.perf_counter_ns(), 0])
+
+    def _exit(self):
+        """stops timing the method on top of the stack, returns the nanoseconds it took"""
+        end = time.perf_counter_ns()
+        stack = self._stack
+        name, start, child_ns = stack.pop()
+        elapsed = end - start
+        self_ns = elapsed - child_ns
+        stats = self.stats[name]
+        stats.total_ns += elapsed
+        stats.self_ns += self_ns
+        caller = stack[-1] if stack else None
+        if caller is not None:
+            caller[2] += elapsed
+        edge = self.edges[None if caller is None else caller[0], name]
+        edge[1] += self_ns
+        edge[2] += elapsed
+        self.stacks[tuple(frame[0] for frame in stack) + (name,)] += self_ns
+        return elapsed
+
+    def _record_call(self, name, elapsed):
+        """adds the nanoseconds of a whole call to the histogram of the method"""
+        self.stats[name].histogram[min(elapsed.bit_length(), HISTOGRAM_BUCKETS - 1)] += 1
+
+    def _wrap(self, function, name):
+        """returns a wrapper timing every call of function"""
+        def wrapper(*args, **kwargs):
+            self._start(name)
+            self._enter(name)
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self._record_call(name, self._exit())
+        wrapper.__wrapped__ = function
+        wrapper.__name__, wrapper.__qualname__, wrapper.__doc__ = \
+            function.__name__, function.__qualname__, function.__doc__
+        return wrapper
+
+    def _wrap_generator(self, function, name):
+        """
+        returns a wrapper of a generator function timing every step of the generators it makes,
+        the time waiting for the answer of a step isn't in the method, a call lasts till the generator returns
+        An exception thrown into the wrapper is thrown into the generator, and closing the wrapper closes it,
+        so the generator handles them and runs its cleanup like it would unwrapped
+        """
+        def wrapper(*args, **kwargs):
+            generator = function(*args, **kwargs)
+            self._start(name)
+            elapsed = 0
+            answer = thrown = None
+            try:
+                while True:
+                    self._enter(name)
+                    try:
+                        step = generator.send(answer) if thrown is None else generator.throw(thrown)
+                    except StopIteration as stop:
+                        return stop.value
+                    finally:
+                        elapsed += self._exit()
+                    thrown = None
+                    try:
+                        answer = yield step
+                    except GeneratorExit:
+                        self._enter(name)
+                        try:
+                            generator.close()
+                        finally:
+                            elapsed += self._exit()
+                        raise
+                    except BaseException as error:
+                        thrown = error
+            finally:
+                self._record_call(name, elapsed)
+        wrapper.__wrapped__ = function
+        wrapper.__name__, wrapper.__qualname__, wrapper.__doc__ = \
+            function.__name__, function.__qualname__, function.__doc__
+        return wrapper
+
+    def reset(self):
+        """clears the statistics"""
+        for stats in self.stats.values():
+            stats.__init__(stats.name, stats.code)
+        self.stacks.clear()
+        self.edges.clear()
+
+    def report(self):
+        """returns a report of every method called, the one with the most total time first, times in milliseconds"""
+        lines = [f"{'method':<24} {'calls':>10} {'total ms':>12} {'self ms':>12} {'mean ns':>10} "
+                 f"{'p50 ns':>10} {'p99 ns':>10}"]
+        for stats in sorted(self.stats.values(), key=lambda stats: stats.total_ns, reverse=True):
+            if stats.calls:
+                lines.append(str(stats))
+        return "\n".join(lines)
+
+    def pstats_dict(self):
+        """
+        returns the statistics in the format of pstats, as cProfile.Profile.create_stats makes them,
+        {(file, line, name): (primitive calls, calls, self seconds, total seconds, callers)}
+        """
+        result = {}
+        for name, stats in self.stats.items():
+            if not stats.calls:
+                continue
+            callers = {}
+            for (caller, callee), (calls, self_ns, total_ns) in self.edges.items():
+                if callee == name and caller is not None:
+                    callers[self.stats[caller].label] = (calls, calls, self_ns / 1e9, total_ns / 1e9)
+            result[stats.label] = (stats.calls, stats.calls, stats.self_ns / 1e9, stats.total_ns / 1e9, callers)
+        return result
+
+    def dump_stats(self, path):
+        """saves the statistics to a file pstats.Stats, snakeviz or any cProfile viewer can read"""
+        with open(path, "wb") as stats_file:
+            marshal.dump(self.pstats_dict(), stats_file)
+
+    def collapsed_stacks(self):
+        """returns the stacks in the collapsed format of flamegraph.pl and speedscope, one line per stack"""
+        return "\n".join(f"{';'.join(stack)} {self_ns}" for stack, self_ns in self.stacks.items() if self_ns > 0)
+
+    def write_collapsed_stacks(self, path):
+        """saves the collapsed stacks to a file, the weights are nanoseconds"""
+        with open(path, "w") as stacks_file:
+            stacks_file.write(self.collapsed_stacks() + "\n")
@@ -0,0 +1,383 @@
+"""
+This is a module for logging every round played at a table to an append-only file
+A RoundLogSink collects the events of a round, and at its end writes the round to a writer:
+the shoe's seed and shuffle, the cards dealt, the decisions, stakes, statuses and payouts of every hand,
+the amounts are in cents
+There are two formats:
+    JSONL, one JSON object per round, readable for debugging
+    binary, a header and fixed-width records, one per hand, the dealer's hand and every insurance,
+    so billions of hands can be written without building objects and scanned from a memory map
+"""
+
+import json
+import mmap
+import struct
+from collections import namedtuple
+
+from blackjack import STATUS_LIST
+from cards import CARDS
+from events import NullSink
+from rules import CHOICE_LIST
+
+# The first bytes of a binary log
+MAGIC = b"BJRL"
+
+# The version of the binary format, written in the header
+VERSION = 3
+
+# The header of a binary log: magic, version, flags, record size and the shoe's seed
+HEADER = struct.Struct("<4sBBHQ")
+
+# The flag of the header set when the seed is known
+HEADER_HAS_SEED = 1
+
+# A record of a binary log, 64 bytes: round, shuffle, kind, player, hand, status, flags, cards, decisions,
+# stake and payout in cents. Cards are card codes and decisions indexes in CHOICE_LIST, both padded with EMPTY,
+# the status is EMPTY for the dealer and the insurances, which have none
+RECORD = struct.Struct("<QIBBBBB16s15sqq")
+
+# The kinds of record
+RECORD_HAND = 0
+RECORD_DEALER = 1
+RECORD_INSURANCE = 2
+
+# The flags of a record
+FLAG_SPLIT = 1
+FLAG_DOUBLED = 2
+FLAG_TRUNCATED = 128
+
+# The byte padding the cards and decisions of a record, and the player of the dealer, the hand of a hand not split
+# or the status of a record without one
+EMPTY = 0xFF
+
+# The most cards and decisions a record holds, a longer hand is truncated and flagged, it needs at least 11 aces
+MAX_RECORD_CARDS = 16
+MAX_RECORD_DECISIONS = 15
+
+# The cards and decisions of a record that has none
+NO_CARDS = bytes([EMPTY]) * MAX_RECORD_CARDS
+NO_DECISIONS = bytes([EMPTY]) * MAX_RECORD_DECISIONS
+
+# The bytes buffered by a binary writer before they are written to its file
+DEFAULT_BUFFER_SIZE = 1 << 20
+
+# A decoded record of a binary log, player and hand are None for the dealer and for a hand not split,
+# status is None for the dealer and the insurances, cards are the codes of the cards and decisions the choices made
+# on the hand
+LogRecord = namedtuple("LogRecord", ["round", "shuffle", "kind", "player", "hand", "status", "flags",
+                                     "cards", "decisions", "stake", "payout"])
+
+_STATUS_INDEXES = {status: index for index, status in enumerate(STATUS_LIST)}
+_CHOICE_INDEXES = {choice: index for index, choice in enumerate(CHOICE_LIST)}
+
+
+class RoundLogSink(NullSink):
+    """
+    Declaring a sink writing every round of a table to a writer, a JsonlLogWriter or a BinaryLogWriter
+    It tracks the stakes and decisions of the hands from the events, as a hand's stake is replaced by its payout
+    """
+
+    def __init__(self, writer):
+        """
+        writer: receives a dict of every round when it is over, see round_record
+        stakes: the stake of every hand of the round, doubling down included
+        payouts: what every hand of the round got back
+        decisions: the choices made on every hand of the round
+        insurances: the insurance stake of every player of the round who insured
+        insurance_payouts: what the insurance of every player who insured got back, recorded when it is credited,
+            as the player's insurance is 0 once it is paid
+        """
+        self.writer = writer
+        self.stakes = {}
+        self.payouts = {}
+        self.decisions = {}
+        self.insurances = {}
+        self.insurance_payouts = {}
+
+    def draw(self, hand, card):
+        if hand.player_index is not None and hand not in self.stakes:
+            self.stakes[hand] = hand.stake
+
+    def decide(self, hand, choice):
+        self.decisions.setdefault(hand, []).append(choice.upper())
+
+    def double_down(self, hand):
+        self.stakes[hand] = hand.stake
+
+    def split(self, hand, hand0, hand1):
+        self.stakes[hand0] = hand0.stake
+        self.stakes[hand1] = hand1.stake
+
+    def insurance(self, player, stake):
+        if player.is_insured:
+            self.insurances[player.index] = player.insurance
+
+    def insurance_payout(self, player):
+        self.insurance_payouts[player.index] = player.insurance
+
+    def payout(self, hand):
+        self.payouts[hand] = hand.stake
+
+    def round_end(self, table):
+        self.writer.write_round(self.round_record(table))
+        self.stakes.clear()
+        self.payouts.clear()
+        self.decisions.clear()
+        self.insurances.clear()
+        self.insurance_payouts.clear()
+
+    def round_record(self, table):
+        """
+        returns the round of a table as a dict, the card codes of the dealer and every hand of every player,
+        with the hand's decisions, stake, payout and status, and the player's insurance
+        """
+        players = []
+        for player in table.player_list:
+            hands = []
+            for hand in (player.split_hand if player.is_split else [player.hand]):
+                decisions = self.decisions.get(hand, [])
+                hands.append({
+                    "hand": hand.index,
+                    "cards": [card.code for card in hand.card_list],
+                    "decisions": decisions,
+                    "stake": self.stakes.get(hand, 0),
+                    "payout": self.payouts.get(hand, 0),
+                    "status": hand.status,
+                    "is_split": player.is_split,
+                    "is_doubled": "DD" in decisions,
+                })
+            insurance = self.insurances.get(player.index)
+            players.append({
+                "player": player.index,
+                "balance": player.balance,
+                "insurance": insurance,
+                "insurance_payout": None if insurance is None else self.insurance_payouts.get(player.index, 0),
+                "hands": hands,
+            })
+        return {
+            "shuffle": table.shoe.shuffles,
+            "dealer": [card.code for card in table.dealer.hand.card_list],
+            "players": players,
+        }
+
+
+class JsonlLogWriter:
+    """
+    Declaring a writer appending every round to a JSONL file, one line per round, cards are written like 10H or AS
+    Each line also has the round's number and the seed of the shoe
+    """
+
+    def __init__(self, path, seed=None):
+        """
+        seed: the seed of the shoe the rounds are dealt from, written in every line
+        rounds: the number of the next round, the numbers go on from the rounds already in the file
+        """
+        self.seed = seed
+        self.rounds = sum(1 for _ in read_jsonl(path)) if _file_size(path) else 0
+        self.file = open(path, "a")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write_round(self, round_record):
+        """writes a round made by RoundLogSink.round_record"""
+        line = {"round": self.rounds, "seed": self.seed, **round_record}
+        line["dealer"] = [_card_name(code) for code in round_record["dealer"]]
+        line["players"] = [
+            {**player, "hands": [{**hand, "cards": [_card_name(code) for code in hand["cards"]],
+                                  "status": None if hand["status"] is None else hand["status"].name}
+                                 for hand in player["hands"]]}
+            for player in round_record["players"]
+        ]
+        self.file.write(json.dumps(line) + "\n")
+        self.rounds += 1
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class BinaryLogWriter:
+    """
+    Declaring a writer appending every round to a binary log, the records are packed into a buffer
+    and written to the file when the buffer is full, so a simulation makes few large writes
+    """
+
+    def __init__(self, path, seed=None, buffer_size=DEFAULT_BUFFER_SIZE):
+        """
+        seed: the seed of the shoe, written in the header, it must be the one of the file if the file exists
+        buffer_size: the bytes buffered before they are written
+        rounds: the number of the next round, the numbers go on from the rounds already in the file
+        """
+        if seed is not None and not 0 <= seed < 1 << 64:
+            raise ValueError(f"the seed of a binary log must fit in 64 bits, not {seed}")
+        self.seed = seed
+        self.buffer_size = buffer_size
+        self.buffer = bytearray()
+        self.rounds = 0
+        if _file_size(path):
+            header_seed = read_header(path)
+            if header_seed != seed:
+                raise ValueError(f"{path} is a log of the seed {header_seed}, not {seed}")
+            last_record = None
+            for last_record in read_binary(path, raw=True, start=-1):
+                pass
+            if last_record is not None:
+                self.rounds = last_record[0] + 1
+            self.file = open(path, "ab")
+        else:
+            self.file = open(path, "ab")
+            self.file.write(HEADER.pack(MAGIC, VERSION, 0 if seed is None else HEADER_HAS_SEED, RECORD.size,
+                                        0 if seed is None else seed))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write_round(self, round_record):
+        """packs a round made by RoundLogSink.round_record into the buffer, one record per hand"""
+        pack = RECORD.pack
+        buffer = self.buffer
+        round_number, shuffle = self.rounds, round_record["shuffle"]
+        cards, flags = _pack_codes(round_record["dealer"], MAX_RECORD_CARDS)
+        buffer += pack(round_number, shuffle, RECORD_DEALER, EMPTY, EMPTY, EMPTY, flags, cards, NO_DECISIONS, 0, 0)
+        for player in round_record["players"]:
+            player_index = player["player"]
+            if player["insurance"] is not None:
+                buffer += pack(round_number, shuffle, RECORD_INSURANCE, player_index, EMPTY, EMPTY, 0, NO_CARDS,
+                               NO_DECISIONS, player["insurance"], player["insurance_payout"])
+            for hand in player["hands"]:
+                cards, flags = _pack_codes(hand["cards"], MAX_RECORD_CARDS)
+                decisions, decisions_flags = _pack_codes(
+                    [_CHOICE_INDEXES[choice] for choice in hand["decisions"]], MAX_RECORD_DECISIONS)
+                flags |= decisions_flags
+                if hand["is_split"]:
+                    flags |= FLAG_SPLIT
+                if hand["is_doubled"]:
+                    flags |= FLAG_DOUBLED
+                buffer += pack(round_number, shuffle, RECORD_HAND, player_index,
+                               EMPTY if hand["hand"] is None else hand["hand"], _STATUS_INDEXES[hand["status"]],
+                               flags, cards, decisions, hand["stake"], hand["payout"])
+        self.rounds += 1
+        if len(buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """writes the buffered records to the file"""
+        self.file.write(self.buffer)
+        self.buffer.clear()
+        self.file.flush()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+def _file_size(path):
+    """returns the size of a file, 0 if it doesn't exist"""
+    try:
+        with open(path, "rb") as log_file:
+            return log_file.seek(0, 2)
+    except FileNotFoundError:
+        return 0
+
+
+def _card_name(code):
+    """returns the name of the card of a code, its rank and the initial of its suit, like 10H or AS"""
+    card = CARDS[code]
+    return f"{card.rank}{card.suit}"
+
+
+def _pack_codes(codes, size):
+    """returns the codes as bytes padded with EMPTY to size, and FLAG_TRUNCATED if there were more than size"""
+    if len(codes) > size:
+        return bytes(codes[:size]), FLAG_TRUNCATED
+    return bytes(codes).ljust(size, b"\xff"), 0
+
+
+def read_jsonl(path):
+    """a generator yielding every round of a JSONL log as a dict, blank lines are skipped"""
+    with open(path) as jsonl_file:
+        for line in jsonl_file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def read_header(path):
+    """returns the seed in the header of a binary log, None if it isn't known, ValueError if it isn't a log"""
+    with open(path, "rb") as log_file:
+        header = log_file.read(HEADER.size)
+    if len(header) < HEADER.size:
+        raise ValueError(f"{path} is too short to be a binary log")
+    magic, version, flags, record_size, seed = HEADER.unpack(header)
+    if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+        raise ValueError(f"{path} is not a binary log of version {VERSION}")
+    return seed if flags & HEADER_HAS_SEED else None
+
+
+def decode_record(raw_record):
+    """returns a LogRecord of a tuple unpacked from a record"""
+    round_number, shuffle, kind, player, hand, status, flags, cards, decisions, stake, payout = raw_record
+    return LogRecord(round_number, shuffle, kind,
+                     None if player == EMPTY else player,
+                     None if hand == EMPTY else hand,
+                     None if status == EMPTY else STATUS_LIST[status], flags,
+                     cards.rstrip(b"\xff"),
+                     tuple(CHOICE_LIST[index] for index in decisions.rstrip(b"\xff")),
+                     stake, payout)
+
+
+def read_binary(path, raw=False, start=0):
+    """
+    A generator yielding the records of a binary log from a memory map of the file, nothing is read in advance
+    raw: True to yield the tuples unpacked from the records as they are, which is the fastest to scan,
+        False to yield LogRecord
+    start: the index of the first record, negative to count from the end
+    A record cut short at the end of the file, by a writer that didn't close, is skipped
+    """
+    read_header(path)
+    with open(path, "rb") as log_file:
+        size = log_file.seek(0, 2)
+        number_of_records = (size - HEADER.size) // RECORD.size
+        if number_of_records <= 0:
+            return
+        if start < 0:
+            start = max(number_of_records + start, 0)
+        with mmap.mmap(log_file.fileno(), 0, access=mmap.ACCESS_READ) as log_map:
+            view = memoryview(log_map)
+            records = view[HEADER.size + start * RECORD.size:HEADER.size + number_of_records * RECORD.size]
+            try:
+                if raw:
+                    yield from RECORD.iter_unpack(records)
+                else:
+                    for raw_record in RECORD.iter_unpack(records):
+                        yield decode_record(raw_record)
+            finally:
+                records.release()
+                view.release()
+
+
+def read_array(path):
+    """
+    returns the records of a binary log as a read only numpy structured array mapped on the file, it needs numpy
+    The fields are named like LogRecord, cards and decisions are arrays of bytes padded with EMPTY
+    """
+    import numpy as np
+
+    read_header(path)
+    dtype = np.dtype([
+        ("round", "<u8"), ("shuffle", "<u4"), ("kind", "u1"), ("player", "u1"), ("hand", "u1"), ("status", "u1"),
+        ("flags", "u1"), ("cards", "u1", (MAX_RECORD_CARDS,)), ("decisions", "u1", (MAX_RECORD_DECISIONS,)),
+        ("stake", "<i8"), ("payout", "<i8"),
+    ])
+    number_of_records = (_file_size(path) - HEADER.size) // RECORD.size
+    if number_of_records <= 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", offset=HEADER.size, shape=(number_of_records,))
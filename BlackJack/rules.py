@@ -0,0 +1,103 @@
+"""
+This is a module with the rules of the game
+A Rules is immutable and hashable, a table plays by it and the basic strategy and expected value caches are keyed
+by it, so many variants of the rules can be played or analysed in one process
+The default rules are the ones the game has always been played by
+"""
+
+from collections import namedtuple
+
+from money import ROUNDING_LIST
+
+# When a hand can surrender: at any time, only on its first two cards and not after a split, or never
+SURRENDER_LIST = [
+    "any",
+    "late",
+    "none",
+]
+
+# The choices of a hand: stand, hit, double down, split and surrender,
+# in the order they are preferred when their expected values are the same, a round log indexes them in this order
+CHOICE_LIST = ['ST', 'HT', 'DD', 'SP', 'SU']
+
+_FIELDS = [
+    "decks",
+    "hit_soft_17",
+    "blackjack_payout",
+    "double_after_split",
+    "double_max_total",
+    "max_split_hands",
+    "surrender",
+    "peek",
+    "insurance_payout",
+    "payout_rounding",
+]
+
+_DEFAULTS = (6, False, 1.5, True, 11, None, "any", False, 1, "down")
+
+
+class Rules(namedtuple("Rules", _FIELDS, defaults=_DEFAULTS)):
+    """
+    Declaring a rules class, a named tuple so it can't be changed and it can be a dict key
+    decks: the number of decks in the shoe
+    hit_soft_17: True if the dealer hits a soft 17, False if he/she stands on every 17
+    blackjack_payout: what a player blackjack wins for each unit staked, 1.5 for 3:2 and 1.2 for 6:5
+    double_after_split: True if a split hand can double down
+    double_max_total: the highest value of a two card hand that can double down, None for any value
+    max_split_hands: the most hands a player can have by splitting and resplitting, None for no limit
+    surrender: when a hand can surrender, one of SURRENDER_LIST
+    peek: True if the dealer is dealt a hole card and checks it for blackjack when his/her upcard is an ace or a ten,
+        a dealer blackjack then ends the round before the players decide.
+        False if the dealer has no hole card, and a dealer blackjack only counts as 21
+    insurance_payout: what an insurance wins for each unit staked when the dealer has a blackjack
+    payout_rounding: how a payout that isn't a whole number of cents is rounded, one of money.ROUNDING_LIST,
+        like a 3:2 blackjack on an odd number of cents
+    """
+
+    __slots__ = ()
+
+    def __new__(cls, *args, **kwargs):
+        rules = super().__new__(cls, *args, **kwargs)
+        if rules.surrender not in SURRENDER_LIST:
+            raise ValueError(f"surrender must be one of {SURRENDER_LIST}, not {rules.surrender!r}")
+        if rules.max_split_hands is not None and rules.max_split_hands < 1:
+            raise ValueError(f"max_split_hands must be at least 1, not {rules.max_split_hands}")
+        if rules.payout_rounding not in ROUNDING_LIST:
+            raise ValueError(f"payout_rounding must be one of {ROUNDING_LIST}, not {rules.payout_rounding!r}")
+        if rules.decks < 1:
+            raise ValueError(f"decks must be at least 1, not {rules.decks}")
+        return rules
+
+    def __str__(self):
+        split_hands = "any" if self.max_split_hands is None else self.max_split_hands
+        return f"{self.decks} decks | {'H17' if self.hit_soft_17 else 'S17'} " \
+               f"| Blackjack pays {self.blackjack_payout} | {'DAS' if self.double_after_split else 'No DAS'} " \
+               f"| Double on {'any' if self.double_max_total is None else self.double_max_total} or less " \
+               f"| Split to {split_hands} hands | Surrender {self.surrender} " \
+               f"| {'Peek' if self.peek else 'No peek'} | Insurance pays {self.insurance_payout} " \
+               f"| Payouts rounded {self.payout_rounding}"
+
+    @property
+    def cache_key(self):
+        """a short name of the rules, the same in every process and on every machine, for the names of cache files"""
+        # hashlib is imported on first use, only the caches need it and it is slow to import
+        import hashlib
+        return hashlib.sha256(repr(tuple(self)).encode()).hexdigest()[:16]
+
+    def can_double(self, value):
+        """True if a two card hand of value can double down"""
+        return self.double_max_total is None or value <= self.double_max_total
+
+    def can_split(self, number_of_hands):
+        """True if a player with number_of_hands can split one of them"""
+        return self.max_split_hands is None or number_of_hands < self.max_split_hands
+
+    def can_surrender(self, number_of_cards, is_split_hand):
+        """True if a hand of number_of_cards can surrender"""
+        if self.surrender == "any":
+            return True
+        return self.surrender == "late" and number_of_cards == 2 and not is_split_hand
+
+
+# The rules the game is played by when a table isn't given any
+DEFAULT_RULES = Rules()
@@ -0,0 +1,316 @@
+"""
+This is a module with an asyncio server hosting many tables at once for remote players
+Every connection plays at its own table with its own shoe, round after round, in a task of the event loop,
+a decision is awaited from the connection instead of blocking on input, so a slow player only holds up his/her table
+The rounds are played by the steps of Table.round_steps, the same game as Table.play_round
+
+The protocol is made of text lines, words separated by spaces, it can be played with a tool like netcat
+    server: HELLO blackjack <version>
+    client: JOIN <players>                    the number of players, 1 to 6, at the table
+then for every round the server sends events, which need no answer:
+    CARD <player> <hand> <card> <value>        a card drawn, D for the dealer, - for a hand that isn't split
+    RESULT <player> <hand> <status> <amount>   a hand paid out, amount is what the player gets back
+    INSURANCE <player> <amount>                an insurance paid out
+    ROUND <round> <balance> ...                the end of a round and the balance of every player
+Amounts are dollars with two decimals, like 12.50
+and requests, each needs a single line as an answer:
+    STAKE <player> <balance>                   the stake of a new hand
+    DOUBLE <player> <hand> <max>               the extra stake when doubling down, max is the hand's stake
+    INSURE <player> <max>                      an insurance stake, or NO
+    DECIDE <player> <hand> <value> <cards> <choices>   one of the comma separated choices
+    NEXT                                       DEAL for another round or QUIT
+An invalid answer gets an ERROR <message> line and the request is sent again
+The server ends a session with BYE <reason>
+"""
+
+import argparse
+import asyncio
+import random
+
+from blackjack import Table
+from events import NullSink
+from money import format_amount, to_cents
+from parallel import derive_seed
+from rules import DEFAULT_RULES
+from shoe import Shoe
+
+# The version of the protocol sent in the HELLO line
+PROTOCOL_VERSION = 1
+
+# The port the server listens on by default
+DEFAULT_PORT = 8765
+
+# The most players a connection can have at its table
+MAX_PLAYERS = 6
+
+# The connections waiting to be accepted, high so thousands of players can connect at once
+BACKLOG = 4096
+
+# The seconds the server waits for an answer before it ends the session
+DEFAULT_DECISION_TIMEOUT = 300.0
+
+
+class SessionClosed(Exception):
+    """Raised when a player leaves, or doesn't answer in time, in the middle of a round"""
+
+
+def card_str(card):
+    """returns a card as a protocol word, its rank and the initial of its suit, like 10H or AS"""
+    return f"{card.rank}{card.suit[0]}"
+
+
+def hand_str(hand):
+    """returns the index of a split hand as a protocol word, - for a hand that isn't split"""
+    return "-" if hand.index is None else str(hand.index)
+
+
+async def close_writer(writer):
+    """closes the connection of a writer and waits till it is closed, a connection already lost is closed anyway"""
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except ConnectionError:
+        pass
+
+
+async def run_steps(table, steps):
+    """
+    Drives a generator of steps like Table.run, awaiting every answer from the table's strategy,
+    whose stake, insure and decide methods are coroutines
+    """
+    answer = None
+    try:
+        while True:
+            name, arguments = steps.send(answer)
+            answer = await getattr(table.strategy, name)(*arguments)
+    except StopIteration as stop:
+        return stop.value
+
+
+class ProtocolSink(NullSink):
+    """A sink writing the events of a table to a connection, the writes are buffered till the next request"""
+
+    def __init__(self, writer):
+        self.writer = writer
+
+    def draw(self, hand, card):
+        player = "D" if hand.player_index is None else hand.player_index
+        self.writer.write(f"CARD {player} {hand_str(hand)} {card_str(card)} {hand.value}\n".encode())
+
+    def payout(self, hand):
+        self.writer.write(f"RESULT {hand.player_index} {hand_str(hand)} {hand.status} "
+                          f"{format_amount(hand.stake)}\n".encode())
+
+    def insurance_payout(self, player):
+        self.writer.write(f"INSURANCE {player.index} {format_amount(player.insurance)}\n".encode())
+
+
+class RemoteStrategy:
+    """
+    Declaring a strategy asking a remote player for every decision over a connection
+    Its methods are coroutines, it is driven by run_steps, the answers are validated like input_handler does
+    """
+
+    def __init__(self, reader, writer, decision_timeout=DEFAULT_DECISION_TIMEOUT):
+        """
+        decision_timeout: the seconds to wait for an answer, None to wait forever
+        """
+        self.reader = reader
+        self.writer = writer
+        self.decision_timeout = decision_timeout
+
+    async def ask(self, request, parse):
+        """
+        Sends a request and reads answers till parse accepts one
+        parse(answer) returns the decision or raises ValueError with the message sent back to the player
+        """
+        while True:
+            self.writer.write(f"{request}\n".encode())
+            await self.writer.drain()
+            try:
+                line = await asyncio.wait_for(self.reader.readline(), self.decision_timeout)
+            except asyncio.TimeoutError:
+                raise SessionClosed("timeout")
+            if not line:
+                raise SessionClosed("disconnected")
+            try:
+                return parse(line.decode().strip())
+            except ValueError as error:
+                self.writer.write(f"ERROR {error}\n".encode())
+
+    @staticmethod
+    def _amount(answer, upper_limit):
+        """returns the answer, in dollars, as a stake in cents between 0 and upper_limit"""
+        try:
+            amount = to_cents(answer)
+        except (ValueError, ZeroDivisionError):
+            raise ValueError("not a number")
+        if not 0 <= amount <= upper_limit:
+            raise ValueError(f"must be between 0 and {format_amount(upper_limit)}")
+        return amount
+
+    async def stake(self, player, hand, table, double_down=False):
+        if double_down:
+            upper_limit = min(hand.stake, player.balance)
+            return await self.ask(f"DOUBLE {player.index} {hand_str(hand)} {format_amount(upper_limit)}",
+                                  lambda answer: self._amount(answer, upper_limit))
+        return await self.ask(f"STAKE {player.index} {format_amount(player.balance)}",
+                              lambda answer: self._amount(answer, player.balance))
+
+    async def insure(self, player, table):
+        upper_limit = min(player.hand.stake // 2, player.balance)
+
+        def parse(answer):
+            if answer.upper() == "NO":
+                return None
+            return self._amount(answer, upper_limit)
+        return await self.ask(f"INSURE {player.index} {format_amount(upper_limit)}", parse)
+
+    async def decide(self, hand, possible_choices, table):
+        cards = ",".join(card_str(card) for card in hand.card_list)
+
+        def parse(answer):
+            if answer.upper() not in possible_choices:
+                raise ValueError(f"must be one of {','.join(possible_choices)}")
+            return answer.upper()
+        return await self.ask(f"DECIDE {hand.player_index} {hand_str(hand)} {hand.value} {cards} "
+                              f"{','.join(possible_choices)}", parse)
+
+    async def next_round(self):
+        """asks the player if he/she wants another round, returns True for DEAL"""
+        def parse(answer):
+            if answer.upper() not in ("DEAL", "QUIT"):
+                raise ValueError("must be DEAL or QUIT")
+            return answer.upper() == "DEAL"
+        return await self.ask("NEXT", parse)
+
+
+async def play_session(reader, writer, rules=DEFAULT_RULES, rng=None, decision_timeout=DEFAULT_DECISION_TIMEOUT):
+    """
+    Plays the rounds of a single connection, from the JOIN line till the player quits or leaves
+    rng: the random.Random shuffling the session's shoe
+    return: the number of rounds played
+    """
+    strategy = RemoteStrategy(reader, writer, decision_timeout)
+    sink = ProtocolSink(writer)
+    rounds = 0
+    try:
+        def parse_join(answer):
+            words = answer.split()
+            if len(words) != 2 or words[0].upper() != "JOIN" or not words[1].isdigit() \
+                    or not 1 <= int(words[1]) <= MAX_PLAYERS:
+                raise ValueError(f"expected JOIN and 1 to {MAX_PLAYERS} players")
+            return int(words[1])
+        players = await strategy.ask(f"HELLO blackjack {PROTOCOL_VERSION}", parse_join)
+
+        shoe = Shoe(decks=rules.decks, rng=rng)
+        balances = None
+        while True:
+            table = Table(players, strategy=strategy, sink=sink, shoe=shoe, rules=rules, place_stakes=False,
+                          balances=balances)
+            await run_steps(table, table.stake_steps())
+            await run_steps(table, table.round_steps())
+            rounds += 1
+            balances = [player.balance for player in table.player_list]
+            writer.write(f"ROUND {rounds} {' '.join(format_amount(balance) for balance in balances)}\n".encode())
+            if not await strategy.next_round():
+                writer.write(b"BYE quit\n")
+                break
+    except SessionClosed as closed:
+        writer.write(f"BYE {closed}\n".encode())
+    except ConnectionError:
+        pass
+    finally:
+        await close_writer(writer)
+    return rounds
+
+
+async def start_server(host="127.0.0.1", port=DEFAULT_PORT, rules=DEFAULT_RULES, seed=None,
+                       decision_timeout=DEFAULT_DECISION_TIMEOUT):
+    """
+    Starts a server, every connection plays at its own table
+    port: the port to listen on, 0 for any free port, see server.sockets
+    seed: the master seed of the shoes, each session's seed is derived from it and the session's number,
+        None for unseeded shoes
+    return: an asyncio.Server, already serving
+    """
+    sessions = 0
+
+    async def handle(reader, writer):
+        nonlocal sessions
+        rng = random.Random(None if seed is None else derive_seed(seed, sessions))
+        sessions += 1
+        await play_session(reader, writer, rules, rng, decision_timeout)
+
+    return await asyncio.start_server(handle, host, port, backlog=BACKLOG)
+
+
+async def play_client(host, port, players=1, rounds=10, stake=10, latencies=None, delay=0.0):
+    """
+    A simple remote player for tests and benchmarks, it plays every hand like the dealer, hitting till 17 or more
+    stake: the stake of every hand in dollars
+    latencies: a list the seconds from every answer sent to the next request received are appended to, if given
+    delay: the seconds to wait before every answer, to play like a slow player
+    return: the balances after the last round, in dollars
+    """
+    loop = asyncio.get_running_loop()
+    reader, writer = await asyncio.open_connection(host, port)
+    balances = []
+    rounds_played = 0
+    sent_at = None
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            words = line.decode().split()
+            kind = words[0]
+            if kind == "HELLO":
+                answer = f"JOIN {players}"
+            elif kind == "STAKE":
+                answer = str(min(stake, float(words[2])))
+            elif kind == "DOUBLE":
+                answer = words[3]
+            elif kind == "INSURE":
+                answer = "NO"
+            elif kind == "DECIDE":
+                answer = "HT" if int(words[3]) < 17 else "ST"
+            elif kind == "NEXT":
+                answer = "DEAL" if rounds_played < rounds else "QUIT"
+            elif kind == "ROUND":
+                rounds_played, balances = int(words[1]), [float(balance) for balance in words[2:]]
+                continue
+            elif kind in ("BYE", "ERROR"):
+                if kind == "ERROR":
+                    raise RuntimeError(line.decode().strip())
+                break
+            else:
+                continue
+
+            if latencies is not None and sent_at is not None:
+                latencies.append(loop.time() - sent_at)
+            if delay:
+                await asyncio.sleep(delay)
+            writer.write(f"{answer}\n".encode())
+            sent_at = loop.time()
+    finally:
+        await close_writer(writer)
+    return balances
+
+
+async def _serve_forever(host, port, rules, seed, decision_timeout):
+    server = await start_server(host, port, rules, seed, decision_timeout)
+    print(f"Serving Black Jack on {', '.join(str(sock.getsockname()) for sock in server.sockets)}")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve Black Jack tables to remote players.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--seed", type=int, default=None, help="the master seed of the shoes")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_DECISION_TIMEOUT,
+                        help="the seconds to wait for an answer")
+    arguments = parser.parse_args()
+    asyncio.run(_serve_forever(arguments.host, arguments.port, DEFAULT_RULES, arguments.seed, arguments.timeout))
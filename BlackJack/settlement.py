@@ -0,0 +1,132 @@
+"""
+This is a module for settling the hands of many tables at once with numpy, it needs numpy
+settle_arrays works out the statuses and payouts of hands kept as arrays, a simulation keeping its hands
+as arrays settles millions of them a second with it
+settle_tables does the same for tables that have played their rounds up to the settlement with Table.play_steps,
+and credits every player once with all of his/her hands, like Table.settle does for a single table.
+The hands of a table are python objects, gathering them into arrays and setting them back costs more
+than Table.settle's single pass, so settle_tables is for a batch simulation that needs the tables' hands settled
+in one place, not for speed
+The statuses and payouts are the same as Table.settle's, so a batch of tables plays like the tables one by one
+"""
+
+import numpy as np
+
+from blackjack import HandStatus, STATUS_LIST
+
+# The status of a hand settled against a dealer who hasn't bust, by the sign of the dealer's value minus the hand's,
+# index -1 is the hand with the greater value
+_SETTLED_STATUS_ARRAY = np.array(
+    [HandStatus.PUSH, HandStatus.LOST_BY_LESS_DEALER, HandStatus.WON_BY_GREATER_DEALER], dtype=np.int8
+)
+
+
+def rate_arrays(rates):
+    """returns the payout_rates of a table as int64 arrays indexed by status, (multipliers, numerators, denominators)"""
+    rates = [(0, 0, 1) if rate is None else rate for rate in rates]
+    return tuple(np.array(column, dtype=np.int64) for column in zip(*rates))
+
+
+def scale_array(cents, numerators, denominators, rounding="down"):
+    """returns cents * numerators / denominators rounded to whole cents, money.scale on int64 arrays"""
+    if rounding == "down":
+        return cents * numerators // denominators
+    if rounding == "up":
+        return -(-cents * numerators // denominators)
+    quotients, remainders = np.divmod(cents * numerators, denominators)
+    return quotients + ((2 * remainders > denominators) | ((2 * remainders == denominators) & (quotients % 2 == 1)))
+
+
+def settled_statuses(values, dealer_values):
+    """returns the status of every hand settled against the dealer's hand of its table, as int8"""
+    statuses = _SETTLED_STATUS_ARRAY[np.sign(dealer_values - values)]
+    return np.where(dealer_values > 21, np.int8(HandStatus.WON_BY_DEALER_BUST), statuses)
+
+
+def payouts(stakes, statuses, rates, rounding="down"):
+    """
+    returns what every hand gets back for its status, Table.payout on arrays
+    stakes: the stakes of the hands in cents, int64
+    statuses: the statuses of the hands
+    rates: the payout_rates of the rules
+    rounding: the rules' payout_rounding
+    """
+    multipliers, numerators, denominators = rate_arrays(rates)
+    paid = stakes * multipliers[statuses]
+    numerators, denominators = numerators[statuses], denominators[statuses]
+    fractions = numerators != 0
+    if fractions.any():
+        paid[fractions] += scale_array(stakes[fractions], numerators[fractions], denominators[fractions], rounding)
+    return paid
+
+
+def settle_arrays(stakes, values, dealer_values, rates, rounding="down"):
+    """
+    returns (statuses, payouts) of hands settled against the dealer's hands of their tables
+    stakes: the stakes of the hands in cents, int64
+    values: the values of the hands
+    dealer_values: the value of the dealer's hand of the table of every hand
+    rates: the payout_rates of the rules
+    rounding: the rules' payout_rounding
+    """
+    statuses = settled_statuses(values, dealer_values)
+    return statuses, payouts(stakes, statuses, rates, rounding)
+
+
+def settle_tables(tables):
+    """
+    Settles the active hands of many tables at once, the tables have played their rounds up to the settlement,
+    see Table.play_steps, and all play by the same rules
+    Every hand gets its status and payout and is sent to its table's sink, then every player is credited once
+    return: the number of hands settled
+    """
+    hands, table_indexes, player_indexes = [], [], []
+    for table_index, table in enumerate(tables):
+        if not table.are_all_active_hands_standing():
+            continue
+        for player in table.player_list:
+            for hand in (player.split_hand if player.is_split else (player.hand,)):
+                if hand.is_active:
+                    hands.append(hand)
+                    table_indexes.append(table_index)
+                    player_indexes.append(player.index)
+    if not hands:
+        return 0
+
+    table_indexes = np.array(table_indexes)
+    dealer_values = np.array([table.dealer.hand.value for table in tables])[table_indexes]
+    values = np.array([hand.value for hand in hands])
+    stakes = np.array([hand.stake for hand in hands], dtype=np.int64)
+    statuses, paid = settle_arrays(stakes, values, dealer_values, tables[0].payout_rates,
+                                   tables[0].rules.payout_rounding)
+
+    for hand, table_index, status, payout in zip(hands, table_indexes.tolist(), statuses.tolist(), paid.tolist()):
+        hand.status = STATUS_LIST[status]
+        hand.stake = payout
+        tables[table_index].sink.payout(hand)
+        hand.stake = 0
+        hand.is_active = False
+
+    # one credit per player, the payouts of his/her hands added up
+    players_per_table = max(len(table.player_list) for table in tables)
+    player_keys = table_indexes * players_per_table + np.array(player_indexes)
+    credits = np.zeros(len(tables) * players_per_table, dtype=np.int64)
+    np.add.at(credits, player_keys, paid)
+    for key in np.flatnonzero(credits).tolist():
+        table_index, player_index = divmod(key, players_per_table)
+        credit = int(credits[key])
+        tables[table_index].player_list[player_index].balance += credit
+        tables[table_index].balance -= credit
+    return len(hands)
+
+
+def play_rounds(tables):
+    """
+    Plays a round on every table, each with its own strategy, and settles all of their hands together,
+    like Table.play_round on each table
+    """
+    for table in tables:
+        table.run(table.play_steps())
+    settle_tables(tables)
+    for table in tables:
+        table.end_round()
@@ -0,0 +1,175 @@
+"""
+This is a module with a compact shoe that lasts for many rounds
+The cards of the shoe are kept as integer codes in a bytearray, one byte per card,
+drawing a card returns the shared Card view of its code from cards.CARDS
+The shoe is reshuffled only when the cut card has been reached, the cards of finished rounds go to the discard tray
+The shuffle is lazy, a partial Fisher-Yates shuffle: every card is picked at random from the cards left
+when it is drawn, so a shuffle costs nothing up front and the first round of a shoe only pays for the cards it uses
+"""
+
+import random
+
+from cards import CARDS, CARD_HARD_VALUES
+
+# The codes of a single deck of cards
+DECK_CODES = bytes(range(len(CARDS)))
+
+# A translation table from a card code to its hard value, for bytes.translate
+HARD_VALUE_TABLE = CARD_HARD_VALUES + bytes(256 - len(CARD_HARD_VALUES))
+
+
+class Shoe:
+    """
+    Declaring a compact shoe class, the shoe of a table
+    The codes are kept in the order they are drawn: codes[:discarded] are in the discard tray,
+    codes[discarded:position] are on the table and codes[position:] are still in the shoe,
+    only codes[:shuffled_to] are in their shuffled order, the ones after it are picked from at random when drawn
+    """
+
+    def __init__(self, decks=6, penetration=0.75, cut_card=None, rng=None):
+        """
+        decks: the number of decks in the shoe
+        penetration: the part of the shoe dealt before the cut card is reached, used if cut_card is None
+        cut_card: the number of cards dealt before the cut card is reached
+        rng: a random.Random used to shuffle the shoe, defaults to the random module
+        codes: the codes of all the cards of the shoe, in the order they are drawn
+        position: the index in codes of the next card to draw
+        discarded: the number of cards in the discard tray
+        shuffles: the number of times the shoe has been shuffled
+        shuffled_to: the number of codes in their shuffled order, the next card drawn after them is picked at random
+        """
+        self.decks = decks
+        self.rng = random if rng is None else rng
+        self.codes = bytearray(DECK_CODES * decks)
+        self.cut_card = int(len(self.codes) * penetration) if cut_card is None else cut_card
+        self.position = 0
+        self.discarded = 0
+        self.shuffles = 0
+        self.shuffled_to = 0
+        self.shuffle()
+
+    def __len__(self):
+        return len(self.codes) - self.position
+
+    def __str__(self):
+        return f"Shoe of {self.decks} decks | {len(self)} cards left | {self.discarded} cards discarded " \
+               f"| cut card at {self.cut_card}"
+
+    @property
+    def is_cut_card_reached(self):
+        """True if the cut card has been dealt, the shoe should be shuffled before the next round"""
+        return self.position >= self.cut_card
+
+    def shuffle(self):
+        """
+        shuffles all the cards of the shoe and the discard tray back in place, the next card drawn is the first
+        Nothing is moved or allocated, the cards are picked at random as they are drawn, see pop_code
+        """
+        self.position = 0
+        self.discarded = 0
+        self.shuffled_to = 0
+        self.shuffles += 1
+
+    def fix_order(self):
+        """
+        puts every card left in its shuffled order now instead of when it is drawn, codes[position:] is then
+        the order the cards will be drawn in, whatever the rng does after
+        Sorting by a random key is a uniform shuffle, and it is faster than the Fisher-Yates loop in python
+        """
+        start = max(self.shuffled_to, self.position)
+        random_key = self.rng.random
+        self.codes[start:] = bytes(sorted(self.codes[start:], key=lambda code: random_key()))
+        self.shuffled_to = len(self.codes)
+
+    def load(self, codes):
+        """
+        replaces the cards of the shoe with codes, in the order they are drawn, like a shoe shuffled elsewhere,
+        so shoes made once can be dealt again, see evaluation
+        """
+        self.codes[:] = codes
+        self.position = 0
+        self.discarded = 0
+        self.shuffled_to = len(self.codes)
+        self.shuffles += 1
+
+    def start_round(self):
+        """
+        shuffles the shoe if the cut card has been reached, called before a round is dealt
+        A shoe dealing its second round or more is kept for many rounds, the order of its cards left is fixed
+        then by fix_order, which costs less per card than drawing them lazily, so only a shoe dealing
+        a single round, a new table's, draws all of its cards lazily
+        """
+        if self.is_cut_card_reached:
+            self.shuffle()
+        elif self.position and self.shuffled_to < len(self.codes):
+            self.fix_order()
+
+    def discard(self, number_of_cards):
+        """moves the cards of a finished round from the table to the discard tray"""
+        self.discarded = min(self.discarded + number_of_cards, self.position)
+
+    def discard_tray(self):
+        """returns the Card views in the discard tray"""
+        return [CARDS[code] for code in self.codes[:self.discarded]]
+
+    def _shuffle_discard_tray(self):
+        """
+        shuffles the discard tray back into the shoe when it runs out in the middle of a round,
+        the cards on the table are kept in front of the shoe
+        """
+        in_play = self.codes[self.discarded:self.position]
+        tray = self.codes[:self.discarded]
+        if not tray:
+            raise IndexError("draw from an empty shoe")
+        self.codes[:] = in_play + tray
+        self.position = len(in_play)
+        self.shuffled_to = self.position
+        self.discarded = 0
+        self.shuffles += 1
+
+    def pop_code(self):
+        """
+        draws the next card, returns its code
+        A card past shuffled_to is swapped with one picked at random from the cards left, a step of Fisher-Yates,
+        int(random() * n) is as uniform as the 53 bits of a float, like the random keys of a sort
+        """
+        codes = self.codes
+        position = self.position
+        if position == len(codes):
+            self._shuffle_discard_tray()
+            position = self.position
+        if position >= self.shuffled_to:
+            picked = position + int(self.rng.random() * (len(codes) - position))
+            codes[position], codes[picked] = codes[picked], codes[position]
+            self.shuffled_to = position + 1
+        self.position = position + 1
+        return codes[position]
+
+    def pop(self):
+        """draws the next card, returns its Card view, like list.pop on a list shoe"""
+        return CARDS[self.pop_code()]
+
+    def snapshot(self, include_rng=False):
+        """
+        returns the state of the shoe, to restore it later, the codes are copied, a few hundred bytes
+        The order of the cards left is fixed first, see fix_order, so the shoe deals the same cards after every restore
+        include_rng: True to also keep the state of the rng, so a shuffle after a restore is the same shuffle,
+            it costs more than the rest of the snapshot
+        """
+        if self.shuffled_to < len(self.codes):
+            self.fix_order()
+        rng_state = self.rng.getstate() if include_rng else None
+        return bytes(self.codes), self.position, self.discarded, self.shuffles, rng_state
+
+    def restore(self, snapshot):
+        """sets the shoe back to a state returned by snapshot"""
+        codes, self.position, self.discarded, self.shuffles, rng_state = snapshot
+        self.shuffled_to = len(codes)
+        self.codes[:] = codes
+        if rng_state is not None:
+            self.rng.setstate(rng_state)
+
+    def composition(self):
+        """returns the number of cards of each hard value left in the shoe, index 0 for aces and 9 for tens"""
+        hard_values = self.codes[self.position:].translate(HARD_VALUE_TABLE)
+        return tuple(hard_values.count(hard_value) for hard_value in range(1, 11))
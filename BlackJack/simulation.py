@@ -0,0 +1,136 @@
+"""
+This is a module for running the game headless, many rounds in a batch without any user input
+It is used to estimate the house edge and the risk on a player's bankroll
+"""
+
+import random
+
+from blackjack import Table, STATUS_LIST
+from counting import CardCounter
+from events import NullSink
+from money import CENTS
+from rules import DEFAULT_RULES
+from shoe import Shoe
+from strategy import MimicDealerStrategy
+
+
+class SimulationResult:
+    """Declaring a class holding the aggregated results of a simulation"""
+
+    def __init__(self):
+        """
+        rounds: the number of rounds played
+        hands: the number of hands started, one per player per round, split hands are not counted again
+        total_staked: the sum of the first stakes on the hands, in cents like every amount
+        total_net: the sum of what the players won or lost
+        total_net_squared: the sum of the squares of what the players won or lost on each hand, for the variance
+        wins, losses, pushes, blackjacks, surrenders: the number of hands settled with that status,
+                split hands are each counted
+        """
+        self.rounds = 0
+        self.hands = 0
+        self.total_staked = 0
+        self.total_net = 0
+        self.total_net_squared = 0
+        self.wins = 0
+        self.losses = 0
+        self.pushes = 0
+        self.blackjacks = 0
+        self.surrenders = 0
+
+    def __str__(self):
+        return f"Rounds => {self.rounds} | Hands => {self.hands} | EV per hand => ${self.ev / CENTS:.4f} " \
+               f"| House edge => {self.house_edge:.4%} | Variance => {self.variance / CENTS ** 2:.4f} " \
+               f"| Wins => {self.wins} | Losses => {self.losses} | Pushes => {self.pushes} " \
+               f"| Blackjacks => {self.blackjacks} | Surrenders => {self.surrenders}"
+
+    @property
+    def ev(self):
+        """the average amount won per hand, in cents"""
+        return self.total_net / self.hands if self.hands else 0.0
+
+    @property
+    def house_edge(self):
+        """the amount the house wins for every unit staked"""
+        return -self.total_net / self.total_staked if self.total_staked else 0.0
+
+    @property
+    def variance(self):
+        """the variance of the amount won per hand, in cents squared"""
+        if self.hands < 2:
+            return 0.0
+        return (self.total_net_squared - self.total_net ** 2 / self.hands) / (self.hands - 1)
+
+    def merge(self, other):
+        """adds the results of another simulation to this one, returns this result"""
+        self.rounds += other.rounds
+        self.hands += other.hands
+        self.total_staked += other.total_staked
+        self.total_net += other.total_net
+        self.total_net_squared += other.total_net_squared
+        self.wins += other.wins
+        self.losses += other.losses
+        self.pushes += other.pushes
+        self.blackjacks += other.blackjacks
+        self.surrenders += other.surrenders
+        return self
+
+    def add_status(self, status):
+        """counts a settled hand by its status"""
+        if status == STATUS_LIST[7]:
+            self.blackjacks += 1
+        elif status in (STATUS_LIST[5], STATUS_LIST[6]):
+            self.wins += 1
+        elif status in (STATUS_LIST[3], STATUS_LIST[4]):
+            self.losses += 1
+        elif status == STATUS_LIST[2]:
+            self.surrenders += 1
+        elif status == STATUS_LIST[1]:
+            self.pushes += 1
+
+    def add_table(self, table, starting_balances, first_stakes):
+        """adds up the results of a table after its round has been played"""
+        self.rounds += 1
+        for player, starting_balance, first_stake in zip(table.player_list, starting_balances, first_stakes):
+            net = player.balance - starting_balance
+            self.hands += 1
+            self.total_staked += first_stake
+            self.total_net += net
+            self.total_net_squared += net * net
+            for hand in (player.split_hand if player.is_split else [player.hand]):
+                self.add_status(hand.status)
+
+
+def simulate(rounds, players=1, strategy=None, seed=None, sink=None, rules=None, penetration=0.75,
+             counting_systems=None):
+    """
+    Plays a number of rounds without asking the user anything and without printing
+    rounds: the number of rounds to play, every round is played on a new table, all dealt from the same shoe
+    players: the number of players on each table
+    strategy: makes every stake, insurance and hand decision, defaults to MimicDealerStrategy
+    seed: the seed of the random numbers shuffling the shoes, the same seed plays the same rounds
+    sink: receives the events of every table, defaults to a NullSink so nothing is printed
+    rules: the rules.Rules every table plays by, and the number of decks in the shoe, defaults to rules.DEFAULT_RULES
+    penetration: the part of the shoe dealt before it is shuffled again
+    counting_systems: the systems of a counting.CardCounter kept on the shoe across the rounds,
+        the strategy reads it from table.counter, None not to count
+    return: a SimulationResult
+    """
+    if strategy is None:
+        strategy = MimicDealerStrategy()
+    if sink is None:
+        sink = NullSink()
+    if rules is None:
+        rules = DEFAULT_RULES
+    shoe = Shoe(decks=rules.decks, penetration=penetration, rng=random.Random(seed))
+    counter = None if counting_systems is None else CardCounter(shoe, counting_systems)
+    result = SimulationResult()
+
+    for _ in range(rounds):
+        table = Table(players, strategy=strategy, sink=sink, shoe=shoe, counter=counter, rules=rules)
+        starting_balances = [player.balance + player.hand.stake for player in table.player_list]
+        first_stakes = [player.hand.stake for player in table.player_list]
+        table.play_round()
+        result.add_table(table, starting_balances, first_stakes)
+
+    return result
@@ -0,0 +1,96 @@
+"""
+This is a module with automated strategies for the game
+A strategy makes the stake, insurance and hand decisions of a table instead of asking the user
+The stakes are in cents, see money
+"""
+
+from abc import ABC, abstractmethod
+
+from cards import CARD_HARD_VALUES
+
+# The stake of a new hand by default, in cents, $10.00
+DEFAULT_STAKE = 1000
+
+
+class Strategy(ABC):
+    """
+    Declaring a base strategy class
+    It stakes a flat amount on every hand, doubles down with the full stake of the hand and never insures
+    Subclasses only need to implement decide, a subclass without it can't be made
+    """
+
+    def __init__(self, base_stake=DEFAULT_STAKE):
+        """
+        base_stake: the amount in cents staked on every new hand
+        """
+        self.base_stake = base_stake
+
+    def stake(self, player, hand, table, double_down=False):
+        """returns the stake of a new hand, or the extra stake when doubling down"""
+        if double_down:
+            return min(hand.stake, player.balance)
+        return min(self.base_stake, player.balance)
+
+    def insure(self, player, table):
+        """returns the insurance stake, None as the player never insures"""
+        return None
+
+    @abstractmethod
+    def decide(self, hand, possible_choices, table):
+        """returns one of the possible choices for the hand"""
+
+
+class MimicDealerStrategy(Strategy):
+    """A strategy that plays the hand like the dealer does, hitting till 17 or more"""
+
+    def decide(self, hand, possible_choices, table):
+        return 'HT' if hand.value < 17 else 'ST'
+
+
+class HeuristicStrategy(Strategy):
+    """
+    A strategy playing like a casual player, from the possible choices of the hand and the dealer's upcard
+    It splits aces and eights, doubles down on 10 and 11 against a 2 to 9, hits below 12 and stands on 17 or more,
+    in between it stands against a 2 to 6, the dealer's bust cards, and hits against a 7 or more
+    """
+
+    def decide(self, hand, possible_choices, table):
+        upcard = CARD_HARD_VALUES[table.dealer.hand.card_list[0].code]
+        value = hand.value
+        if 'SP' in possible_choices and hand.card_list[0].rank in ('A', '8'):
+            return 'SP'
+        if 'DD' in possible_choices and not hand.is_soft and value in (10, 11) and 2 <= upcard <= 9:
+            return 'DD'
+        if value < 12:
+            return 'HT'
+        if value >= 17 or 2 <= upcard <= 6:
+            return 'ST'
+        return 'HT'
+
+
+class CallbackStrategy(Strategy):
+    """
+    A strategy made from plain functions
+    decide_callback(hand, possible_choices, table) returns the choice for a hand
+    stake_callback(player, hand, table, double_down) returns a stake, defaults to the flat stake
+    insure_callback(player, table) returns an insurance stake or None, defaults to never insuring
+    """
+
+    def __init__(self, decide_callback, stake_callback=None, insure_callback=None, base_stake=DEFAULT_STAKE):
+        super().__init__(base_stake=base_stake)
+        self.decide_callback = decide_callback
+        self.stake_callback = stake_callback
+        self.insure_callback = insure_callback
+
+    def stake(self, player, hand, table, double_down=False):
+        if self.stake_callback is None:
+            return super().stake(player, hand, table, double_down=double_down)
+        return self.stake_callback(player, hand, table, double_down)
+
+    def insure(self, player, table):
+        if self.insure_callback is None:
+            return None
+        return self.insure_callback(player, table)
+
+    def decide(self, hand, possible_choices, table):
+        return self.decide_callback(hand, possible_choices, table)
@@ -0,0 +1,42 @@
+"""
+Tests of the round logs, run with python -m pytest
+Rounds are dealt from stacked shoes, see test_settlement, logged in both formats and read back
+"""
+
+import pytest
+
+import roundlog
+from test_settlement import stacked_table
+
+
+def log_round(path, writer_class, ranks, choices=(), **kwargs):
+    """plays a round from a stacked shoe with its events logged to a new log at path, returns the table"""
+    table = stacked_table(ranks, choices, **kwargs)
+    with writer_class(str(path), seed=1) as writer:
+        table.sink = roundlog.RoundLogSink(writer)
+        table.play_round()
+    return table
+
+
+@pytest.mark.parametrize("dealer_card, insurance_payout", [("J", 1000), ("6", 0)])
+def test_insurance_payout_is_logged(tmp_path, dealer_card, insurance_payout):
+    # a 19 against an ace, insured with 500, the dealer's second card makes a blackjack with a jack,
+    # which pays the insurance 1:1, or a soft 17 with a six, which loses it
+    ranks = ["10", "A", "9", dealer_card]
+
+    log_round(tmp_path / "rounds.bin", roundlog.BinaryLogWriter, ranks, ["ST"], insurance=500)
+    records = [record for record in roundlog.read_binary(str(tmp_path / "rounds.bin"))
+               if record.kind == roundlog.RECORD_INSURANCE]
+    assert [(record.player, record.status, record.stake, record.payout) for record in records] == \
+        [(0, None, 500, insurance_payout)]
+
+    log_round(tmp_path / "rounds.jsonl", roundlog.JsonlLogWriter, ranks, ["ST"], insurance=500)
+    player, = next(roundlog.read_jsonl(str(tmp_path / "rounds.jsonl")))["players"]
+    assert (player["insurance"], player["insurance_payout"]) == (500, insurance_payout)
+
+
+def test_uninsured_round_has_no_insurance_record(tmp_path):
+    log_round(tmp_path / "rounds.bin", roundlog.BinaryLogWriter, ["10", "A", "9", "J"], ["ST"])
+    kinds = [record.kind for record in roundlog.read_binary(str(tmp_path / "rounds.bin"))]
+    assert kinds == [roundlog.RECORD_DEALER, roundlog.RECORD_HAND]
+
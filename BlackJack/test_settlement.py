@@ -0,0 +1,178 @@
+"""
+Regression tests of the settlement of a round, run with python -m pytest
+The payouts of Table.payout and Table.settle are checked against the rates the game paid before the statuses
+were integers and the amounts cents, and whole rounds are dealt from stacked shoes to check the balances
+after blackjacks, wins, losses, pushes, doubles, splits, surrenders, insurances and dealer blackjacks
+"""
+
+import math
+import random
+from fractions import Fraction
+
+import pytest
+
+from blackjack import HandStatus, Hand, STARTING_BALANCE, Table
+from cards import RANK_LIST
+from events import NullSink
+from rules import DEFAULT_RULES, Rules
+from shoe import Shoe
+from strategy import CallbackStrategy
+
+# The rate of every status before the payouts were in cents, the hand got back stake + stake * rate
+OLD_RATES = {
+    HandStatus.PUSH: 0,
+    HandStatus.LOST_BY_SURRENDER: Fraction(-1, 2),
+    HandStatus.LOST_BY_BUST: -1,
+    HandStatus.LOST_BY_LESS_DEALER: -1,
+    HandStatus.WON_BY_DEALER_BUST: 1,
+    HandStatus.WON_BY_GREATER_DEALER: 1,
+}
+
+# The cards after the stacked ones, so a round that draws more than expected doesn't run out
+FILLER = ["10"] * 20
+
+
+def rounded(amount, rounding):
+    """returns an exact amount of cents rounded to a whole cent, round rounds a Fraction half to even"""
+    if rounding == "down":
+        return math.floor(amount)
+    if rounding == "up":
+        return math.ceil(amount)
+    return round(amount)
+
+
+def old_payout(status, stake, rules):
+    """
+    returns what the game paid a hand before the amounts were cents, rounded to a cent like the rules say,
+    the part rounded is the winnings of a blackjack and what a surrender gets back
+    """
+    if status == HandStatus.BLACK_JACK:
+        return stake + rounded(stake * Fraction(str(rules.blackjack_payout)), rules.payout_rounding)
+    return rounded(stake + stake * OLD_RATES[status], rules.payout_rounding)
+
+
+def stacked_table(ranks, choices=(), players=1, rules=DEFAULT_RULES, stake=1000, insurance=None):
+    """
+    returns a table whose shoe deals the ranks in order, its players stake the same and make the choices in order
+    insurance: the insurance stake of every player asked, None not to insure
+    """
+    shoe = Shoe(rules.decks, rng=random.Random(0))
+    shoe.load(bytes(RANK_LIST.index(rank) for rank in list(ranks) + FILLER))
+    script = iter(choices)
+    strategy = CallbackStrategy(lambda hand, possible_choices, table: next(script),
+                                insure_callback=lambda player, table: insurance, base_stake=stake)
+    return Table(players, strategy=strategy, sink=NullSink(), shoe=shoe, rules=rules)
+
+
+def play(ranks, choices=(), **kwargs):
+    """plays a round from a stacked shoe, returns the table and the net result of every player"""
+    table = stacked_table(ranks, choices, **kwargs)
+    table.play_round()
+    return table, [player.balance - STARTING_BALANCE for player in table.player_list]
+
+
+@pytest.mark.parametrize("rounding", ["down", "up", "half_even"])
+@pytest.mark.parametrize("status", list(OLD_RATES) + [HandStatus.BLACK_JACK])
+def test_payout_matches_old_rates(status, rounding):
+    rules = Rules(payout_rounding=rounding)
+    table = Table(1, strategy=CallbackStrategy(None), sink=NullSink(), rules=rules, place_stakes=False)
+    for stake in range(1, 2002, 7):
+        hand = Hand(player_index=0)
+        hand.stake, hand.status = stake, status
+        table.balance += stake
+        table.payout(hand)
+        assert table.player_list[0].balance - STARTING_BALANCE == old_payout(status, stake, rules)
+        table.player_list[0].balance = STARTING_BALANCE
+        table.balance = 0
+
+
+@pytest.mark.parametrize("ranks, choices, status, net", [
+    (["A", "9", "K", "8"], [], HandStatus.BLACK_JACK, 1500),
+    (["10", "9", "Q", "8"], ["ST"], HandStatus.WON_BY_GREATER_DEALER, 1000),
+    (["10", "9", "7", "K"], ["ST"], HandStatus.LOST_BY_LESS_DEALER, -1000),
+    (["10", "9", "8", "9"], ["ST"], HandStatus.PUSH, 0),
+    (["10", "6", "6", "10", "10"], ["ST"], HandStatus.WON_BY_DEALER_BUST, 1000),
+    (["10", "6", "6", "K"], ["HT"], HandStatus.LOST_BY_BUST, -1000),
+    (["10", "9", "6"], ["SU"], HandStatus.LOST_BY_SURRENDER, -500),
+])
+def test_round(ranks, choices, status, net):
+    table, nets = play(ranks, choices)
+    assert table.player_list[0].hand.status == status
+    assert nets == [net]
+
+
+def test_double_down_pays_the_doubled_stake():
+    table, nets = play(["5", "9", "6", "10", "8"], ["DD"])
+    assert table.player_list[0].hand.status == HandStatus.WON_BY_GREATER_DEALER
+    assert nets == [2000]
+    table, nets = play(["5", "9", "6", "2", "8"], ["DD"])
+    assert table.player_list[0].hand.status == HandStatus.LOST_BY_LESS_DEALER
+    assert nets == [-2000]
+
+
+def test_split_hands_are_settled_each_with_its_stake():
+    # 8 8 against a 7, the first hand draws a 10 and stands on 18, the second draws a 3 and doubles to 20,
+    # the dealer draws a king and stands on 17
+    table, nets = play(["8", "7", "8", "10", "3", "9", "K"], ["SP", "ST", "DD"])
+    player = table.player_list[0]
+    assert player.is_split
+    assert [hand.status for hand in player.split_hand] == [HandStatus.WON_BY_GREATER_DEALER] * 2
+    assert nets == [1000 + 2000]
+
+
+@pytest.mark.parametrize("rounding, net", [("down", -501), ("up", -500), ("half_even", -501)])
+def test_surrender_of_odd_cents_is_rounded_by_the_rules(rounding, net):
+    assert play(["10", "9", "6"], ["SU"], rules=Rules(payout_rounding=rounding), stake=1001)[1] == [net]
+
+
+@pytest.mark.parametrize("rounding, net", [("down", 1501), ("up", 1502), ("half_even", 1502)])
+def test_blackjack_of_odd_cents_is_rounded_by_the_rules(rounding, net):
+    assert play(["A", "9", "K", "8"], rules=Rules(payout_rounding=rounding), stake=1001)[1] == [net]
+
+
+def test_insurance_without_peek():
+    # the dealer's blackjack is only known when he/she draws, it beats a 19 and pays the insurance 1:1
+    assert play(["10", "A", "9", "K"], ["ST"], insurance=500)[1] == [-1000 + 500]
+    # no blackjack, the 19 beats a soft 17 and the insurance is lost
+    assert play(["10", "A", "9", "6"], ["ST"], insurance=500)[1] == [1000 - 500]
+
+
+def test_dealer_blackjack_with_peek():
+    rules = Rules(peek=True, insurance_payout=2)
+    # the hole card is a king, the round ends before the player decides and the insurance pays 2:1
+    table, nets = play(["10", "A", "9", "K"], rules=rules, insurance=500)
+    assert table.player_list[0].hand.status == HandStatus.LOST_BY_LESS_DEALER
+    assert nets == [-1000 + 1000]
+    # a blackjack against the dealer's blackjack is a push
+    table, nets = play(["A", "A", "K", "Q"], rules=rules)
+    assert table.player_list[0].hand.status == HandStatus.PUSH
+    assert nets == [0]
+
+
+def test_every_player_is_settled():
+    # three players against a dealer standing on 18: 20 wins, 18 pushes, 17 loses
+    table, nets = play(["10", "10", "10", "9", "Q", "8", "7", "9"], ["ST", "ST", "ST"], players=3)
+    assert nets == [1000, 0, -1000]
+    assert table.balance == 0
+
+
+def random_strategy(seed):
+    """returns a strategy making random choices, the same ones for the same seed"""
+    rng = random.Random(seed)
+    return CallbackStrategy(lambda hand, possible_choices, table: rng.choice(possible_choices))
+
+
+def test_settle_tables_matches_table_settle():
+    settlement = pytest.importorskip("settlement")
+    for players in range(1, 5):
+        tables, expected = [], []
+        for seed in range(50):
+            table = Table(players, strategy=random_strategy(seed), sink=NullSink(), shoe=Shoe(rng=random.Random(seed)))
+            snapshot = table.snapshot()
+            table.play_round()
+            expected.append([player.balance for player in table.player_list])
+            table.restore(snapshot)
+            table.strategy = random_strategy(seed)
+            tables.append(table)
+        settlement.play_rounds(tables)
+        assert [[player.balance for player in table.player_list] for table in tables] == expected
@@ -0,0 +1,404 @@
+"""
+This is a module for a terminal view of a table, redrawn in place instead of printed line after line
+A TerminalSink keeps a Screen, the rows of text the terminal shows: the table's balance and shoe, the dealer,
+and every player with his/her balance and hands, their cards, values, stakes and statuses.
+After an event the table is drawn on a new Screen, and only the cells that changed since the last frame
+are written to the terminal, with ANSI escape sequences moving the cursor to them,
+so a frame costs a few bytes instead of the whole table, which matters over a slow connection.
+Frames are capped at a number per second, the events in between are drawn together by the next frame
+A VirtualTerminal reads what a TerminalSink writes back into rows of text, to check a view without a terminal
+"""
+
+import re
+import shutil
+import sys
+import time
+
+from events import NullSink
+from input_handler import ConsoleInput
+from money import format_money
+
+# The most frames drawn per second by default, the events of a frame that comes too early wait for the next one
+DEFAULT_FPS = 30
+
+# The escape sequences of the terminal: moving the cursor to a row and a column counted from 1,
+# clearing the screen, clearing the end of the line, hiding and showing the cursor
+MOVE_CURSOR = "\x1b[{row};{column}H"
+CLEAR_SCREEN = "\x1b[2J"
+CLEAR_LINE = "\x1b[K"
+HIDE_CURSOR = "\x1b[?25l"
+SHOW_CURSOR = "\x1b[?25h"
+
+# The card shown for the dealer's hole card while it is face down
+HOLE_CARD = "??"
+
+# The label of a hand for every status it can be paid out with
+STATUS_LABELS = {
+    "PUSH": "push",
+    "LOST_BY_SURRENDER": "surrendered",
+    "LOST_BY_BUST": "bust",
+    "LOST_BY_LESS_DEALER": "lost",
+    "WON_BY_DEALER_BUST": "won, dealer bust",
+    "WON_BY_GREATER_DEALER": "won",
+    "BLACK_JACK": "black jack",
+}
+
+
+class Screen:
+    """Declaring a screen of rows of text of a fixed width, what a terminal shows"""
+
+    def __init__(self, rows, columns):
+        """
+        rows: the number of rows
+        columns: the number of characters of a row
+        lines: the text of every row, each padded with spaces to columns characters
+        """
+        self.rows = rows
+        self.columns = columns
+        self.lines = [" " * columns] * rows
+
+    def put(self, row, column, text):
+        """writes text at a row and a column, counted from 0, what doesn't fit on the screen is cut"""
+        if not 0 <= row < self.rows or column >= self.columns:
+            return
+        text = text[:self.columns - column]
+        line = self.lines[row]
+        self.lines[row] = line[:column] + text + line[column + len(text):]
+
+    def diff(self, shown):
+        """
+        returns the changes turning the shown screen into this one, a list of (row, column, text),
+        one change per row going from the first to the last cell that differs
+        """
+        changes = []
+        for row, (line, shown_line) in enumerate(zip(self.lines, shown.lines)):
+            if line == shown_line:
+                continue
+            first = 0
+            while line[first] == shown_line[first]:
+                first += 1
+            last = self.columns
+            while line[last - 1] == shown_line[last - 1]:
+                last -= 1
+            changes.append((row, first, line[first:last]))
+        return changes
+
+    def text(self):
+        """returns the screen as a string, the rows without their trailing spaces"""
+        return "\n".join(line.rstrip() for line in self.lines)
+
+
+def card_str(card):
+    """returns a card as its rank and suit, like 10H"""
+    return card.rank + card.suit
+
+
+class TerminalSink(NullSink):
+    """
+    Declaring a sink drawing a table on a terminal, redrawn in place after its events, see the module docstring
+    The last row of the terminal is left for the prompts, see TerminalInput
+    """
+
+    def __init__(self, stream=None, rows=None, columns=None, fps=DEFAULT_FPS, clock=time.monotonic):
+        """
+        stream: where the frames are written, defaults to the standard output
+        rows, columns: the size of the view, defaults to the size of the terminal
+        fps: the most frames drawn per second, None to draw a frame after every event
+        clock: returns the time in seconds, to time the frames
+        table: the table drawn, set when it is created
+        dealer_cards: the dealer's cards face up, the hole card is only drawn once it has been revealed
+        payouts: what every hand of the round was paid out
+        message: the last line printed by the game, shown under the table
+        frames: the number of frames drawn
+        bytes_written: the number of characters written to the stream
+        """
+        size = shutil.get_terminal_size()
+        self.stream = sys.stdout if stream is None else stream
+        self.rows = size.lines if rows is None else rows
+        self.columns = size.columns if columns is None else columns
+        self.frame_interval = 0 if fps is None else 1 / fps
+        self.clock = clock
+        self.table = None
+        self.dealer_cards = []
+        self.payouts = {}
+        self.message = ""
+        self.frames = 0
+        self.bytes_written = 0
+        self.shown = None
+        self.last_frame = None
+        self.is_pending = False
+
+    @property
+    def prompt_row(self):
+        """the row of the prompts, counted from 0, the last row of the view"""
+        return self.rows - 1
+
+    def write(self, text):
+        """writes text to the stream, and counts it"""
+        self.stream.write(text)
+        self.bytes_written += len(text)
+
+    def render(self):
+        """returns a new Screen with the table drawn on it"""
+        screen = Screen(self.rows - 1, self.columns)
+        table = self.table
+        if table is None:
+            return screen
+        shoe = table.shoe
+        screen.put(0, 0, f"BLACK JACK | table {format_money(table.balance)} | shoe {len(shoe)} cards left, "
+                         f"{shoe.discarded} discarded")
+
+        dealer_hand = table.dealer.hand
+        cards = [card_str(card) for card in self.dealer_cards]
+        if len(dealer_hand.card_list) > len(self.dealer_cards):
+            cards.append(HOLE_CARD)
+        dealer_value = f"value {dealer_hand.value}" if len(self.dealer_cards) == len(dealer_hand.card_list) else ""
+        screen.put(2, 0, f"Dealer     {' '.join(cards):<24} {dealer_value}")
+
+        row = 4
+        for player in table.player_list:
+            insurance = f" | insured {format_money(player.insurance)}" if player.is_insured else ""
+            screen.put(row, 0, f"Player {player.index}   balance {format_money(player.balance)}{insurance}")
+            row += 1
+            for hand in (player.split_hand if player.is_split else (player.hand,)):
+                screen.put(row, 2, self.hand_str(hand))
+                row += 1
+        screen.put(self.rows - 2, 0, self.message)
+        return screen
+
+    def hand_str(self, hand):
+        """returns the row of a hand: its index if split, cards, value, stake or payout, and status"""
+        name = "hand" if hand.index is None else f"hand {hand.index}"
+        cards = " ".join(card_str(card) for card in hand.card_list)
+        if hand in self.payouts:
+            money_str = f"paid {format_money(self.payouts[hand])}"
+            status = STATUS_LABELS.get(hand.status.name, "")
+        else:
+            money_str = f"stake {format_money(hand.stake)}"
+            status = "standing" if hand.is_standing else ""
+        return f"{name:<8} {cards:<24} {hand.value:>2}  {money_str:<16} {status}"
+
+    def draw_frame(self):
+        """draws the table and writes the cells that changed since the last frame"""
+        screen = self.render()
+        if self.shown is None:
+            self.write(HIDE_CURSOR + CLEAR_SCREEN)
+            self.shown = Screen(screen.rows, screen.columns)
+        changes = screen.diff(self.shown)
+        self.write("".join(MOVE_CURSOR.format(row=row + 1, column=column + 1) + text
+                           for row, column, text in changes))
+        self.stream.flush()
+        self.shown = screen
+        self.frames += 1
+        self.last_frame = self.clock()
+        self.is_pending = False
+
+    def request_frame(self):
+        """draws a frame if the last one is old enough, else leaves it to the next event or flush"""
+        if self.last_frame is None or self.clock() - self.last_frame >= self.frame_interval:
+            self.draw_frame()
+        else:
+            self.is_pending = True
+
+    def flush(self):
+        """draws the frame left pending by the frame rate, before a prompt or at the end of a round"""
+        if self.is_pending or self.shown is None:
+            self.draw_frame()
+
+    def invalidate(self):
+        """forgets what the terminal shows, the next frame clears it and draws every cell"""
+        self.shown = None
+
+    def close(self):
+        """draws the last frame and leaves the cursor under the view"""
+        self.flush()
+        self.write(MOVE_CURSOR.format(row=self.rows, column=1) + CLEAR_LINE + SHOW_CURSOR)
+        self.stream.flush()
+
+    def show_message(self, text):
+        """shows the last non blank line of text under the table"""
+        lines = [line for line in text.splitlines() if line.strip()]
+        if lines:
+            self.message = lines[-1].strip()
+            self.request_frame()
+
+    def table_created(self, table):
+        self.table = table
+        self.dealer_cards = []
+        self.payouts = {}
+        self.request_frame()
+
+    def draw(self, hand, card):
+        if hand.player_index is None:
+            self.dealer_cards.append(card)
+        self.request_frame()
+
+    def decide(self, hand, choice):
+        self.request_frame()
+
+    def stand(self, hand, is_perfect_hand):
+        self.request_frame()
+
+    def double_down(self, hand):
+        self.show_message(f"Player {hand.player_index} doubled down.")
+
+    def split(self, hand, hand0, hand1):
+        self.show_message(f"Player {hand.player_index} split.")
+
+    def surrender(self, hand):
+        self.show_message(f"Player {hand.player_index} surrendered.")
+
+    def insurance(self, player, stake):
+        self.request_frame()
+
+    def insurance_payout(self, player):
+        self.show_message(f"Player {player.index} got {format_money(player.insurance)} from the insurance.")
+
+    def insufficient_balance(self, player):
+        self.show_message(f"Player {player.index} doesn't have enough balance.")
+
+    def payout(self, hand):
+        self.payouts[hand] = hand.stake
+        self.request_frame()
+
+    def round_end(self, table):
+        self.show_message("The round is over.")
+        self.flush()
+
+    def dealer_draw_end(self, table):
+        self.request_frame()
+
+    def players_info(self, table):
+        self.flush()
+
+
+class TerminalOutput:
+    """
+    Declaring a stream showing what the game prints on the message row of a TerminalSink,
+    so the prints of the game don't scroll the view, see main.py --tui
+    """
+
+    def __init__(self, sink):
+        self.sink = sink
+
+    def write(self, text):
+        self.sink.show_message(text)
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+class TerminalInput:
+    """
+    Declaring an input provider asking on the prompt row of a TerminalSink,
+    the frame left pending is drawn first and the prompt row is cleared, so the view stays in place
+    """
+
+    def __init__(self, sink, provider=None):
+        """
+        sink: the TerminalSink of the table
+        provider: the provider the inputs are read from once the prompt is shown, defaults to the console
+        """
+        self.sink = sink
+        self.provider = ConsoleInput() if provider is None else provider
+
+    def read(self, prompt):
+        self.sink.flush()
+        prompt = " ".join(line.strip() for line in prompt.splitlines() if line.strip())[:self.sink.columns - 8]
+        self.sink.write(MOVE_CURSOR.format(row=self.sink.prompt_row + 1, column=1) + CLEAR_LINE + SHOW_CURSOR
+                        + prompt + " ")
+        self.sink.stream.flush()
+        input_str = self.provider.read("")
+        # the typed input moved the cursor, the rows the view knows about are left as they are
+        self.sink.write(HIDE_CURSOR)
+        return input_str
+
+
+class VirtualTerminal:
+    """
+    Declaring a stream standing for a terminal, the text and the escape sequences of TerminalSink written to it
+    are applied to rows of text, so what a real terminal would show can be read and compared
+    """
+
+    _TOKEN = re.compile(r"\x1b\[(\d+);(\d+)H|\x1b\[2J|\x1b\[K|\x1b\[\?25[lh]|\n|[^\x1b\n]+")
+
+    def __init__(self, rows=24, columns=80):
+        """
+        rows, columns: the size of the terminal
+        lines: the characters of every row
+        row, column: where the cursor is, counted from 0
+        """
+        self.rows = rows
+        self.columns = columns
+        self.lines = [[" "] * columns for _ in range(rows)]
+        self.row = 0
+        self.column = 0
+        self.bytes_written = 0
+
+    def write(self, data):
+        self.bytes_written += len(data)
+        for match in self._TOKEN.finditer(data):
+            token = match.group(0)
+            if match.group(1) is not None:
+                self.row, self.column = int(match.group(1)) - 1, int(match.group(2)) - 1
+            elif token == CLEAR_SCREEN:
+                self.lines = [[" "] * self.columns for _ in range(self.rows)]
+            elif token == CLEAR_LINE:
+                if 0 <= self.row < self.rows:
+                    self.lines[self.row][self.column:] = [" "] * (self.columns - self.column)
+            elif token == "\n":
+                self.row, self.column = self.row + 1, 0
+            elif not token.startswith("\x1b"):
+                for character in token:
+                    if 0 <= self.row < self.rows and self.column < self.columns:
+                        self.lines[self.row][self.column] = character
+                    self.column += 1
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def text(self):
+        """returns what the terminal shows, the rows without their trailing spaces"""
+        return "\n".join("".join(line).rstrip() for line in self.lines)
+
+
+def measure_frames(rounds=100, players=6, seed=None):
+    """
+    Plays rounds with the basic strategy on a virtual terminal, each frame drawn after every event,
+    and checks that the terminal shows what a full redraw would
+    return: (the characters written by the diff frames, the characters a full redraw of every frame would write,
+        the number of frames)
+    """
+    import random
+
+    from basic_strategy import BasicStrategy
+    from blackjack import Table
+    from shoe import Shoe
+
+    terminal = VirtualTerminal(rows=40, columns=100)
+    sink = TerminalSink(stream=terminal, rows=terminal.rows, columns=terminal.columns, fps=None)
+    shoe = Shoe(rng=random.Random(seed))
+    strategy = BasicStrategy()
+    full_redraw = 0
+    draw_frame = sink.draw_frame
+
+    def draw_and_count_frame():
+        nonlocal full_redraw
+        draw_frame()
+        full_redraw += sum(len(line.rstrip()) for line in sink.shown.lines)
+
+    sink.draw_frame = draw_and_count_frame
+    for _ in range(rounds):
+        table = Table(players, strategy=strategy, sink=sink, shoe=shoe)
+        table.play_round()
+        shown = sink.shown.text().splitlines()
+        if terminal.text().splitlines()[:len(shown)] != shown:
+            raise AssertionError("the virtual terminal doesn't show the last frame")
+    return sink.bytes_written, full_redraw, sink.frames
+
+
+if __name__ == "__main__":
+    written, full_redraw, frames = measure_frames()
+    print(f"{frames} frames, {written} characters written, about {full_redraw} for full redraws")
@@ -0,0 +1,195 @@
+"""
+This is a module asking what would have happened if a decision of a round had been different
+A round is played once from a snapshot of its table taken before the deal, and every decision is recorded.
+Then for every decision and every other choice it had, the table is restored and the round is replayed
+with the same decisions before it, the other choice at it and the strategy after it, so the branches share the deal.
+A round can't be copied in the middle of its steps, the generators of a round hold where it is,
+so a branch replays the round from its start, a snapshot is a few hundred bytes and a replay costs about a round.
+With rollouts, the cards not dealt yet at the decision are reshuffled for every rollout,
+the same way for every choice, so the choices are compared on the same cards
+"""
+
+import random
+import time
+
+from basic_strategy import BasicStrategy
+from blackjack import Table
+from events import NullSink
+from money import format_money
+from shoe import Shoe
+
+
+class DecisionPoint:
+    """Declaring a class holding a decision of a round and what every choice it had came to"""
+
+    def __init__(self, index, player_index, hand_index, cards, upcard, possible_choices, choice, position):
+        """
+        index: the number of decisions made before it in the round
+        player_index: the index of the player of the hand
+        hand_index: the index of the hand among the split hands, None if the hand wasn't split
+        cards: the cards of the hand, like ["10H", "6S"]
+        upcard: the dealer's upcard, like "9C"
+        possible_choices: the choices the hand had
+        choice: the choice the strategy made
+        position: the position of the shoe when the decision was made, the next card to draw
+        outcomes: the mean net result in cents of the player for every choice, after analyze
+        """
+        self.index = index
+        self.player_index = player_index
+        self.hand_index = hand_index
+        self.cards = cards
+        self.upcard = upcard
+        self.possible_choices = possible_choices
+        self.choice = choice
+        self.position = position
+        self.outcomes = {}
+
+    def __str__(self):
+        outcomes = " ".join(f"{choice}:{format_money(round(net))}" for choice, net in self.outcomes.items())
+        return f"#{self.index} player {self.player_index} {' '.join(self.cards)} vs {self.upcard} " \
+               f"chose {self.choice} | {outcomes}"
+
+    @property
+    def best_choice(self):
+        """the choice with the best outcome, the choice made if no outcome is known"""
+        if not self.outcomes:
+            return self.choice
+        return max(self.outcomes, key=self.outcomes.get)
+
+
+class ScriptedStrategy:
+    """
+    A strategy making the first decisions of a round from a script, and every other one with another strategy
+    The stakes are left to the other strategy, the insurances too unless they are given,
+    the recorded decisions are kept in decision_points and the recorded insurances in insurances
+    """
+
+    def __init__(self, strategy, script=(), record=False, insurances=None):
+        """
+        strategy: makes the stakes, the insurances if they aren't given and the decisions after the script
+        script: the choices of the first decisions
+        record: True to record every decision as a DecisionPoint and every insurance
+        insurances: the insurance stake of every player asked, by player index, like the recorded insurances
+        """
+        self.strategy = strategy
+        self.script = script
+        self.record = record
+        self.decision_points = []
+        self.decisions = 0
+        self.given_insurances = insurances
+        self.insurances = {}
+
+    def stake(self, player, hand, table, double_down=False):
+        return self.strategy.stake(player, hand, table, double_down=double_down)
+
+    def insure(self, player, table):
+        if self.given_insurances is not None:
+            return self.given_insurances.get(player.index)
+        stake = self.strategy.insure(player, table)
+        if self.record:
+            self.insurances[player.index] = stake
+        return stake
+
+    def decide(self, hand, possible_choices, table):
+        index = self.decisions
+        self.decisions += 1
+        if index < len(self.script):
+            choice = self.script[index]
+        else:
+            choice = self.strategy.decide(hand, possible_choices, table)
+        if self.record:
+            upcard = table.dealer.hand.card_list[0]
+            self.decision_points.append(DecisionPoint(
+                index, hand.player_index, hand.index, [card.rank + card.suit for card in hand.card_list],
+                upcard.rank + upcard.suit, list(possible_choices), choice.upper(), table.shoe.position,
+            ))
+        return choice
+
+
+def _net_results(table, opening_balances):
+    """returns the net result in cents of every player of a played round"""
+    return [player.balance - opening for player, opening in zip(table.player_list, opening_balances)]
+
+
+def _reshuffle_shoe_from(shoe, position, rng):
+    """shuffles the cards of the shoe from position on, the cards before it stay where they are"""
+    random_key = rng.random
+    shoe.codes[position:] = bytes(sorted(shoe.codes[position:], key=lambda code: random_key()))
+
+
+def analyze(table, strategy=None, rollouts=0, rng=None):
+    """
+    Plays the round of a table and every branch of its decisions, see the module docstring
+    table: a table whose players have staked and whose round hasn't been dealt yet,
+        it is left as if the round had been played by the strategy
+    strategy: the strategy of the round, defaults to the table's strategy
+    rollouts: 0 to replay every branch on the cards actually left in the shoe,
+        or the number of times to replay it with the cards after the decision reshuffled, the outcomes are the mean
+    rng: a random.Random for the rollouts, defaults to the random module
+    return: the DecisionPoint of every decision of the round, with the outcome of every choice it had
+    """
+    table_strategy = table.strategy
+    strategy = table_strategy if strategy is None else strategy
+    rng = random if rng is None else rng
+    sink, table.sink = table.sink, NullSink()
+    snapshot = table.snapshot()
+    opening_balances = [player.balance + player.hand.stake for player in table.player_list]
+    try:
+        recorder = ScriptedStrategy(strategy, record=True)
+        table.strategy = recorder
+        table.play_round()
+        decision_points = recorder.decision_points
+        script = [decision_point.choice for decision_point in decision_points]
+        insurances = recorder.insurances
+
+        for decision_point in decision_points:
+            player_index = decision_point.player_index
+            totals = dict.fromkeys(decision_point.possible_choices, 0)
+            for rollout in range(max(rollouts, 1)):
+                if rollouts:
+                    table.restore(snapshot)
+                    _reshuffle_shoe_from(table.shoe, decision_point.position, rng)
+                    branch_snapshot = table.snapshot()
+                else:
+                    branch_snapshot = snapshot
+                for choice in totals:
+                    table.restore(branch_snapshot)
+                    table.strategy = ScriptedStrategy(strategy, script[:decision_point.index] + [choice],
+                                                      insurances=insurances)
+                    table.play_round()
+                    totals[choice] += _net_results(table, opening_balances)[player_index]
+            decision_point.outcomes = {choice: total / max(rollouts, 1) for choice, total in totals.items()}
+        table.restore(snapshot)
+    finally:
+        table.sink = sink
+        table.strategy = table_strategy
+
+    # the round left on the table is the one analysed, played again with its recorded decisions and insurances
+    table.strategy = ScriptedStrategy(strategy, script, insurances=insurances)
+    try:
+        table.play_round()
+    finally:
+        table.strategy = table_strategy
+    return decision_points
+
+
+def measure_branches(rounds=100, players=1, strategy=None, rollouts=0, seed=None):
+    """
+    Analyzes many rounds of a table, to measure how fast the branches are replayed
+    return: (the number of branches replayed, branches per second)
+    """
+    strategy = BasicStrategy() if strategy is None else strategy
+    rng = random.Random(seed)
+    shoe = Shoe(rng=rng)
+    branches = 0
+    start = time.perf_counter()
+    for _ in range(rounds):
+        table = Table(players, strategy=strategy, sink=NullSink(), shoe=shoe)
+        for decision_point in analyze(table, rollouts=rollouts, rng=rng):
+            branches += len(decision_point.outcomes) * max(rollouts, 1)
+    return branches, branches / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    print("%d branches, %.0f branches/s" % measure_branches(rounds=1000, seed=1))
+    print("%d branches with 20 rollouts, %.0f branches/s" % measure_branches(rounds=100, rollouts=20, seed=1))